@@ -8,13 +8,31 @@ import re
 import json
 import argparse
 import pandas as pd
-from database.client import Database
+from database.client import Database, BATCH_SIZE_DEFAULT
+from database.mirror import IndexMirror, is_mirror
+from console_handle.utils import CACHE_DIRECTORY
 from serialize.features import deserialize_features
 from serialize.model import deserialize_model
+from serialize.predictions import SINKS
+from serve.server import MAX_BATCH_SIZE_DEFAULT, MAX_DELAY_DEFAULT
+from ml.search import FACTOR_DEFAULT
+from data_parse.habr import QUEUE_SIZE_DEFAULT, PREFETCH_DEFAULT
+from data_parse.fetch import RETRIES_DEFAULT
+from data_parse.limit import RATE_DEFAULT, MIN_RATE_DEFAULT, MAX_RATE_DEFAULT
 from sklearn.svm import SVC
 from sklearn.ensemble import RandomForestClassifier
 
 
+# Columns of the input .csv file that are used by the program
+INPUT_COLUMNS = ['text', 'author', 'title', 'link']
+
+# Methods of the search of hyper parameters while training
+SEARCH_METHODS = ['grid', 'halving']
+
+# Count of texts predicted at once if the size of chunks isn't specified
+PREDICT_CHUNKSIZE_DEFAULT = 1000
+
+
 class ConsoleHandler:
     NAME = 'ataurus'
     DESCRIPTION = 'Ataurus = Attribution of Authorship Russian. ' \
@@ -49,11 +67,34 @@ class ConsoleHandler:
                                 "or it may be serialized DataFrame object, containing extracted features",
                            type=str)
         train.add_argument('output',
-                           help="the name of a file where a model will be serialized",
+                           help="the name of a directory where a model will be serialized",
                            type=str)
         train.add_argument('-f', '--features',
-                           help="where extracted features will be serialized",
+                           help="a directory where extracted features will be serialized",
                            type=str)
+        train.add_argument('--compress_features',
+                           help="compress serialized features, compressed features can't be loaded partially without "
+                                "reading them into memory",
+                           action='store_true')
+        train.add_argument('--chunksize',
+                           help="count of rows of the input that are processed at once, the input is read by chunks "
+                                "and only extracted features are kept in memory",
+                           type=int)
+        train.add_argument('--no_cache',
+                           help="don't use the cache of extracted features",
+                           action='store_true')
+        train.add_argument('--search',
+                           help="the method of the search of hyper parameters: 'grid' evaluates all the candidates "
+                                "on all the data, 'halving' evaluates candidates on growing subsamples and drops "
+                                "the worst of them early",
+                           choices=SEARCH_METHODS,
+                           dest='method')
+        train.add_argument('--budget',
+                           help="the maximum time of the halving search in seconds",
+                           type=float)
+        train.add_argument('--factor',
+                           help="the ratio of candidates dropped at each iteration of the halving search",
+                           type=int)
         train.add_argument('-c', '--train_config',
                            help="path to a config file containing parameters for a grid search "
                                 "of parameters while training",
@@ -68,26 +109,129 @@ class ConsoleHandler:
                                   "or it may be serialized DataFrame object, containing extracted features",
                              type=str)
         predict.add_argument('model',
-                             help='the name of a file containing a serialized model',
+                             help='the name of a directory containing a serialized model',
                              type=str)
         predict.add_argument('-f', '--features',
-                             help="where extracted features will be serialized",
+                             help="a directory where extracted features will be serialized",
                              type=str)
+        predict.add_argument('--compress_features',
+                             help="compress serialized features, compressed features can't be loaded partially without "
+                                  "reading them into memory",
+                             action='store_true')
         predict.add_argument('-o', '--output',
                              help='file where results of predicting will be saved')
+        predict.add_argument('--format',
+                             help="format of results of predicting, by default it's chosen by the extension "
+                                  "of the output file: .csv, .jsonl or a text table",
+                             choices=list(SINKS),
+                             dest='output_format')
+        predict.add_argument('--chunksize',
+                             help="count of rows of the input that are predicted at once, results of each chunk "
+                                  "are written as soon as they're ready",
+                             default=PREDICT_CHUNKSIZE_DEFAULT,
+                             type=int)
+        predict.add_argument('--no_cache',
+                             help="don't use the cache of extracted features",
+                             action='store_true')
+
+        # Serve mode
+        serve = modes.add_parser('serve',
+                                 help='keep a model in memory and predict texts received over HTTP or a Unix socket')
+        serve.add_argument('model',
+                           help='the name of a directory containing a serialized model',
+                           type=str)
+        serve.add_argument('--host',
+                           help='the host of the HTTP server',
+                           default='127.0.0.1',
+                           dest='bind_host',
+                           type=str)
+        serve.add_argument('--port',
+                           help='the port of the HTTP server',
+                           default=8000,
+                           dest='bind_port',
+                           type=int)
+        serve.add_argument('--socket',
+                           help='the path of a Unix socket that is used instead of the HTTP port',
+                           dest='socket_path',
+                           type=str)
+        serve.add_argument('--max_batch_size',
+                           help='the maximum count of texts predicted at once',
+                           default=MAX_BATCH_SIZE_DEFAULT,
+                           type=int)
+        serve.add_argument('--max_delay',
+                           help='the maximum time in milliseconds texts wait for other texts to be predicted together',
+                           default=MAX_DELAY_DEFAULT * 1000,
+                           type=float)
+
+        # Mirror mode
+        mirror = modes.add_parser('mirror',
+                                  help='copy an index of ElasticSearch to a local directory or update the copy, '
+                                       'the directory may be used as the input of train and predict modes')
+        mirror.add_argument('input',
+                            help='the connection string of ElasticSearch such as <hostname:port/index>',
+                            type=str)
+        mirror.add_argument('directory',
+                            help='the directory of the local copy of the index',
+                            type=str)
+        mirror.add_argument('--batch_size',
+                            help='count of documents requested at once',
+                            default=BATCH_SIZE_DEFAULT,
+                            type=int)
 
         # Parse mode
         parse = modes.add_parser('parse',
                                  help='parse web sites to get data')
         parse.add_argument('-m', '--max_count',
                            help='maximum articles by one author',
-                           default=10 ** 10)
+                           default=10 ** 10,
+                           type=int)
         parse.add_argument('--host',
                            help='the host address of the Elasticsearch cluster',
                            type=str)
         parse.add_argument('--port',
                            help='the port of the Elasticsearch cluster',
                            type=str)
+        parse.add_argument('--concurrent',
+                           help='count of pages requested at once',
+                           default=20,
+                           type=int)
+        parse.add_argument('--queue_size',
+                           help='the maximum count of found links waiting to be requested, searching of links '
+                                'is paused when it is reached',
+                           default=QUEUE_SIZE_DEFAULT,
+                           type=int)
+        parse.add_argument('--prefetch',
+                           help='the maximum count of pages of an author with links to articles requested at once',
+                           default=PREFETCH_DEFAULT,
+                           type=int)
+        parse.add_argument('--rate',
+                           help='the initial count of requests to a site per second, it grows while the site '
+                                'responds normally and falls when the site throttles requests',
+                           default=RATE_DEFAULT,
+                           type=float)
+        parse.add_argument('--min_rate',
+                           help='the minimum count of requests to a site per second',
+                           default=MIN_RATE_DEFAULT,
+                           type=float)
+        parse.add_argument('--max_rate',
+                           help='the maximum count of requests to a site per second',
+                           default=MAX_RATE_DEFAULT,
+                           type=float)
+        parse.add_argument('--retries',
+                           help='count of repeated requests after throttled or failed ones',
+                           default=RETRIES_DEFAULT,
+                           type=int)
+        parse.add_argument('--state',
+                           help='a SQLite file keeping the progress of the crawl, an interrupted crawl started '
+                                'with the same file is resumed',
+                           dest='crawl_state',
+                           type=str)
+        parse.add_argument('--reindex',
+                           help='download articles even if they are already stored in the index',
+                           action='store_true')
+        parse.add_argument('--http_cache',
+                           help='a SQLite file caching downloaded pages, unchanged pages are not downloaded again',
+                           type=str)
 
         parse_resources = parse.add_subparsers(title='Resources', dest='resource')
 
@@ -113,7 +257,7 @@ class ConsoleHandler:
         parameters = self._parser.parse_args(args)
 
         if parameters.mode is None:
-            self._parser.error("You must specify 1 of 3 commands: train, predict or parse")
+            self._parser.error("You must specify 1 of 5 commands: train, predict, serve, mirror or parse")
         if parameters.mode == 'parse':
             if parameters.resource is None:
                 self._parser.error("You must specify 1 of 1 resources: habr")
@@ -134,26 +278,56 @@ class ConsoleHandler:
             return self._parameters.features
         return None
 
+    @property
+    def cache(self):
+        """
+        Returns the directory of the cache of extracted features or None if the cache mustn't be used.
+        """
+        if self._parameters.no_cache:
+            return None
+        return CACHE_DIRECTORY
+
+    @property
+    def input_is_features(self) -> bool:
+        """
+        Returns True if the input is a serialized DataFrame object containing extracted features.
+        """
+        return os.path.exists(self._parameters.input) and not re.search(r'\.csv$', self._parameters.input) \
+            and not is_mirror(self._parameters.input)
+
+    @property
+    def compress_features(self) -> bool:
+        return self._parameters.compress_features
+
     @property
     def input(self):
+        return self.read_input()
+
+    def read_input(self, groups: list[str] = None):
+        """
+        Reads the input.
+
+        :param groups: names of groups of features loaded from serialized features, all the groups are loaded
+                       if it's None. It's ignored for other inputs
+        """
         # The input may be either an input file or a connection string
         if os.path.exists(self._parameters.input):
             # If the input file has csv format
             if re.search(r'\.csv$', self._parameters.input):
-                df = pd.read_csv(self._parameters.input)
-
                 try:
-                    texts = df['text'].values
-                    authors = df['author'].values
-                    titles = df['title'].values
-                    links = df['link'].values
-                except Exception:
+                    df = pd.read_csv(self._parameters.input, usecols=INPUT_COLUMNS)
+                except ValueError:
                     raise ValueError('Your .csv input file has no correct format: '
                                      'it must have "text" and "author" columns')
-                return texts, authors, titles, links
+
+                return df['text'].values, df['author'].values, df['title'].values, df['link'].values
+            # If the input is a local mirror of an index of ElasticSearch
+            elif is_mirror(self._parameters.input):
+                df = IndexMirror(self._parameters.input).read(INPUT_COLUMNS)
+                return df['text'].values, df['author'].values, df['title'].values, df['link'].values
             # If the input is DataFrame serialized object containing extracted features and a list of authors (optional)
             else:
-                return deserialize_features(self._parameters.input)
+                return deserialize_features(self._parameters.input, groups)
 
         # If the input is connection string of ElasticSearch such as <hostname:port/index>
         elif re.search(r'^[\w.-]+:[\d]{2,5}/[^\s]+$', self._parameters.input):
@@ -165,12 +339,58 @@ class ConsoleHandler:
         else:
             raise ValueError("The input is neither input file nor a connection string of ElasticSearch")
 
+    @property
+    def chunksize(self):
+        if self._parameters.chunksize is not None and self._parameters.chunksize <= 0:
+            self._parser.error("The size of chunks must be positive")
+
+        return self._parameters.chunksize
+
+    @property
+    def input_chunks(self):
+        """
+        Generator of chunks of the input. Each chunk is a tuple of texts, authors, titles and links
+        containing at most chunksize rows. Only .csv files, ElasticSearch indexes and their mirrors may be read
+        by chunks.
+        """
+        chunksize = self.chunksize
+        if chunksize is None:
+            raise ValueError("The size of chunks wasn't specified")
+
+        if os.path.exists(self._parameters.input) and is_mirror(self._parameters.input):
+            for df in IndexMirror(self._parameters.input).iter_chunks(chunksize, INPUT_COLUMNS):
+                yield df['text'].values, df['author'].values, df['title'].values, df['link'].values
+        elif os.path.exists(self._parameters.input):
+            if not re.search(r'\.csv$', self._parameters.input):
+                raise ValueError("Only .csv files, ElasticSearch indexes and their mirrors may be read by chunks")
+
+            try:
+                reader = pd.read_csv(self._parameters.input, usecols=INPUT_COLUMNS, chunksize=chunksize)
+            except ValueError:
+                raise ValueError('Your .csv input file has no correct format: '
+                                 'it must have "text" and "author" columns')
+
+            with reader:
+                for df in reader:
+                    yield df['text'].values, df['author'].values, df['title'].values, df['link'].values
+        elif re.search(r'^[\w.-]+:[\d]{2,5}/[^\s]+$', self._parameters.input):
+            # Batches of the index are read concurrently while previous chunks are processed
+            hostname_port, index_name = self._parameters.input.strip().split('/')
+            database = Database.connect([hostname_port])
+            for df in database.iter_batches(index_name, fields=INPUT_COLUMNS, batch_size=chunksize, refresh=True):
+                yield df['text'].values, df['author'].values, df['title'].values, df['link'].values
+        else:
+            raise ValueError("The input is neither input file nor a connection string of ElasticSearch")
+
     @property
     def model(self):
         if not ('model' in self._parameters):
             raise ValueError('You try to get a model, but this option is None')
 
-        return deserialize_model(self._parameters.model)
+        # The model is deserialized only once
+        if getattr(self, '_model', None) is None:
+            self._model = deserialize_model(self._parameters.model)
+        return self._model
 
     @property
     def output(self):
@@ -179,10 +399,46 @@ class ConsoleHandler:
         return None
 
     @property
-    def train_config(self):
+    def serve_options(self) -> dict:
         """
-        Gets and returns a grid params for the GridSearchCV class to search optimal hyper parameters of a model.
+        Returns parameters of the server of predictions.
+        """
+        if self._parameters.max_batch_size <= 0:
+            self._parser.error("The size of micro-batches must be positive")
+        if self._parameters.max_delay < 0:
+            self._parser.error("The delay of micro-batches can't be negative")
+
+        return {
+            'host': self._parameters.bind_host,
+            'port': self._parameters.bind_port,
+            'socket_path': self._parameters.socket_path,
+            'max_batch_size': self._parameters.max_batch_size,
+            'max_delay': self._parameters.max_delay / 1000
+        }
+
+    @property
+    def mirror_options(self) -> dict:
         """
+        Returns parameters of the synchronization of a local mirror of an index.
+        """
+        if not re.search(r'^[\w.-]+:[\d]{2,5}/[^\s]+$', self._parameters.input):
+            self._parser.error("The input must be a connection string of ElasticSearch such as <hostname:port/index>")
+        if self._parameters.batch_size <= 0:
+            self._parser.error("The size of batches must be positive")
+
+        hostname_port, index_name = self._parameters.input.strip().split('/')
+        return {
+            'host': hostname_port,
+            'index': index_name,
+            'directory': self._parameters.directory,
+            'batch_size': self._parameters.batch_size
+        }
+
+    @property
+    def output_format(self):
+        return self._parameters.output_format
+
+    def _load_train_config(self):
         if not self._parameters.train_config:
             return None
 
@@ -190,7 +446,42 @@ class ConsoleHandler:
             raise FileNotFoundError("The training config file wasn't found")
 
         with open(self._parameters.train_config, 'r') as file:
-            json_parameters = json.load(file)
+            return json.load(file)
+
+    @property
+    def search(self) -> dict:
+        """
+        Returns parameters of the search of hyper parameters: the method ('grid' or 'halving'), the budget in seconds
+        and the factor of the halving search. They're taken from the "search" block of the training config file,
+        options of the command line override them.
+        """
+        search = (self._load_train_config() or {}).get('search', {})
+        search = {
+            'method': search.get('method', 'grid'),
+            'budget': search.get('budget'),
+            'factor': search.get('factor', FACTOR_DEFAULT)
+        }
+        for option in search:
+            if (value := getattr(self._parameters, option)) is not None:
+                search[option] = value
+
+        if search['method'] not in SEARCH_METHODS:
+            raise ValueError(f"Invalid search method was specified: you may specify {' or '.join(SEARCH_METHODS)}")
+        if search['budget'] is not None and search['budget'] <= 0:
+            raise ValueError("The budget of the search must be positive")
+        if search['factor'] < 2:
+            raise ValueError("The factor of the halving search must be at least 2")
+
+        return search
+
+    @property
+    def train_config(self):
+        """
+        Gets and returns a grid params for the GridSearchCV class to search optimal hyper parameters of a model.
+        """
+        json_parameters = self._load_train_config()
+        if json_parameters is None:
+            return None
 
         # Iterate through the whole list of blocks and change 'model__estimator' parameter to an object of Sklearn.
         parameters = []
@@ -228,8 +519,48 @@ class ConsoleHandler:
 
         return authors
 
+    @property
+    def parse_options(self) -> dict:
+        """
+        Returns parameters of the crawler.
+        """
+        if self._parameters.concurrent <= 0:
+            self._parser.error("The count of concurrent requests must be positive")
+        if self._parameters.queue_size <= 0:
+            self._parser.error("The size of the queue of links must be positive")
+        if not 0 < self._parameters.min_rate <= self._parameters.rate <= self._parameters.max_rate:
+            self._parser.error("The rate of requests must be positive and lie between the minimum and maximum rates")
+        if self._parameters.retries < 0:
+            self._parser.error("The count of retries can't be negative")
+        if self._parameters.prefetch <= 0:
+            self._parser.error("The count of prefetched pages must be positive")
+
+        return {
+            'concurrent': self._parameters.concurrent,
+            'queue_size': self._parameters.queue_size,
+            'prefetch': self._parameters.prefetch,
+            'rate': self._parameters.rate,
+            'min_rate': self._parameters.min_rate,
+            'max_rate': self._parameters.max_rate,
+            'retries': self._parameters.retries
+        }
+
+    @property
+    def crawl_state(self):
+        return self._parameters.crawl_state
+
+    @property
+    def reindex(self) -> bool:
+        return self._parameters.reindex
+
+    @property
+    def http_cache(self):
+        return self._parameters.http_cache
+
     @property
     def max_count(self):
+        if self._parameters.max_count <= 0:
+            self._parser.error("The maximum count of articles must be positive")
         return self._parameters.max_count
 
     @property
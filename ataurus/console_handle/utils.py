@@ -82,3 +82,17 @@ def get_hash(filename: str) -> str:
         sha.update(data)
 
     return sha.hexdigest()
+
+
+def get_text_hash(text: str, salt: str = '') -> str:
+    """
+    Get the hash of the passed text.
+    :param text: a text
+    :param salt: a string mixed into the hash, e.g. a version of processing of the text
+    :return: hash string
+    """
+    sha = hl.sha256()
+    sha.update(salt.encode('utf-8'))
+    sha.update(text.encode('utf-8'))
+
+    return sha.hexdigest()
@@ -0,0 +1,146 @@
+"""
+Module contains the non-blocking fetching of web pages. Connections are pooled and kept alive, so a lot of
+pages of the same site are requested concurrently through a few connections.
+"""
+import asyncio
+import logging
+import aiohttp
+from collections import namedtuple
+from urllib.parse import urlsplit
+from data_parse.state import ResponseCache
+from data_parse.limit import HostLimiter, get_retry_after, RATE_DEFAULT, MIN_RATE_DEFAULT, MAX_RATE_DEFAULT, \
+    THROTTLED_STATUSES
+
+# The default maximum count of requests executed at once
+CONCURRENT_DEFAULT = 20
+
+# The default timeouts of a request in seconds: the whole request and establishing of a connection
+REQUEST_TIMEOUT_DEFAULT = 30
+CONNECT_TIMEOUT_DEFAULT = 10
+
+# The default count of repeated requests after throttled or failed ones
+RETRIES_DEFAULT = 3
+
+HEADERS_DEFAULT = {'User-Agent': 'Mozilla/5.0 (compatible; Ataurus)'}
+
+# The status is None if the request failed (a timeout or an error of the connection)
+Response = namedtuple('Response', ['url', 'status', 'text', 'headers'])
+
+
+class Fetcher:
+    def __init__(self,
+                 concurrent: int = CONCURRENT_DEFAULT,
+                 per_host: int = None,
+                 timeout: float = REQUEST_TIMEOUT_DEFAULT,
+                 connect_timeout: float = CONNECT_TIMEOUT_DEFAULT,
+                 headers: dict = None,
+                 cache: ResponseCache = None,
+                 rate: float = RATE_DEFAULT,
+                 min_rate: float = MIN_RATE_DEFAULT,
+                 max_rate: float = MAX_RATE_DEFAULT,
+                 retries: int = RETRIES_DEFAULT):
+        """
+        Asynchronous HTTP client. It must be used as an asynchronous context manager, the pool of connections
+        is closed on exit. Requests to each host are limited by a HostLimiter object adapting the rate
+        and the count of requests executed at once to responses of the host.
+
+        :param concurrent: the maximum count of requests executed at once
+        :param per_host: the maximum count of requests to one host executed at once, it equals concurrent if it's None
+        :param timeout: the timeout of the whole request in seconds
+        :param connect_timeout: the timeout of establishing of a connection in seconds
+        :param headers: headers sent with each request
+        :param cache: the cache of responses, cached pages are requested conditionally
+        :param rate: the initial rate of requests to a host per second, requests aren't spaced if it's None
+        :param min_rate: the minimum rate of requests to a host per second
+        :param max_rate: the maximum rate of requests to a host per second
+        :param retries: count of repeated requests after throttled or failed ones
+        """
+        if concurrent <= 0 or (per_host is not None and per_host <= 0):
+            raise ValueError("The count of concurrent requests must be positive")
+        if retries < 0:
+            raise ValueError("The count of retries can't be negative")
+        # Check the rates before requests are made
+        HostLimiter(rate, min_rate, max_rate)
+
+        self.concurrent = concurrent
+        self.per_host = per_host if per_host is not None else concurrent
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.headers = headers if headers is not None else HEADERS_DEFAULT
+        self.cache = cache
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.retries = retries
+
+        self._session = None
+        self._limiters = {}
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrent, limit_per_host=self.per_host)
+        timeout = aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout)
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.headers)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self._session.close()
+        self._session = None
+        self._limiters.clear()
+
+    def get_limiter(self, host: str) -> HostLimiter:
+        if host not in self._limiters:
+            self._limiters[host] = HostLimiter(self.rate, self.min_rate, self.max_rate, self.per_host)
+        return self._limiters[host]
+
+    async def fetch(self, url: str) -> Response:
+        """
+        Requests the page by the GET method. Errors of connections and timeouts aren't raised, the status
+        of the response is None in this case. If the page is cached and it isn't modified, the cached page
+        is returned with the status 200. Throttled and failed requests are repeated after the time
+        of the Retry-After header if it's sent.
+
+        :param url: the url of the page
+        :return: the Response object
+        """
+        if self._session is None:
+            raise ValueError("The fetcher must be used as an asynchronous context manager")
+
+        limiter = self.get_limiter(urlsplit(url).netloc)
+        for attempt in range(self.retries + 1):
+            await limiter.acquire()
+            try:
+                response = await self._request(url)
+            except BaseException:
+                limiter.cancel()
+                raise
+            limiter.release(response.status, get_retry_after(response.headers))
+
+            if response.status is not None and response.status not in THROTTLED_STATUSES:
+                break
+            logging.warning(f"{url} Error {response.status}, attempt {attempt + 1} of {self.retries + 1}")
+
+        return response
+
+    async def _request(self, url: str) -> Response:
+        cached = self.cache.get(url) if self.cache is not None else None
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+
+        try:
+            async with self._session.get(url, headers=headers) as response:
+                if response.status == 304 and cached is not None:
+                    return Response(url, 200, cached.text, response.headers)
+
+                text = await response.text(errors='replace')
+                etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+                if self.cache is not None and response.status == 200 and (etag or last_modified):
+                    self.cache.put(url, etag, last_modified, text)
+
+                return Response(url, response.status, text, response.headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.warning(f"{url} Error {type(e).__name__}: {e}")
+            return Response(url, None, None, {})
@@ -1,17 +1,32 @@
-import numpy as np
-import requests
+import csv
+import math
 import bs4
 import logging
 import asyncio
-import random
+import importlib.util
 import pandas as pd
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from database.client import Database
-from data_parse.utils import get_sublists
+from data_parse.fetch import Fetcher, REQUEST_TIMEOUT_DEFAULT, RETRIES_DEFAULT
+from data_parse.limit import RATE_DEFAULT, MIN_RATE_DEFAULT, MAX_RATE_DEFAULT
+from data_parse.state import CrawlState, ResponseCache
 from datetime import datetime
 
 logging.basicConfig(format="[%(asctime)s] %(msg)s",
                     level=logging.WARNING)
 
+# lxml builds the tree much faster than the parser of the standard library, but it's optional
+HTML_PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+POSTS_COLUMNS = ['post_number', 'author', 'text', 'title', 'link']
+
+# The default maximum count of links waiting to be fetched and of parsed posts waiting to be consumed
+QUEUE_SIZE_DEFAULT = 100
+
+# The default maximum count of pages of an author requested at once
+PREFETCH_DEFAULT = 4
+
 
 class HabrParser:
     URL_POST = "https://habr.com/ru/post/{post_number}"
@@ -21,19 +36,66 @@ class HabrParser:
     DATETIME_KEY = "date-time_published"
     TITLE_CLASS = "post__title-text"
     TEXT_CLASS = "post__text"
+    LINK_CLASS = "post__title_link"
 
     def __init__(self,
                  database: Database,
-                 timeout: int = 3,
-                 concurrent: int = 1):
+                 rate: float = RATE_DEFAULT,
+                 min_rate: float = MIN_RATE_DEFAULT,
+                 max_rate: float = MAX_RATE_DEFAULT,
+                 retries: int = RETRIES_DEFAULT,
+                 concurrent: int = 1,
+                 per_host: int = None,
+                 request_timeout: float = REQUEST_TIMEOUT_DEFAULT,
+                 extract_workers: int = None,
+                 queue_size: int = QUEUE_SIZE_DEFAULT,
+                 prefetch: int = PREFETCH_DEFAULT,
+                 state: CrawlState = None,
+                 cache: ResponseCache = None,
+                 index: str = None):
         """
         :param database: the object of Database
-        :param timeout: timeout to make request in seconds
+        :param rate: the initial rate of requests to a host per second, it's adapted to responses of the host
+                     between min_rate and max_rate to avoid a ban. Requests aren't spaced if it's None
+        :param min_rate: the minimum rate of requests to a host per second
+        :param max_rate: the maximum rate of requests to a host per second
+        :param retries: count of repeated requests after throttled or failed ones
         :param concurrent: count of concurrent tasks: it may be speed up the process of parsing
+        :param per_host: the maximum count of requests to one host executed at once, it equals concurrent if it's None
+        :param request_timeout: the timeout of a request in seconds
+        :param extract_workers: count of processes extracting data from pages, it's the count of CPUs if it's None
+        :param queue_size: the maximum count of links waiting to be fetched, the reading of pages of authors
+                           is paused when it's reached
+        :param prefetch: the maximum count of pages of an author requested at once
+        :param state: the progress of the crawl, an interrupted crawl is resumed from it
+        :param cache: the cache of responses, unchanged pages aren't downloaded again
+        :param index: the name of the index of the database where posts are uploaded, posts that are already
+                      stored in it aren't requested. All the posts are requested if it's None
         """
+        if queue_size <= 0:
+            raise ValueError("The size of the queue must be positive")
+        if prefetch <= 0:
+            raise ValueError("The count of prefetched pages must be positive")
+        if index is not None and database is None:
+            raise ValueError("The database must be specified to skip posts stored in the index")
+
         self._database = database
-        self._timeout = timeout
+        self._rate = rate
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._retries = retries
         self._concurrent = concurrent
+        self._per_host = per_host
+        self._request_timeout = request_timeout
+        self._extract_workers = extract_workers
+        self._queue_size = queue_size
+        self._prefetch = prefetch
+        self._state = state
+        self._cache = cache
+        self._index = index
+
+        # Pages are parsed in other processes, so the event loop isn't blocked while requests are waited
+        self._executor = None
 
         # The count of processed and indexed posts
         self._count = 0
@@ -47,119 +109,294 @@ class HabrParser:
         Gets articles from Habr.com by the authors' names.
 
         :param authors: the names of authors
-        :param save_to: filename in .csv format where data will be serialized
+        :param save_to: filename in .csv format where data will be serialized, posts are written as soon as
+                        they're parsed
         :param max_count: the maximum count of articles per an author
-        :return: a DataFrame object containing the 'post_number', 'author' and 'text' columns
+        :return: a DataFrame object containing the 'post_number', 'author' and 'text' columns, it contains
+                 posts parsed by previous runs of the crawl too if the state of the crawl is used
         """
         # Run a timer
         logging.warning("Parsing beginning...")
         begin_time = datetime.now()
 
-        tasks = []
-        for sublist_authors in get_sublists(authors, self._concurrent):
-            tasks.append(self._get_links_by_authors(sublist_authors, max_count))
-        links = np.hstack(await asyncio.gather(*tasks)).tolist()
+        values = self._state.get_posts(authors) if self._state is not None else []
+        if values:
+            logging.warning(f"{len(values)} posts were parsed before, the crawl is resumed")
 
-        tasks = []
-        for sublist_links in get_sublists(links, self._concurrent):
-            tasks.append(self._parse(sublist_links))
-        values = np.vstack(await asyncio.gather(*tasks))
+        file = open(save_to, 'w', newline='', encoding='utf-8') if save_to else None
+        try:
+            writer = csv.writer(file) if file else None
+            if writer:
+                writer.writerow(POSTS_COLUMNS)
+                writer.writerows(values)
 
-        dataframe = pd.DataFrame(np.vstack(values), columns=['post_number', 'author', 'text', 'title', 'link'])
+            async for post in self.iter_posts(authors, max_count):
+                values.append(post)
+                if writer:
+                    writer.writerow(post)
+        finally:
+            if file:
+                file.close()
+
+        dataframe = pd.DataFrame(values, columns=POSTS_COLUMNS)
 
         # Stop the timer
         logging.warning('Parsing was completed')
         logging.warning(f'Work time: {datetime.now() - begin_time}')
 
-        # Serialize into a .csv file
-        if save_to:
-            dataframe.to_csv(save_to, index=False)
-
         return dataframe
 
-    async def _get_links_by_authors(self, authors: list[str], max_count: int) -> list[str]:
+    async def iter_posts(self, authors: list[str], max_count: int = None):
         """
-        Gets a list of links of Habr articles by the author's name.
+        Asynchronous generator of posts of the authors. Links to posts are put into a bounded queue as soon as
+        they're found on pages of authors, and workers fetch posts from the queue, so posts are yielded while
+        pages of authors are still being read. The order of posts isn't preserved. If the state of the crawl
+        is used, posts parsed by previous runs aren't requested and yielded again. If the index is specified,
+        posts already stored in it are skipped too.
 
-        :param authors: a list of authors' names
+        :param authors: the names of authors
         :param max_count: the maximum count of articles per an author
-        :return: a list of links
+        :return: asynchronous generator of tuples of 'post_number', 'author', 'text', 'title' and 'link' values
+        """
+        results = asyncio.Queue(self._queue_size)
+        crawl = asyncio.ensure_future(self._crawl(authors, max_count, results))
+        try:
+            while True:
+                getter = asyncio.ensure_future(results.get())
+                await asyncio.wait([getter, crawl], return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                    continue
+
+                # All the posts are put into the queue when the crawl is completed
+                getter.cancel()
+                while not results.empty():
+                    yield results.get_nowait()
+                crawl.result()
+                break
+        finally:
+            if not crawl.done():
+                crawl.cancel()
+                await asyncio.gather(crawl, return_exceptions=True)
+
+    async def _crawl(self, authors: list[str], max_count: int, results: asyncio.Queue):
+        """
+        Runs tasks reading pages of authors and workers fetching posts. All the tasks share the pool of connections
+        and the pool of processes.
+        """
+        # Each task takes the next author when it has read all the pages of the previous one
+        authors = deque(authors)
+        links = asyncio.Queue(self._queue_size)
+
+        try:
+            with ProcessPoolExecutor(self._extract_workers) as self._executor:
+                async with Fetcher(concurrent=self._concurrent, per_host=self._per_host,
+                                   timeout=self._request_timeout, cache=self._cache, rate=self._rate,
+                                   min_rate=self._min_rate, max_rate=self._max_rate,
+                                   retries=self._retries) as fetcher:
+                    producers = [asyncio.ensure_future(self._put_links(fetcher, authors, max_count, links))
+                                 for _ in range(min(self._concurrent, len(authors)))]
+                    workers = [asyncio.ensure_future(self._get_posts(fetcher, links, results))
+                               for _ in range(self._concurrent)]
+                    try:
+                        await asyncio.gather(*producers)
+                        # Each worker stops when it gets None
+                        for _ in workers:
+                            await links.put(None)
+                        await asyncio.gather(*workers)
+                    finally:
+                        for task in producers + workers:
+                            task.cancel()
+                        await asyncio.gather(*producers, *workers, return_exceptions=True)
+        finally:
+            self._executor = None
+
+    async def _put_links(self, fetcher: Fetcher, authors: deque, max_count: int, links: asyncio.Queue):
+        """
+        Puts links of Habr articles of authors into the queue. It waits if the queue is full.
+
+        :param fetcher: the Fetcher object making requests
+        :param authors: a queue of authors' names shared by tasks
+        :param max_count: the maximum count of articles per an author
+        :param links: the queue of links
         """
         if max_count is None:
             max_count = 10**10
 
-        all_links = []
-        for author in authors:
-            author_links = []
-            page_number = 1
-            while True:
-                url = self.URL_USER.format(username=author, page_number=page_number)
-                response = requests.get(url)
-
-                if response.status_code == 200:
-                    bs = bs4.BeautifulSoup(response.text, features='html.parser')
-                    links = [link.get('href') for link in bs.find_all('a', class_='post__title_link')]
-                    if links:
-                        author_links.extend(links)
-                        if len(author_links) > max_count:
-                            break
-                    else:
-                        break
-                else:
+        while authors:
+            author = authors.popleft()
+
+            # All the links of the author were saved by a previous run
+            if self._state is not None and self._state.is_listed(author):
+                for link in await self._skip_indexed(self._state.get_pending_links(author)):
+                    await links.put(link)
+                continue
+
+            completed = await self._put_author_links(fetcher, author, max_count, links)
+            if self._state is not None and completed:
+                self._state.set_listed(author)
+
+    async def _put_author_links(self, fetcher: Fetcher, author: str, max_count: int, links: asyncio.Queue) -> bool:
+        """
+        Puts links from pages of the author into the queue. The next pages are requested while the current one
+        is processed, the count of them is limited by the prefetch parameter and by the count of pages needed
+        to get max_count links. Pages requested after the last one are cancelled.
+
+        :return: False if pages weren't read completely because a request failed
+        """
+        get_url = self.URL_USER.format
+        count = 0
+        page_number = 1
+        # The first page is requested alone, the count of links per page is unknown before it
+        requests = {1: asyncio.ensure_future(fetcher.fetch(get_url(username=author, page_number=1)))}
+        try:
+            while count < max_count:
+                response = await requests.pop(page_number)
+                if response.status != 200:
+                    # Pages weren't read completely if a request failed, they're read again by the next run
+                    return response.status == 404
+
+                page_links = await self._extract(extract_links, response.text)
+                if not page_links:
                     break
 
+                page_links = page_links[:max_count - count]
+                new_links = [link for link in page_links
+                             if self._state is None or self._state.add_link(author, link)]
+                for link in await self._skip_indexed(new_links):
+                    await links.put(link)
+                count += len(page_links)
                 page_number += 1
 
-            all_links.extend(author_links[:max_count])
+                # Request the next pages that may be needed
+                needed = math.ceil((max_count - count) / len(page_links))
+                for number in range(page_number, page_number + min(self._prefetch, needed)):
+                    if number not in requests:
+                        requests[number] = asyncio.ensure_future(fetcher.fetch(get_url(username=author,
+                                                                                       page_number=number)))
+        finally:
+            for request in requests.values():
+                request.cancel()
+            await asyncio.gather(*requests.values(), return_exceptions=True)
 
-        return all_links
+        return True
 
-    async def _parse(self, links: list[str]) -> np.ndarray:
+    async def _skip_indexed(self, links: list[str]) -> list[str]:
+        """
+        Returns links of posts that aren't stored in the index yet. All the links are checked by one
+        multi-get request executed in another thread.
+        """
+        if self._index is None or not links:
+            return links
+
+        post_numbers = [link.split('/')[-2] for link in links]
+        existing = await asyncio.get_running_loop().run_in_executor(None, self._database.get_existing_ids,
+                                                                    self._index, post_numbers)
+        if existing:
+            logging.warning(f"{len(existing)} posts are already in the index '{self._index}' and are skipped")
+            if self._state is not None:
+                for link, post_number in zip(links, post_numbers):
+                    if post_number in existing:
+                        self._state.set_done(link)
+
+        return [link for link, post_number in zip(links, post_numbers) if post_number not in existing]
+
+    async def _get_posts(self, fetcher: Fetcher, links: asyncio.Queue, results: asyncio.Queue):
         """
-        Parses web sites and returns a list of values representing 'post_number', 'author' and 'text' columns.
+        Takes links from the queue until it gets None, parses posts and puts values of 'post_number', 'author',
+        'text', 'title' and 'link' columns into the queue of results.
 
-        :param links: a list of links that must be parsed
-        :return: numpy.ndarray containing post_number', 'author' and 'text' values for the each link
+        :param fetcher: the Fetcher object making requests
+        :param links: the queue of links
+        :param results: the queue of parsed posts
         """
         # A counter of incorrect requests
         incorrect_count = 0
-        # A list of finish values
-        values = []
 
-        for link in links:
+        while True:
+            link = await links.get()
+            if link is None:
+                break
+            # Links are skipped after too many incorrect requests, but the queue is drained
+            if incorrect_count >= self._limit_incorrect:
+                continue
+
             post_number = link.split('/')[-2]
 
-            response = requests.get(link)
+            response = await fetcher.fetch(link)
 
-            if response.status_code == 200:
+            if response.status == 200:
                 # Reset the counter
                 # If the counter becomes equal to self._limit_incorrect, parsing ends
                 incorrect_count = 0
 
-                # The count of correct parsed posts
-                self._count += 1
-
-                bs = bs4.BeautifulSoup(response.text, features='html.parser')
-                author = bs.find(class_=self.USERNAME_CLASS).text
-                title = bs.find(class_=self.TITLE_CLASS).text
-                text = bs.find(class_=self.TEXT_CLASS).text
+                post = await self._extract(extract_post, response.text)
+                if post is not None:
+                    # The count of correct parsed posts
+                    self._count += 1
+                    author, title, text = post
 
-                logging.warning(f"(#{self._count}) id={post_number} {author}: {title}")
+                    logging.warning(f"(#{self._count}) id={post_number} {author}: {title}")
 
-                values.append((post_number, author, text, title, link))
+                    post = (post_number, author, text, title, link)
+                    if self._state is not None:
+                        self._state.set_done(link, post)
+                    await results.put(post)
+                else:
+                    logging.warning(f"(#{self._count}) id={post_number} The page has no post")
+                    if self._state is not None:
+                        self._state.set_done(link)
 
-            elif response.status_code == 404:
+            elif response.status == 404:
                 logging.warning(f"(#{self._count}) id={post_number} Error 404")
+                if self._state is not None:
+                    self._state.set_done(link)
 
                 # Increase the counter of incorrect requests
                 incorrect_count += 1
-
-                if incorrect_count == self._limit_incorrect:
-                    break
             else:
-                logging.warning(f"(#{self._count}) id={post_number} Error {response.status_code}")
-
-            # Take the timeout to avoid a ban
-            await asyncio.sleep(self._timeout + random.randint(0, 5) * random.random())
+                logging.warning(f"(#{self._count}) id={post_number} Error {response.status}")
 
-        return np.vstack(values)
+    async def _extract(self, function, html: str):
+        """
+        Calls the function extracting data from the page in the pool of processes.
+        """
+        if self._executor is None:
+            return function(html)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, html)
+
+
+def has_classes(*names: str):
+    """
+    Returns a filter of the class attribute for BeautifulSoup. It matches a node if the node has all the classes
+    of any of the names, other classes of the node are ignored, so the order of classes and additional ones
+    in the markup don't matter.
+
+    :param names: names of classes, a name may contain several classes separated by spaces
+    """
+    required = [set(name.split()) for name in names]
+    return lambda value: value is not None and any(classes <= set(value.split()) for classes in required)
+
+
+def extract_links(html: str) -> list[str]:
+    """
+    Returns links to posts from a page of posts of an author. Only the links are parsed, the rest of the page
+    is skipped.
+    """
+    link_class = has_classes(HabrParser.LINK_CLASS)
+    bs = bs4.BeautifulSoup(html, features=HTML_PARSER, parse_only=bs4.SoupStrainer('a', class_=link_class))
+    return [link.get('href') for link in bs.find_all('a', class_=link_class)]
+
+
+def extract_post(html: str):
+    """
+    Returns the author, the title and the text of a post or None if the page has no post. Only the nodes
+    containing them are parsed, the rest of the page is skipped.
+    """
+    classes = [HabrParser.USERNAME_CLASS, HabrParser.TITLE_CLASS, HabrParser.TEXT_CLASS]
+    bs = bs4.BeautifulSoup(html, features=HTML_PARSER, parse_only=bs4.SoupStrainer(class_=has_classes(*classes)))
+
+    nodes = [bs.find(class_=has_classes(name)) for name in classes]
+    if any(node is None for node in nodes):
+        return None
+    return tuple(node.text for node in nodes)
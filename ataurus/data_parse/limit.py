@@ -0,0 +1,143 @@
+"""
+Module contains the adaptive limiting of requests to a host. Requests are spaced by a token bucket whose rate
+grows while responses are healthy and halves when the host throttles requests or fails, the count of requests
+executed at once is adapted the same way.
+"""
+import time
+import asyncio
+from email.utils import parsedate_to_datetime
+
+# The default rates of requests to a host per second: the initial one and the bounds of adapted ones
+RATE_DEFAULT = 2.0
+MIN_RATE_DEFAULT = 0.1
+MAX_RATE_DEFAULT = 20.0
+
+# The growth of the rate after each healthy response and the ratio of the rate after a failed one
+RATE_INCREASE = 0.1
+RATE_DECREASE = 0.5
+
+# The maximum time in seconds the host may ask to wait by the Retry-After header
+MAX_RETRY_AFTER = 600
+
+# Statuses meaning that the host is overloaded or throttles requests, such requests are retried
+THROTTLED_STATUSES = (429, 500, 502, 503, 504)
+
+
+def get_retry_after(headers) -> float:
+    """
+    Returns the time in seconds from the Retry-After header, it may contain either seconds or a date.
+    Returns None if there is no correct header.
+    """
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+
+    return min(max(seconds, 0), MAX_RETRY_AFTER)
+
+
+class HostLimiter:
+    def __init__(self,
+                 rate: float = RATE_DEFAULT,
+                 min_rate: float = MIN_RATE_DEFAULT,
+                 max_rate: float = MAX_RATE_DEFAULT,
+                 concurrency: int = 1):
+        """
+        Limits requests to one host. Each request takes a token from the bucket, tokens are added with the rate
+        of requests per second. The rate grows by RATE_INCREASE after each healthy response up to max_rate and
+        it's multiplied by RATE_DECREASE after each throttled or failed one down to min_rate. The count of requests
+        executed at once is increased by one after as many healthy responses as requests are allowed at once,
+        and it's halved after a throttled or failed one.
+
+        :param rate: the initial rate of requests per second, requests aren't spaced if it's None
+        :param min_rate: the minimum rate of requests per second
+        :param max_rate: the maximum rate of requests per second
+        :param concurrency: the maximum count of requests executed at once
+        """
+        if rate is not None and not (0 < min_rate <= rate <= max_rate):
+            raise ValueError("The rate of requests must be positive and lie between the minimum and maximum rates")
+        if concurrency <= 0:
+            raise ValueError("The count of concurrent requests must be positive")
+
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_concurrency = concurrency
+        self.concurrency = concurrency
+        self.active = 0
+
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._successes = 0
+        self._released = asyncio.Event()
+
+    async def acquire(self):
+        """
+        Waits until the request may be executed. Each acquire must be followed by release.
+        """
+        while self.active >= self.concurrency:
+            self._released.clear()
+            await self._released.wait()
+        self.active += 1
+
+        try:
+            while True:
+                now = time.monotonic()
+                delay = self._blocked_until - now
+                if delay <= 0:
+                    if self.rate is None:
+                        return
+
+                    # Only one token is kept, so requests are spaced evenly
+                    self._tokens = min(1.0, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    delay = (1 - self._tokens) / self.rate
+
+                await asyncio.sleep(delay)
+        except BaseException:
+            self.cancel()
+            raise
+
+    def cancel(self):
+        """
+        Frees the acquired request without adapting limits, it's called if the request was cancelled.
+        """
+        self.active -= 1
+        self._released.set()
+
+    def release(self, status: int, retry_after: float = None):
+        """
+        Adapts limits by the result of the request.
+
+        :param status: the status of the response or None if the request failed
+        :param retry_after: the time in seconds the host asked to wait
+        """
+        self.active -= 1
+
+        if status is None or status in THROTTLED_STATUSES:
+            self._successes = 0
+            self.concurrency = max(1, self.concurrency // 2)
+            if self.rate is not None:
+                self.rate = max(self.min_rate, self.rate * RATE_DECREASE)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        else:
+            self._successes += 1
+            if self._successes >= self.concurrency:
+                self._successes = 0
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            if self.rate is not None:
+                self.rate = min(self.max_rate, self.rate + RATE_INCREASE)
+
+        self._released.set()
@@ -0,0 +1,129 @@
+"""
+Module contains the on-disk state of crawls kept in SQLite databases: the progress of a crawl allowing to resume
+it after a failure, and the cache of responses allowing to request unchanged pages conditionally.
+"""
+import sqlite3
+from collections import namedtuple
+
+CachedResponse = namedtuple('CachedResponse', ['etag', 'last_modified', 'text'])
+
+
+class _SQLiteStore:
+    SCHEMA = ''
+
+    def __init__(self, filename: str):
+        """
+        :param filename: the name of the SQLite file, it's created if it doesn't exist
+        """
+        self.filename = filename
+        # Each change is committed at once, so nothing is lost if the process is killed
+        self._connection = sqlite3.connect(filename, isolation_level=None, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(self.SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class CrawlState(_SQLiteStore):
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS authors (author TEXT PRIMARY KEY);
+        CREATE TABLE IF NOT EXISTS links (link TEXT PRIMARY KEY, author TEXT NOT NULL, done INTEGER NOT NULL DEFAULT 0);
+        CREATE TABLE IF NOT EXISTS posts (link TEXT PRIMARY KEY, post_number TEXT, author TEXT, text TEXT, title TEXT);
+        CREATE INDEX IF NOT EXISTS links_author ON links (author, done);
+    '''
+
+    def __init__(self, filename: str):
+        """
+        The progress of a crawl: authors whose all the pages were read, found links and parsed posts.
+        A crawl started again with the same state skips everything that was done.
+
+        :param filename: the name of the SQLite file, it's created if it doesn't exist
+        """
+        super().__init__(filename)
+
+    def is_listed(self, author: str) -> bool:
+        """
+        Returns True if all the pages of the author were read and all the links were saved.
+        """
+        return self._connection.execute('SELECT 1 FROM authors WHERE author = ?', (author,)).fetchone() is not None
+
+    def set_listed(self, author: str):
+        self._connection.execute('INSERT OR IGNORE INTO authors VALUES (?)', (author,))
+
+    def add_link(self, author: str, link: str) -> bool:
+        """
+        Saves the found link of a post of the author.
+
+        :return: True if the post of the link must be requested
+        """
+        self._connection.execute('INSERT OR IGNORE INTO links (link, author) VALUES (?, ?)', (link, author))
+        return not self._connection.execute('SELECT done FROM links WHERE link = ?', (link,)).fetchone()[0]
+
+    def get_pending_links(self, author: str) -> list[str]:
+        """
+        Returns saved links of the author whose posts weren't requested successfully.
+        """
+        rows = self._connection.execute('SELECT link FROM links WHERE author = ? AND done = 0 ORDER BY rowid',
+                                        (author,))
+        return [link for link, in rows]
+
+    def set_done(self, link: str, post: tuple = None):
+        """
+        Marks the link as requested and saves the post if it was parsed.
+
+        :param link: the link of the post
+        :param post: values of 'post_number', 'author', 'text', 'title' and 'link' columns or None
+        """
+        with self._connection:
+            self._connection.execute('BEGIN')
+            if post is not None:
+                post_number, author, text, title, _ = post
+                self._connection.execute('INSERT OR REPLACE INTO posts VALUES (?, ?, ?, ?, ?)',
+                                         (link, post_number, author, text, title))
+            self._connection.execute('UPDATE links SET done = 1 WHERE link = ?', (link,))
+
+    def get_posts(self, authors: list[str]) -> list[tuple]:
+        """
+        Returns saved posts found on pages of the authors.
+
+        :return: a list of tuples of 'post_number', 'author', 'text', 'title' and 'link' values
+        """
+        placeholders = ', '.join('?' * len(authors))
+        rows = self._connection.execute(f'SELECT posts.post_number, posts.author, posts.text, posts.title, posts.link '
+                                        f'FROM posts JOIN links ON posts.link = links.link '
+                                        f'WHERE links.author IN ({placeholders}) ORDER BY links.rowid', list(authors))
+        return rows.fetchall()
+
+
+class ResponseCache(_SQLiteStore):
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, text TEXT);
+    '''
+
+    def __init__(self, filename: str):
+        """
+        The cache of pages having the ETag or the Last-Modified header. Cached pages are requested again
+        with the If-None-Match and If-Modified-Since headers, so unchanged pages aren't downloaded.
+
+        :param filename: the name of the SQLite file, it's created if it doesn't exist
+        """
+        super().__init__(filename)
+
+    def get(self, url: str):
+        """
+        Returns the CachedResponse object or None if the page isn't cached.
+        """
+        row = self._connection.execute('SELECT etag, last_modified, text FROM responses WHERE url = ?',
+                                       (url,)).fetchone()
+        return CachedResponse(*row) if row is not None else None
+
+    def put(self, url: str, etag: str, last_modified: str, text: str):
+        self._connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)',
+                                 (url, etag, last_modified, text))
@@ -1,10 +1,44 @@
 import sys
+import json
 import elasticsearch
 import pandas as pd
 import time
-from elasticsearch_dsl import Search
+import uuid
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from tqdm import tqdm
 
+# Fields of articles uploaded to the index
+UPLOADED_FIELDS = ['author', 'text', 'title', 'link']
+
+# The field containing the time of uploading of a document in milliseconds, it allows to read only changed documents
+INDEXED_AT_FIELD = 'indexed_at'
+
+# The keyword copy of the id of a document. Documents uploaded at the same time are sorted by it, because sorting
+# by the '_id' field is deprecated and loads all the ids into the memory of the cluster
+DOC_ID_FIELD = 'doc_id'
+
+# Default parameters of reading of indexes by the sliced scroll
+SLICES_DEFAULT = 4
+BATCH_SIZE_DEFAULT = 1000
+SCROLL_DEFAULT = '5m'
+
+# Default parameters of bulk uploading
+CHUNK_SIZE_DEFAULT = 500
+MAX_CHUNK_BYTES_DEFAULT = 10 * 1024 * 1024
+THREAD_COUNT_DEFAULT = 4
+MAX_RETRIES_DEFAULT = 3
+INITIAL_BACKOFF_DEFAULT = 0.5
+MAX_BACKOFF_DEFAULT = 30
+
+# Statuses of documents that may be accepted by the cluster later
+RETRIED_STATUSES = (429, 502, 503, 504)
+
+# The result of uploading: the count of uploaded documents and a list of errors of failed documents
+BulkResult = namedtuple('BulkResult', ['success', 'errors'])
+
 
 class Database:
     def __init__(self):
@@ -41,20 +75,200 @@ class Database:
         :param index: the name of index containing documents
         :return: tuple of list of authors, list of texts
         """
-        # Update the index before processing
-        self.connection.indices.refresh(index=index)
-
-        search = Search(index=index, using=self.connection).query("match_all")
         authors, texts, titles, links = [], [], [], []
-        for hit in search.scan():
-            authors.append(hit['author'])
-            texts.append(hit['text'])
-            titles.append(hit['title'])
-            links.append(hit['link'])
+        for batch in self.iter_batches(index, refresh=True):
+            authors.extend(batch['author'])
+            texts.extend(batch['text'])
+            titles.extend(batch['title'])
+            links.extend(batch['link'])
 
         return authors, texts, titles, links
 
-    def upload_dataframe(self, index: str, dataframe: pd.DataFrame, verbose=False):
+    def iter_batches(self,
+                     index: str,
+                     fields: list[str] = None,
+                     slices: int = SLICES_DEFAULT,
+                     batch_size: int = BATCH_SIZE_DEFAULT,
+                     scroll: str = SCROLL_DEFAULT,
+                     refresh: bool = False):
+        """
+        Generator of batches of documents of the index. The scroll is split into slices read concurrently by
+        threads, so a batch is yielded as soon as it's received while other batches are still in flight.
+        Only the specified fields of documents are transferred.
+
+        :param index: the name of index containing documents
+        :param fields: fields of documents, UPLOADED_FIELDS are taken if it's None
+        :param slices: count of slices of the scroll read concurrently
+        :param batch_size: the maximum count of documents in a batch
+        :param scroll: the time the cluster keeps the context of the scroll between requests
+        :param refresh: refresh the index before reading, so recently uploaded documents are read too
+        :return: generator of DataFrame objects containing the fields of documents, missing fields are None
+        """
+        if slices <= 0 or batch_size <= 0:
+            raise ValueError("The count of slices and the size of batches must be positive")
+
+        fields = list(fields) if fields is not None else UPLOADED_FIELDS
+        if refresh:
+            self.connection.indices.refresh(index=index)
+
+        # Batches are passed through the bounded queue, so slices don't read faster than batches are processed
+        batches = queue.Queue(maxsize=2 * slices)
+        stopped = threading.Event()
+        threads = [threading.Thread(target=self._read_slice,
+                                    args=(index, fields, slice_id, slices, batch_size, scroll, batches, stopped),
+                                    daemon=True)
+                   for slice_id in range(slices)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            finished = 0
+            while finished < slices:
+                batch = batches.get()
+                if batch is None:
+                    finished += 1
+                elif isinstance(batch, Exception):
+                    raise batch
+                else:
+                    yield pd.DataFrame(batch, columns=fields)
+        finally:
+            stopped.set()
+            # Unblock threads waiting for free space in the queue
+            while any(thread.is_alive() for thread in threads):
+                try:
+                    batches.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+    def iter_changes(self,
+                     index: str,
+                     after: list = None,
+                     fields: list[str] = None,
+                     batch_size: int = BATCH_SIZE_DEFAULT,
+                     refresh: bool = True,
+                     untimed: bool = True):
+        """
+        Generator of batches of documents sorted by the time of their uploading (the INDEXED_AT_FIELD field)
+        and ids (the DOC_ID_FIELD field). The position in the index is passed by the search_after parameter,
+        so reading may be continued from the last read document later.
+
+        Documents uploaded without the time have no position, so they're read first by the scroll while the time
+        of the last read document is 0. Their sort values are [0, ''].
+
+        :param index: the name of index containing documents
+        :param after: the sort values of the last read document, documents are read from the beginning if it's None
+        :param fields: fields of documents, UPLOADED_FIELDS are taken if it's None
+        :param batch_size: the maximum count of documents in a batch
+        :param refresh: refresh the index before reading, so recently uploaded documents are read too
+        :param untimed: read documents without the time, otherwise only documents with the time are read
+        :return: generator of tuples of DataFrame objects containing the '_id' column and the fields of documents,
+                 and the sort values of the last document of the batch
+        """
+        if batch_size <= 0:
+            raise ValueError("The size of batches must be positive")
+
+        fields = list(fields) if fields is not None else UPLOADED_FIELDS
+        if refresh:
+            self.connection.indices.refresh(index=index)
+
+        def get_batch(hits):
+            return pd.DataFrame([[hit['_id']] + [hit['_source'].get(field) for field in fields] for hit in hits],
+                                columns=['_id'] + fields)
+
+        if untimed and (after is None or after[0] == 0):
+            body = {
+                'size': batch_size,
+                '_source': fields,
+                'query': {'bool': {'must_not': {'exists': {'field': INDEXED_AT_FIELD}}}},
+                'sort': ['_doc']
+            }
+            scroll_id = None
+            try:
+                response = self.connection.search(index=index, body=body, scroll=SCROLL_DEFAULT)
+                scroll_id = response.get('_scroll_id')
+                while response['hits']['hits']:
+                    yield get_batch(response['hits']['hits']), [0, '']
+                    response = self.connection.scroll(scroll_id=scroll_id, scroll=SCROLL_DEFAULT)
+                    scroll_id = response.get('_scroll_id', scroll_id)
+            finally:
+                if scroll_id is not None:
+                    self.connection.clear_scroll(scroll_id=scroll_id, ignore=(404,))
+        if after is not None and after[0] == 0:
+            after = None
+
+        body = {
+            'size': batch_size,
+            '_source': fields,
+            'query': {'exists': {'field': INDEXED_AT_FIELD}},
+            'sort': [{INDEXED_AT_FIELD: {'order': 'asc', 'unmapped_type': 'long'}},
+                     {DOC_ID_FIELD: {'order': 'asc', 'unmapped_type': 'keyword'}}]
+        }
+        while True:
+            if after is not None:
+                body['search_after'] = after
+
+            hits = self.connection.search(index=index, body=body)['hits']['hits']
+            if not hits:
+                break
+
+            after = hits[-1]['sort']
+            yield get_batch(hits), after
+
+    def get_existing_ids(self, index: str, ids: list[str], batch_size: int = BATCH_SIZE_DEFAULT) -> set[str]:
+        """
+        Checks which documents exist in the index by multi-get requests without their sources.
+
+        :param index: the name of index
+        :param ids: ids of documents
+        :param batch_size: the maximum count of ids checked by one request
+        :return: a set of ids of existing documents, it's empty if the index doesn't exist
+        """
+        if batch_size <= 0:
+            raise ValueError("The size of batches must be positive")
+
+        ids = [str(doc_id) for doc_id in ids]
+        existing = set()
+        for i in range(0, len(ids), batch_size):
+            try:
+                response = self.connection.mget(index=index, body={'ids': ids[i:i + batch_size]}, _source=False)
+            except elasticsearch.NotFoundError:
+                return set()
+
+            existing.update(doc['_id'] for doc in response['docs'] if doc.get('found'))
+
+        return existing
+
+    def _read_slice(self, index: str, fields: list[str], slice_id: int, slices: int, batch_size: int, scroll: str,
+                    batches: queue.Queue, stopped: threading.Event):
+        """
+        Reads one slice of the scroll and puts its batches into the queue. None is put when the slice is read,
+        an exception is put if reading failed.
+        """
+        scroll_id = None
+        try:
+            body = {'size': batch_size, '_source': fields, 'sort': ['_doc']}
+            if slices > 1:
+                body['slice'] = {'id': slice_id, 'max': slices}
+
+            response = self.connection.search(index=index, body=body, scroll=scroll)
+            scroll_id = response.get('_scroll_id')
+            while not stopped.is_set():
+                hits = response['hits']['hits']
+                if not hits:
+                    break
+
+                batches.put([[hit['_source'].get(field) for field in fields] for hit in hits])
+                response = self.connection.scroll(scroll_id=scroll_id, scroll=scroll)
+                scroll_id = response.get('_scroll_id', scroll_id)
+
+            batches.put(None)
+        except Exception as e:
+            batches.put(e)
+        finally:
+            if scroll_id is not None:
+                self.connection.clear_scroll(scroll_id=scroll_id, ignore=(404,))
+
+    def upload_dataframe(self, index: str, dataframe: pd.DataFrame, verbose=False, **kwargs) -> BulkResult:
         """
         Method uploads a DataFrame object into an ElasticSearch cluster. This DataFrame object must contain 'author' and
         'text' columns. The 'post_number' column doesn't require, but if it's specified a document will have the id
@@ -63,25 +277,155 @@ class Database:
         :param index: the name of an index where data will be upload to
         :param dataframe: a DataFrame object containing data
         :param verbose: show a progress bar and other verbosity
+        :param kwargs: parameters of bulk requests, see upload_records()
+        :return: BulkResult containing the count of uploaded documents and errors of failed documents
         """
+        if not {'author', 'text'}.issubset(dataframe.columns):
+            raise ValueError("Uploading dataframe object is incorrect and doesn't contain 'author' or 'text' columns")
+
+        columns = [column for column in UPLOADED_FIELDS + ['post_number'] if column in dataframe.columns]
+        dataframe = dataframe[columns].dropna()
+        records = (dict(zip(columns, row)) for row in dataframe.itertuples(index=False, name=None))
+
+        return self.upload_records(index, records, total=len(dataframe.index), verbose=verbose, **kwargs)
+
+    def upload_records(self,
+                       index: str,
+                       records,
+                       chunk_size: int = CHUNK_SIZE_DEFAULT,
+                       max_chunk_bytes: int = MAX_CHUNK_BYTES_DEFAULT,
+                       thread_count: int = THREAD_COUNT_DEFAULT,
+                       max_retries: int = MAX_RETRIES_DEFAULT,
+                       initial_backoff: float = INITIAL_BACKOFF_DEFAULT,
+                       max_backoff: float = MAX_BACKOFF_DEFAULT,
+                       total: int = None,
+                       verbose=False) -> BulkResult:
+        """
+        Uploads a stream of records into the index by bulk requests sent by several threads. A record is a dictionary
+        containing 'author' and 'text' fields, 'title' and 'link' fields are optional. If a record contains
+        the 'post_number' field, it's used as the id of the document.
+
+        Documents rejected because of overloading of the cluster (429) and chunks failed because of connection errors
+        are sent again with exponential backoff. Other failed documents are collected into errors of the result.
+
+        :param index: the name of an index where data will be upload to
+        :param records: an iterable of dictionaries, it's read lazily
+        :param chunk_size: the maximum count of documents in a bulk request
+        :param max_chunk_bytes: the maximum size of a bulk request in bytes
+        :param thread_count: count of threads sending requests
+        :param max_retries: the maximum count of retries of a document
+        :param initial_backoff: the delay in seconds before the first retry, it's doubled for each following retry
+        :param max_backoff: the maximum delay in seconds before a retry
+        :param total: the count of records for the progress bar
+        :param verbose: show a progress bar and other verbosity
+        :return: BulkResult containing the count of uploaded documents and errors of failed documents
+        """
+        if chunk_size <= 0 or max_chunk_bytes <= 0 or thread_count <= 0:
+            raise ValueError("The size of chunks and count of threads must be positive")
+
         if verbose:
             print('Loading data to the ElasticSearch cluster started...')
-            time.sleep(1)
 
-        for _, row in tqdm(dataframe.dropna().iterrows(), total=len(dataframe.index), disable=(not verbose)):
+        success, errors = 0, []
+        progress = tqdm(total=total, disable=(not verbose))
+
+        def collect(future):
+            nonlocal success
+            chunk_success, chunk_errors = future.result()
+            success += chunk_success
+            errors.extend(chunk_errors)
+            progress.update(chunk_success + len(chunk_errors))
+
+        with ThreadPoolExecutor(thread_count) as executor:
+            # The count of chunks in flight is limited, so the stream isn't read into memory entirely
+            in_flight = set()
+            for chunk in self._get_bulk_chunks(index, records, chunk_size, max_chunk_bytes, errors):
+                if len(in_flight) >= 2 * thread_count:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future)
+
+                in_flight.add(executor.submit(self._send_bulk_chunk, chunk, max_retries, initial_backoff,
+                                              max_backoff))
+
+            for future in in_flight:
+                collect(future)
+
+        progress.close()
+        if verbose and errors:
+            print(f"{len(errors)} documents weren't uploaded, the first error: {errors[0]['error']}", file=sys.stderr)
+
+        return BulkResult(success, errors)
+
+    @staticmethod
+    def _get_bulk_chunks(index: str, records, chunk_size: int, max_chunk_bytes: int, errors: list):
+        """
+        Serializes records into pairs of lines of the bulk API and groups them into chunks limited by the count
+        of documents and the size in bytes. Incorrect records are put into errors.
+        """
+        chunk, size = [], 0
+        for record in records:
+            if record.get('author') is None or record.get('text') is None:
+                errors.append({'_id': record.get('post_number'), 'status': None,
+                               'error': "The record doesn't contain 'author' or 'text' fields"})
+                continue
+
+            # Ids of documents without the number are generated here, so the keyword copy of the id may be written
+            # and retried chunks don't duplicate documents
+            doc_id = str(record['post_number']) if record.get('post_number') is not None else uuid.uuid4().hex
+            action = {'index': {'_index': index, '_id': doc_id}}
+
+            body = {field: record[field] for field in UPLOADED_FIELDS if field in record}
+            body[INDEXED_AT_FIELD] = int(time.time() * 1000)
+            body[DOC_ID_FIELD] = doc_id
+            lines = (json.dumps(action) + '\n' + json.dumps(body, ensure_ascii=False, default=str) + '\n')
+            lines = lines.encode('utf-8')
+
+            if chunk and (len(chunk) >= chunk_size or size + len(lines) > max_chunk_bytes):
+                yield chunk
+                chunk, size = [], 0
+
+            chunk.append(lines)
+            size += len(lines)
+
+        if chunk:
+            yield chunk
+
+    def _send_bulk_chunk(self, chunk: list[bytes], max_retries: int, initial_backoff: float,
+                         max_backoff: float) -> tuple:
+        """
+        Sends a chunk by a bulk request and retries documents that may be accepted later.
+
+        :return: tuple of the count of uploaded documents and a list of errors
+        """
+        success, errors = 0, []
+        for attempt in range(max_retries + 1):
+            if attempt:
+                time.sleep(min(max_backoff, initial_backoff * 2 ** (attempt - 1)))
+
             try:
-                body = {
-                    "author": row["author"],
-                    "text": row['text'],
-                    "title": row['title'],
-                    "link": row['link']
-                }
-            except KeyError:
-                print("Uploading dataframe object is incorrect and doesn't contain 'author' or 'text' columns ",
-                      file=sys.stderr)
-                exit(-1)
-
-            if 'post_number' in row:
-                self.connection.index(index, body=body, id=row["post_number"])
-            else:
-                self.connection.index(index, body=body)
+                response = self.connection.bulk(body=b''.join(chunk))
+            except elasticsearch.TransportError as e:
+                # Connection errors and overloading of the cluster are temporary
+                retried = isinstance(e, elasticsearch.ConnectionError) or e.status_code in RETRIED_STATUSES
+                if not retried or attempt == max_retries:
+                    status = e.status_code if isinstance(e.status_code, int) else None
+                    errors.extend({'_id': None, 'status': status, 'error': str(e)} for _ in chunk)
+                    break
+                continue
+
+            retried = []
+            for lines, item in zip(chunk, response['items']):
+                result = next(iter(item.values()))
+                if result.get('status', 500) < 300:
+                    success += 1
+                elif result['status'] in RETRIED_STATUSES and attempt < max_retries:
+                    retried.append(lines)
+                else:
+                    errors.append({'_id': result.get('_id'), 'status': result['status'], 'error': result.get('error')})
+
+            chunk = retried
+            if not chunk:
+                break
+
+        return success, errors
@@ -0,0 +1,251 @@
+"""
+Module contains the local mirror of an index of Elasticsearch. Documents are stored on the disk as segments of packed
+strings, each synchronization appends only documents uploaded since the checkpoint of the previous one.
+"""
+import os
+import json
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+from database.client import Database, UPLOADED_FIELDS, BATCH_SIZE_DEFAULT, INDEXED_AT_FIELD, DOC_ID_FIELD
+from preparing.corpus import pack_strings, unpack_strings
+
+# The version of the format of mirrors
+MIRROR_FORMAT_VERSION = 1
+
+MANIFEST_FILE = 'mirror.json'
+
+# The default maximum count of documents in a segment
+SEGMENT_SIZE_DEFAULT = 50_000
+
+# Documents uploaded during this time in milliseconds before the checkpoint are read again, because they may become
+# visible after the previous synchronization. Times of mirrored documents of this window are kept in the manifest,
+# so documents read again without changes are skipped
+OVERLAP_DEFAULT = 60_000
+
+# The default count of segments after which they're merged into one
+MAX_SEGMENTS_DEFAULT = 16
+
+ID_COLUMN = '_id'
+
+
+def is_mirror(directory: str) -> bool:
+    return os.path.isfile(os.path.join(directory, MANIFEST_FILE))
+
+
+class IndexMirror:
+    def __init__(self, directory: str):
+        """
+        Local mirror of an index of Elasticsearch. Changed documents are appended as new versions, the last version
+        of a document replaces the previous ones while reading. Deleted documents aren't tracked.
+
+        :param directory: the directory of the mirror, it's created if it doesn't exist
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+        manifest_file = os.path.join(directory, MANIFEST_FILE)
+        if os.path.exists(manifest_file):
+            with open(manifest_file, 'r') as file:
+                self._manifest = json.load(file)
+
+            if self._manifest.get('format') != MIRROR_FORMAT_VERSION:
+                raise ValueError(f"The mirror has the format {self._manifest.get('format')}, "
+                                 f"but only the format {MIRROR_FORMAT_VERSION} is supported")
+        else:
+            self._manifest = {'format': MIRROR_FORMAT_VERSION, 'index': None, 'columns': [ID_COLUMN] + UPLOADED_FIELDS,
+                              'checkpoint': None, 'segments': []}
+
+    @property
+    def index(self) -> str:
+        return self._manifest['index']
+
+    @property
+    def checkpoint(self) -> list:
+        """
+        The sort values of the last synchronized document.
+        """
+        return self._manifest['checkpoint']
+
+    @property
+    def columns(self) -> list[str]:
+        return self._manifest['columns']
+
+    def sync(self,
+             database: Database,
+             index: str,
+             batch_size: int = BATCH_SIZE_DEFAULT,
+             segment_size: int = SEGMENT_SIZE_DEFAULT,
+             overlap: int = OVERLAP_DEFAULT,
+             verbose=False) -> int:
+        """
+        Appends documents uploaded into the index since the previous synchronization. The checkpoint is saved after
+        each segment, so an interrupted synchronization continues from the last saved segment. Documents uploaded
+        without the time have no position, so they're read only until the first synchronization is completed.
+
+        :param database: the connection to the cluster
+        :param index: the name of the index, a mirror may contain only one index
+        :param batch_size: count of documents requested at once
+        :param segment_size: the maximum count of documents in a segment
+        :param overlap: documents uploaded during this time in milliseconds before the checkpoint are read again
+        :param verbose: show a progress bar
+        :return: count of received documents, documents read again without changes aren't counted
+        """
+        if self.index is not None and self.index != index:
+            raise ValueError(f"The mirror contains the index '{self.index}', it can't mirror the index '{index}'")
+        self._manifest['index'] = index
+
+        # Start a bit before the checkpoint, documents uploaded shortly before it may become visible after
+        # the previous synchronization
+        after = self.checkpoint
+        if after is not None and after[0] > 0 and overlap > 0:
+            after = [max(after[0] - overlap, 1), '']
+
+        fields = self.columns[1:] + [DOC_ID_FIELD, INDEXED_AT_FIELD]
+        untimed = not self._manifest.get('untimed_synced', False)
+        received = 0
+        batches, count, checkpoint = [], 0, None
+        progress = tqdm(desc=f'Synchronizing {index}', unit=' documents', disable=(not verbose))
+        for batch, checkpoint in database.iter_changes(index, after=after, fields=fields, batch_size=batch_size,
+                                                       untimed=untimed):
+            progress.update(len(batch.index))
+            batch = self._skip_mirrored(batch, checkpoint[0] - overlap)
+            if batch.empty:
+                continue
+
+            batches.append(batch[self.columns])
+            count += len(batch.index)
+            received += len(batch.index)
+
+            if count >= segment_size:
+                self._append_segment(pd.concat(batches), checkpoint)
+                batches, count = [], 0
+
+        if batches:
+            self._append_segment(pd.concat(batches), checkpoint)
+        elif checkpoint is not None:
+            # Only documents which are already mirrored were read
+            self._manifest['checkpoint'] = checkpoint
+        progress.close()
+        self._manifest['untimed_synced'] = True
+
+        if len(self._manifest['segments']) > MAX_SEGMENTS_DEFAULT:
+            self.compact()
+
+        self._save_manifest()
+        return received
+
+    def _skip_mirrored(self, batch: pd.DataFrame, start: int) -> pd.DataFrame:
+        """
+        Removes documents which are mirrored with the same time of uploading from the batch and remembers times
+        of documents uploaded since the start of the overlap window.
+
+        :param start: the time in milliseconds of the beginning of the overlap window
+        """
+        times = self._manifest.setdefault('times', {})
+        doc_ids = batch[DOC_ID_FIELD].values
+        indexed_at = [None if pd.isnull(value) else int(value) for value in batch[INDEXED_AT_FIELD].values]
+
+        mirrored = np.array([time is not None and times.get(doc_id) == time
+                             for doc_id, time in zip(doc_ids, indexed_at)], dtype=bool)
+        times.update((doc_id, time) for doc_id, time in zip(doc_ids, indexed_at)
+                     if doc_id is not None and time is not None)
+        self._manifest['times'] = {doc_id: time for doc_id, time in times.items() if time >= start}
+        return batch[~mirrored]
+
+    def _segment_path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _append_segment(self, documents: pd.DataFrame, checkpoint: list):
+        segments = self._manifest['segments']
+        number = int(segments[-1].split('-')[1].split('.')[0]) + 1 if segments else 1
+        name = f'segment-{number:06d}.npz'
+
+        self._write_segment(name, documents)
+        segments.append(name)
+        self._manifest['checkpoint'] = checkpoint
+        self._save_manifest()
+
+    def _write_segment(self, name: str, documents: pd.DataFrame):
+        arrays = {}
+        for column in self.columns:
+            values = documents[column].values
+            nulls = pd.isnull(values)
+            buffer, offsets = pack_strings(['' if null else str(value) for value, null in zip(values, nulls)])
+            arrays.update({f'{column}.buffer': buffer, f'{column}.offsets': offsets, f'{column}.nulls': nulls})
+
+        # The segment appears only when it's written completely
+        temporary = self._segment_path(name + '.tmp')
+        with open(temporary, 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(temporary, self._segment_path(name))
+
+    def _save_manifest(self):
+        temporary = os.path.join(self.directory, MANIFEST_FILE + '.tmp')
+        with open(temporary, 'w') as file:
+            json.dump(self._manifest, file, indent=2)
+        os.replace(temporary, os.path.join(self.directory, MANIFEST_FILE))
+
+    def _read_column(self, name: str, column: str) -> np.ndarray:
+        with np.load(self._segment_path(name)) as data:
+            values = np.array(unpack_strings(data[f'{column}.buffer'], data[f'{column}.offsets']), dtype=object)
+            values[data[f'{column}.nulls']] = None
+        return values
+
+    def _get_latest_masks(self) -> list[np.ndarray]:
+        """
+        Returns masks of the last versions of documents for each segment.
+        """
+        ids = [self._read_column(name, ID_COLUMN) for name in self._manifest['segments']]
+        if not ids:
+            return []
+
+        latest = ~pd.Series(np.concatenate(ids)).duplicated(keep='last').values
+        bounds = np.cumsum([0] + [len(segment_ids) for segment_ids in ids])
+        return [latest[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    def iter_chunks(self, chunksize: int, columns: list[str] = None):
+        """
+        Generator of chunks of the last versions of documents. Only one segment is read into memory at once.
+
+        :param chunksize: the maximum count of documents in a chunk
+        :param columns: columns of documents, all the columns are read if it's None
+        :return: generator of DataFrame objects
+        """
+        if chunksize <= 0:
+            raise ValueError("The size of chunks must be positive")
+
+        columns = columns or self.columns
+        for name, mask in zip(self._manifest['segments'], self._get_latest_masks()):
+            segment = pd.DataFrame({column: self._read_column(name, column)[mask] for column in columns},
+                                   columns=columns)
+            for i in range(0, len(segment.index), chunksize):
+                yield segment.iloc[i:i + chunksize].reset_index(drop=True)
+
+    def read(self, columns: list[str] = None) -> pd.DataFrame:
+        """
+        Reads the last versions of all the documents.
+        """
+        columns = columns or self.columns
+        chunks = list(self.iter_chunks(np.iinfo(np.int64).max, columns))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+
+    def compact(self):
+        """
+        Merges all the segments into one containing only the last versions of documents.
+        """
+        segments = self._manifest['segments']
+        if len(segments) <= 1:
+            return
+
+        documents = self.read()
+        name = segments[-1].replace('.npz', '-compacted.npz')
+        self._write_segment(name, documents)
+
+        self._manifest['segments'] = [name]
+        self._save_manifest()
+        for segment in segments:
+            os.remove(self._segment_path(segment))
+
+    def __len__(self):
+        return int(sum(mask.sum() for mask in self._get_latest_masks()))
@@ -6,6 +6,8 @@ class Article(Document):
     text = Text(required=True)
     date = Date()
     author = Keyword(required=True)
+    indexed_at = Date()
+    doc_id = Keyword()
 
     class Index:
         name = 'articles'
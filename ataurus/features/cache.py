@@ -0,0 +1,283 @@
+"""
+Module contains the persistent cache of extracted features. Features of a document are stored by the hash of its text
+and the version of preprocessing and extraction, so a document processed by any previous run isn't processed again.
+"""
+import os
+import json
+import time
+import contextlib
+import sqlite3
+import numpy as np
+from collections import OrderedDict
+from console_handle.utils import CACHE_DIRECTORY, CACHE_CFG_FILE, get_text_hash
+
+# The version of preprocessing and extraction of features. It must be increased after changes of processing that
+# affect values of features, then all the cached features become invalid
+FEATURES_VERSION = '1'
+
+# The default maximum count of documents which features are kept in the cache
+MAX_ENTRIES_DEFAULT = 1_000_000
+
+CACHE_DATABASE = 'features.sqlite'
+
+# The time in seconds a process waits for the lock of the cache held by another process
+LOCK_TIMEOUT = 60
+
+# The default count of documents which features are kept in memory of the process
+MEMO_MAXSIZE_DEFAULT = 200_000
+
+
+class FeaturesCache:
+    def __init__(self,
+                 directory: str = CACHE_DIRECTORY,
+                 max_entries: int = None,
+                 version: str = FEATURES_VERSION):
+        """
+        Content-addressed cache of rows of features. When the count of documents exceeds the limit, the least
+        recently used documents are evicted. The cache may be shared by several processes: the version of processing
+        and the columns of rows are kept in the database and checked within transactions.
+
+        :param directory: the directory where the cache is stored, the configuration of the cache is stored
+                          near this directory as the CACHE_CFG_FILE
+        :param max_entries: the maximum count of documents, it's taken from the configuration if it's None
+        :param version: the version of processing, cached features of other versions are removed
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._cfg_file = os.path.join(os.path.dirname(os.path.normpath(directory)), os.path.basename(CACHE_CFG_FILE))
+        self.version = version
+
+        cfg = self._load_cfg()
+        self.max_entries = max_entries or cfg.get('max_entries', MAX_ENTRIES_DEFAULT)
+        if cfg.get('max_entries') != self.max_entries:
+            self._save_cfg()
+
+        # Transactions are opened explicitly, so checks and changes of the cache are made atomically
+        self._connection = sqlite3.connect(os.path.join(directory, CACHE_DATABASE), timeout=LOCK_TIMEOUT,
+                                           isolation_level=None)
+        with self._transaction():
+            self._connection.execute("CREATE TABLE IF NOT EXISTS features "
+                                     "(key TEXT PRIMARY KEY, row BLOB NOT NULL, accessed REAL NOT NULL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS features_accessed ON features (accessed)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+
+            # Features of other versions can't be used
+            if self._get_meta('version') != version:
+                self._clear()
+                self._set_meta('version', version)
+
+        self.hits = 0
+        self.misses = 0
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """
+        Opens a transaction holding the lock for writing, so other processes can't change the cache between
+        the checks and the changes made within it.
+        """
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def _get_meta(self, name: str):
+        row = self._connection.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def _set_meta(self, name: str, value):
+        self._connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, json.dumps(value)))
+
+    def _load_cfg(self) -> dict:
+        """
+        Returns the configuration of the cache. An unreadable configuration is ignored, it never clears the cache.
+        """
+        try:
+            with open(self._cfg_file, 'r') as file:
+                cfg = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return cfg.get('features', {}) if isinstance(cfg, dict) else {}
+
+    def _save_cfg(self):
+        cfg = {}
+        try:
+            with open(self._cfg_file, 'r') as file:
+                cfg = json.load(file)
+        except (OSError, ValueError):
+            pass
+        if not isinstance(cfg, dict):
+            cfg = {}
+
+        # The file is replaced atomically, so readers never see a partially written configuration
+        cfg['features'] = {'max_entries': self.max_entries}
+        temporary = f'{self._cfg_file}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(cfg, file, indent=2)
+        os.replace(temporary, self._cfg_file)
+
+    @property
+    def columns(self) -> list[str]:
+        """
+        Names of the columns of cached rows, it's None while the cache is empty.
+        """
+        return self._get_meta('columns')
+
+    def keys(self, texts: list[str]) -> list[str]:
+        """
+        Returns keys of the texts in the cache.
+        """
+        return [get_text_hash(text, self.version) for text in texts]
+
+    def get(self, keys: list[str]) -> dict:
+        """
+        Gets cached rows of features.
+
+        :param keys: keys of documents
+        :return: a dictionary of found keys and rows
+        """
+        found = {}
+        unique_keys = list(set(keys))
+
+        # SQLite limits the count of parameters of a query, so keys are requested by parts
+        for i in range(0, len(unique_keys), 500):
+            part = unique_keys[i:i + 500]
+            query = f"SELECT key, row FROM features WHERE key IN ({','.join('?' * len(part))})"
+            for key, row in self._connection.execute(query, part):
+                found[key] = np.frombuffer(row, dtype=np.float64)
+
+        # Mark the found documents as recently used
+        accessed = time.time()
+        with self._transaction():
+            self._connection.executemany("UPDATE features SET accessed = ? WHERE key = ?",
+                                         [(accessed, key) for key in found])
+
+        self.hits += sum(key in found for key in keys)
+        self.misses += sum(key not in found for key in keys)
+
+        return found
+
+    def put(self, keys: list[str], rows: np.ndarray, columns: list[str]):
+        """
+        Puts rows of features into the cache and evicts the least recently used documents if the cache is full.
+
+        :param keys: keys of documents
+        :param rows: matrix of features of shape (n_documents, n_columns)
+        :param columns: names of the columns of features
+        """
+        columns = list(columns)
+        accessed = time.time()
+        rows = np.asarray(rows, dtype=np.float64)
+        with self._transaction():
+            # All the rows in the cache must have the same columns. The columns are checked within the transaction,
+            # so rows put by other processes with the same columns are kept
+            if self._get_meta('columns') != columns:
+                self._clear()
+                self._set_meta('columns', columns)
+
+            self._connection.executemany("INSERT OR REPLACE INTO features (key, row, accessed) VALUES (?, ?, ?)",
+                                         [(key, row.tobytes(), accessed) for key, row in zip(keys, rows)])
+
+            count = self._connection.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+            if count > self.max_entries:
+                self._connection.execute("DELETE FROM features WHERE key IN "
+                                         "(SELECT key FROM features ORDER BY accessed LIMIT ?)",
+                                         (count - self.max_entries,))
+
+    def clear(self):
+        with self._transaction():
+            self._clear()
+
+    def _clear(self):
+        """
+        Removes all the rows and their columns, it must be called within a transaction.
+        """
+        self._connection.execute("DELETE FROM features")
+        self._connection.execute("DELETE FROM meta WHERE name = 'columns'")
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+
+    def close(self):
+        self._connection.close()
+
+    def __getstate__(self):
+        # The connection can't be pickled, so a worker opens the same cache again
+        return self.directory, self.max_entries, self.version
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+
+class FeaturesMemo:
+    def __init__(self, maxsize: int = MEMO_MAXSIZE_DEFAULT):
+        """
+        In-memory cache of rows of features of the process, keys are the same as keys of FeaturesCache.
+        When the memo is full, the least recently used documents are evicted.
+
+        :param maxsize: the maximum count of documents
+        """
+        if maxsize <= 0:
+            raise ValueError("The size of the memo of features must be positive")
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._rows = OrderedDict()
+        self._columns = None
+
+    @property
+    def columns(self) -> list[str]:
+        return self._columns
+
+    def keys(self, texts: list[str]) -> list[str]:
+        return [get_text_hash(text, FEATURES_VERSION) for text in texts]
+
+    def get(self, keys: list[str]) -> dict:
+        """
+        Gets memoized rows of features.
+
+        :param keys: keys of documents
+        :return: a dictionary of found keys and rows
+        """
+        found = {}
+        for key in keys:
+            row = self._rows.get(key)
+            if row is not None:
+                self._rows.move_to_end(key)
+                found[key] = row
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found
+
+    def put(self, keys: list[str], rows: np.ndarray, columns: list[str]):
+        """
+        Memoizes rows of features. All the rows must have the same columns, otherwise the memo is cleared.
+        """
+        columns = list(columns)
+        if self._columns != columns:
+            self.clear()
+            self._columns = columns
+
+        for key, row in zip(keys, np.asarray(rows, dtype=np.float64)):
+            self._rows[key] = row
+            self._rows.move_to_end(key)
+
+        while len(self._rows) > self.maxsize:
+            self._rows.popitem(last=False)
+
+    def clear(self):
+        self._rows.clear()
+        self._columns = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+
+# The memo shared by all the combiners within the process
+FEATURES_MEMO = FeaturesMemo()
@@ -3,6 +3,8 @@ import pandas as pd
 
 from sklearn.base import BaseEstimator, TransformerMixin
 from features.extract import FeaturesExtractor
+from features.cache import FEATURES_MEMO
+from preparing.corpus import CorpusTokens
 from features.features import (AVG_WORDS, AVG_SENTENCES, POS_DISTRIBUTION, PUNCTUATIONS_DISTRIBUTION,
                                        LEXICON_SIZE, FOREIGN_RATIO, FEATURES_DESCRIPTION)
 
@@ -10,7 +12,7 @@ from features.features import (AVG_WORDS, AVG_SENTENCES, POS_DISTRIBUTION, PUNCT
 class FeaturesCombiner(BaseEstimator, TransformerMixin):
     def __init__(self, avg_words=True, avg_sentences=True, pos_distribution=True,
                  foreign_words_ratio=True, lexicon=True, punctuation_distribution=True,
-                 n_jobs=1, verbose=False):
+                 n_jobs=1, batched=True, cache=None, verbose=False):
         """
         Extractor of features matrix. All parameters are flags that specify to include a result of processing
         of each method to the final result.
@@ -21,6 +23,9 @@ class FeaturesCombiner(BaseEstimator, TransformerMixin):
         :param foreign_words_ratio: ratio of foreign words count / count of all words
         :param lexicon: a lexicon size
         :param punctuation_distribution: a distribution of punctuation symbols
+        :param batched: extract features of a chunk of documents in one call of a worker
+        :param cache: the directory of the cache of features (see FeaturesCache) shared by processes. Extracted
+                      features are always memoized in the memory of the process
         """
         self.avg_words = avg_words
         self.avg_sentences = avg_sentences
@@ -29,6 +34,8 @@ class FeaturesCombiner(BaseEstimator, TransformerMixin):
         self.lexicon = lexicon
         self.punctuation_distribution = punctuation_distribution
         self.n_jobs = n_jobs
+        self.batched = batched
+        self.cache = cache
         self.verbose = verbose
 
     def fit(self, X, y=None):
@@ -39,21 +46,29 @@ class FeaturesCombiner(BaseEstimator, TransformerMixin):
             self.X_extracted_ = False
 
         # Create a list of names of extracting features
-        self.features_names_ = []
+        self.features_names_ = self.get_features_names()
+
+        return self
+
+    def get_features_names(self) -> list[str]:
+        """
+        Returns names of the chosen features, which are prefixes of the columns taken from extracted features.
+        """
+        features_names = []
         if self.avg_words:
-            self.features_names_.append(AVG_WORDS)
+            features_names.append(AVG_WORDS)
         if self.avg_sentences:
-            self.features_names_.append(AVG_SENTENCES)
+            features_names.append(AVG_SENTENCES)
         if self.pos_distribution:
-            self.features_names_.append(POS_DISTRIBUTION)
+            features_names.append(POS_DISTRIBUTION)
         if self.foreign_words_ratio:
-            self.features_names_.append(FOREIGN_RATIO)
+            features_names.append(FOREIGN_RATIO)
         if self.lexicon:
-            self.features_names_.append(LEXICON_SIZE)
+            features_names.append(LEXICON_SIZE)
         if self.punctuation_distribution:
-            self.features_names_.append(PUNCTUATIONS_DISTRIBUTION)
+            features_names.append(PUNCTUATIONS_DISTRIBUTION)
 
-        return self
+        return features_names
 
     def transform(self, X):
         if self.verbose:
@@ -65,13 +80,7 @@ class FeaturesCombiner(BaseEstimator, TransformerMixin):
 
         # If a features matrix wasn't prepared, extract tokens, sentences from texts and extract features
         if not self.X_extracted_:
-            texts, tokens, sentences = FeaturesExtractor._retrieve_lists(X)
-
-            features_dict = dict()
-            for feature_name in FEATURES_DESCRIPTION.keys():
-                features_dict[feature_name] = True if feature_name in self.features_names_ else False
-
-            X = FeaturesExtractor._extract(texts, tokens, sentences, n_jobs=self.n_jobs, **features_dict)
+            X = self._extract_memoized(X)
 
         for feature_name in self.features_names_:
             # Get columns corresponding the name of selecting feature
@@ -83,3 +92,42 @@ class FeaturesCombiner(BaseEstimator, TransformerMixin):
             print("Extracting features completed", end='\n\n')
 
         return result
+
+    def _extract_memoized(self, X) -> pd.DataFrame:
+        """
+        Extracts all the features of documents, which features weren't extracted before in this process, and
+        memoizes them, so other folds and candidates of a grid search don't extract them again. All the features
+        are extracted regardless of the chosen ones, then memoized rows fit any combination of features.
+        """
+        if not isinstance(X, CorpusTokens):
+            X = np.asarray(X, dtype=object)
+
+        keys = FEATURES_MEMO.keys(FeaturesExtractor._retrieve_texts(X))
+        found = FEATURES_MEMO.get(keys)
+        # Repeated documents are extracted once
+        misses = list({key: i for i, key in reversed(list(enumerate(keys))) if key not in found}.values())
+
+        if misses:
+            # Workers of joblib share extracted features through the persistent cache
+            extractor = FeaturesExtractor(n_jobs=self.n_jobs, batched=self.batched, cache=self.cache, verbose=False)
+            extracted = extractor.transform(X[misses])
+
+            missed_keys = [keys[i] for i in misses]
+            FEATURES_MEMO.put(missed_keys, extracted.values, extracted.columns)
+            found.update(zip(missed_keys, extracted.values))
+
+        columns = FEATURES_MEMO.columns
+        result = np.vstack([found[key] for key in keys]) if keys else np.empty((0, len(columns or [])))
+        return pd.DataFrame(result, columns=columns)
+
+
+def get_required_features(param_grid: list[dict], step: str = 'combine') -> list[str]:
+    """
+    Returns names of the features chosen by the FeaturesCombiner in at least one combination of the parameters.
+
+    :param param_grid: a list of blocks of parameters of a grid search
+    :param step: the name of the FeaturesCombiner step of the pipeline
+    """
+    param_grid = [param_grid] if isinstance(param_grid, dict) else param_grid
+    return [feature_name for feature_name in FEATURES_DESCRIPTION
+            if any(any(block.get(f'{step}__{feature_name}', [True])) for block in param_grid)]
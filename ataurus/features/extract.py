@@ -1,110 +1,291 @@
 """
 Module represents a class that will process data to extract a matrix of features from it.
 """
+import sys
 import numpy as np
 import pandas as pd
 import features.functions as funcs
 from sklearn.base import BaseEstimator, TransformerMixin
 from preparing.preprocessor import Preprocessor
-from joblib.parallel import Parallel, delayed
+from preparing.corpus import CorpusTokens, DocumentsView
+from features.cache import FeaturesCache
+from joblib.parallel import Parallel, delayed, effective_n_jobs
 from features.features import (AVG_WORDS, AVG_SENTENCES, POS_DISTRIBUTION, PUNCTUATIONS_DISTRIBUTION,
                                LEXICON_SIZE, FOREIGN_RATIO)
 
+# Indexes of the sources of features: the list of texts, the list of tokens and the list of sentences
+TEXTS, TOKENS, SENTENCES = 0, 1, 2
+
+# All the features in the order of columns: the name, the function processing one document, the kernel processing
+# a batch of documents (if it exists), the source and the count of columns
+FEATURES = [
+    (AVG_WORDS, funcs.avg_length, None, TOKENS, 1),
+    (AVG_SENTENCES, funcs.avg_length, None, SENTENCES, 1),
+    (POS_DISTRIBUTION, funcs.pos_distribution, None, TOKENS, len(funcs.POS)),
+    (LEXICON_SIZE, funcs.lexicon, None, TOKENS, 1),
+    (FOREIGN_RATIO, funcs.foreign_words_ratio, None, TOKENS, 1),
+    (PUNCTUATIONS_DISTRIBUTION, funcs.punctuations_distribution, funcs.punctuations_distribution_batch, TEXTS,
+     len(funcs.PUNCTS_NAMES))
+]
+
+# Kernels computing features of the whole corpus at once from the flat arrays of CorpusTokens
+CORPUS_KERNELS = {
+    AVG_WORDS: lambda corpus: funcs.avg_length_batch(corpus.token_lengths(), corpus.token_offsets),
+    AVG_SENTENCES: lambda corpus: funcs.avg_length_batch(corpus.sentence_lengths(), corpus.sentence_offsets),
+    LEXICON_SIZE: lambda corpus: funcs.lexicon_batch(corpus.token_ids, corpus.token_offsets),
+    FOREIGN_RATIO: lambda corpus: funcs.foreign_words_ratio_batch(
+        funcs.foreign_flags(corpus.vocabulary.words)[corpus.token_ids], corpus.token_offsets)
+}
+
+# Count of chunks per a worker in the batched mode: several chunks allow to balance the load between workers
+CHUNKS_PER_JOB = 4
+
 
 class FeaturesExtractor(BaseEstimator, TransformerMixin):
-    def __init__(self, n_jobs=1, verbose=True):
+    def __init__(self, n_jobs=1, batched=True, cache=None, verbose=True):
         """
         Extractor of features matrix. All parameters are flags that specify to include a result of processing
         of each method to the final result.
+
+        :param batched: extract all the features of a chunk of documents in one call of a worker
+        :param cache: the directory of the cache of features (see FeaturesCache), documents found in the cache
+                      aren't processed. If it's None, the cache isn't used
         """
         self.n_jobs = n_jobs
+        self.batched = batched
+        self.cache = cache
         self.verbose = verbose
 
     def fit(self, X, y=None):
         return self
 
     def transform(self, X) -> pd.DataFrame:
+        # The Preprocessor can't process a chunk without texts, so its rows get no features
+        if not any(self._retrieve_texts(X)):
+            return self._get_empty(len(self._retrieve_texts(X)))
+
+        if self.cache is not None:
+            return self._transform_cached(X)
+
         # If at least one attribute doesn't exist, this specifies the fit method wasn't called
         # and all the retrieves must be executed
-        texts, tokens, sentences = self._retrieve_lists(X)
+        texts, tokens, sentences = self._retrieve_lists(X, self.verbose)
 
         if self.verbose:
-            print("Extracting features is beginning...")
+            print("Extracting features is beginning...", file=sys.stderr)
 
-        result = self._extract(texts, tokens, sentences, n_jobs=self.n_jobs)
+        result = self._extract(texts, tokens, sentences, n_jobs=self.n_jobs, batched=self.batched)
 
         if self.verbose:
-            print("Extracting features completed", end='\n\n')
+            print("Extracting features completed", end='\n\n', file=sys.stderr)
 
         return result
 
+    def _transform_cached(self, X) -> pd.DataFrame:
+        """
+        Takes features of documents from the cache, only the rest documents are processed and put into the cache.
+        """
+        if not isinstance(X, CorpusTokens):
+            X = np.asarray(X, dtype=object)
+
+        cache = FeaturesCache(self.cache)
+        columns_names = self._get_columns_names(FEATURES)
+        keys = cache.keys(self._retrieve_texts(X))
+        # Rows of other columns can't be used, they're replaced when extracted rows are put into the cache
+        found = cache.get(keys) if cache.columns == columns_names else {}
+        misses = [i for i, key in enumerate(keys) if key not in found]
+
+        if self.verbose:
+            print(f"Features of {len(keys) - len(misses)} documents were taken from the cache", file=sys.stderr)
+
+        if misses and not any(self._retrieve_texts(X[misses])):
+            # Empty texts aren't processed without other texts, their rows get no features and aren't cached
+            found.update((keys[i], np.full(len(columns_names), np.nan)) for i in misses)
+        elif misses:
+            texts, tokens, sentences = self._retrieve_lists(X[misses], self.verbose)
+
+            if self.verbose:
+                print("Extracting features is beginning...", file=sys.stderr)
+
+            extracted = self._extract(texts, tokens, sentences, n_jobs=self.n_jobs, batched=self.batched)
+            missed_keys = [keys[i] for i in misses]
+            cache.put(missed_keys, extracted.values, columns_names)
+            found.update(zip(missed_keys, extracted.values))
+
+            if self.verbose:
+                print("Extracting features completed", end='\n\n', file=sys.stderr)
+
+        cache.close()
+
+        result = np.vstack([found[key] for key in keys]) if keys else np.empty((0, len(columns_names)))
+        return pd.DataFrame(result, columns=columns_names)
+
     @staticmethod
     def _extract(texts: list[str], tokens: list[list[str]], sentences: list[list[str]], /,
                  avg_words=True, avg_sentences=True, pos_distribution=True,
                  foreign_words_ratio=True, lexicon=True, punctuation_distribution=True,
-                 n_jobs=1) -> pd.DataFrame:
+                 n_jobs=1, batched=True) -> pd.DataFrame:
         """
         Returns DataFrame object contains extracted features with column names such as <feature_name>_<n>.
+
+        In the batched mode documents are split into chunks of the same volume and a worker extracts all the chosen
+        features of a chunk in one call, otherwise a separate pass over all the documents is made for each feature.
+        If tokens and sentences are taken from CorpusTokens, the features having a kernel in CORPUS_KERNELS are
+        computed for all the documents at once in the main process.
         """
+        chosen = {
+            AVG_WORDS: avg_words,
+            AVG_SENTENCES: avg_sentences,
+            POS_DISTRIBUTION: pos_distribution,
+            LEXICON_SIZE: lexicon,
+            FOREIGN_RATIO: foreign_words_ratio,
+            PUNCTUATIONS_DISTRIBUTION: punctuation_distribution
+        }
+        features = [feature for feature in FEATURES if chosen[feature[0]]]
 
-        def process(function, objects: list, feature_name: str):
-            result_ = np.vstack(Parallel(n_jobs)(delayed(function)(objects_) for objects_ in objects))
-
-            # Build a list of the column names to create a features DataFrame
-            n_columns = result_.shape[1]
-            columns_name = [feature_name + f'_{i}' for i in range(1, n_columns + 1)]
-
-            return pd.DataFrame(result_, columns=columns_name)
-
-        results = []
-        # Average length of words
-        if avg_words:
-            results.append(process(funcs.avg_length, tokens, AVG_WORDS))
-        # Average length of sentences
-        if avg_sentences:
-            results.append(process(funcs.avg_length, sentences, AVG_SENTENCES))
-        # POS distribution
-        if pos_distribution:
-            results.append(process(funcs.pos_distribution, tokens, POS_DISTRIBUTION))
-        # Lexicon size
-        if lexicon:
-            results.append(process(funcs.lexicon, tokens, LEXICON_SIZE))
-        # Foreign words ratio
-        if foreign_words_ratio:
-            results.append(process(funcs.foreign_words_ratio, tokens, FOREIGN_RATIO))
-        # Punctuations distribution
-        if punctuation_distribution:
-            results.append(process(funcs.punctuations_distribution, texts, PUNCTUATIONS_DISTRIBUTION))
-
-        if not results:
+        if not features:
             raise ValueError("At least one feature must be chosen")
 
-        return pd.concat(results, axis=1)
+        # Build a list of the column names to create a features DataFrame
+        columns_names = FeaturesExtractor._get_columns_names(features)
+        sources = (texts, tokens, sentences)
+        blocks = {}
+
+        # If tokens are represented by the corpus, scalar features are computed from its flat arrays at once
+        if isinstance(tokens, DocumentsView):
+            for feature_name, *_ in features:
+                if feature_name in CORPUS_KERNELS:
+                    blocks[feature_name] = CORPUS_KERNELS[feature_name](tokens.corpus).reshape(-1, 1)
+
+        rest = [feature for feature in features if feature[0] not in blocks]
+        if rest:
+            if batched:
+                bounds = FeaturesExtractor._get_chunks(texts, effective_n_jobs(n_jobs) * CHUNKS_PER_JOB)
+                chunks = Parallel(n_jobs)(
+                    delayed(FeaturesExtractor._extract_chunk)([source[start:stop] for source in sources], rest)
+                    for start, stop in bounds
+                )
+                result = np.vstack(chunks) if chunks else np.empty((0, sum(feature[-1] for feature in rest)))
+            else:
+                result = np.hstack([
+                    np.vstack(Parallel(n_jobs)(delayed(function)(objects) for objects in sources[source]))
+                    for _, function, _, source, _ in rest
+                ])
+
+            column = 0
+            for feature_name, *_, width in rest:
+                blocks[feature_name] = result[:, column:column + width]
+                column += width
+
+        result = np.hstack([blocks[feature_name] for feature_name, *_ in features])
+        return pd.DataFrame(result, columns=columns_names)
+
+    @staticmethod
+    def _get_empty(count: int) -> pd.DataFrame:
+        """
+        Returns features of documents that can't be processed, all the values are NaN.
+        """
+        columns_names = FeaturesExtractor._get_columns_names(FEATURES)
+        return pd.DataFrame(np.full((count, len(columns_names)), np.nan), columns=columns_names)
 
     @staticmethod
-    def _retrieve_lists(X):
+    def _get_columns_names(features: list) -> list[str]:
+        """
+        Returns names of the columns of the features such as <feature_name>_<n>.
+        """
+        return [feature_name + f'_{i}' for feature_name, *_, n_columns in features for i in range(1, n_columns + 1)]
+
+    @staticmethod
+    def _extract_chunk(sources: list, features: list) -> np.ndarray:
+        """
+        Extracts all the passed features from a chunk of documents.
+
+        :param sources: a list of the chunks of texts, tokens and sentences
+        :param features: a list of features from FEATURES
+        :return: a dense block of shape (n_documents, n_columns)
+        """
+        n_documents = len(sources[TEXTS])
+        n_columns = sum(feature[-1] for feature in features)
+        block = np.empty((n_documents, n_columns))
+
+        column = 0
+        for _, function, kernel, source, width in features:
+            if kernel is not None:
+                block[:, column:column + width] = kernel(sources[source])
+            else:
+                for i, objects in enumerate(sources[source]):
+                    block[i, column:column + width] = function(objects)
+            column += width
+
+        return block
+
+    @staticmethod
+    def _get_chunks(texts: list[str], count: int) -> list[tuple]:
+        """
+        Splits documents into contiguous chunks having approximately the same volume of texts.
+
+        :param texts: a list of texts
+        :param count: the desired count of chunks
+        :return: a list of bounds (start, stop) of chunks
+        """
+        if not len(texts):
+            return []
+
+        # Count at least 1 symbol per a document, so empty documents are distributed between chunks too
+        volumes = np.cumsum([max(len(text), 1) for text in texts])
+        limits = volumes[-1] * np.arange(1, count) / count
+        bounds = np.unique(np.r_[0, np.searchsorted(volumes, limits, side='right'), len(texts)])
+
+        return [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if start < stop]
+
+    @staticmethod
+    def _retrieve_texts(X) -> np.ndarray:
+        """
+        Retrieve the list of unprocessed texts from X. See the _retrieve_lists() method for formats of X.
+        """
+        if isinstance(X, CorpusTokens):
+            return X.texts
+
+        X = np.asarray(X, dtype=object)
+        return X if X.ndim == 1 else X[:, 0]
+
+    @staticmethod
+    def _retrieve_lists(X, verbose=True):
         """
         Retrieve lists of texts, tokens and sentences from np.ndarray X. The list of texts must be the first column,
         the list of tokens - the second column and sentences - the third column.
 
+        X may be CorpusTokens object, then tokens and sentences are decoded from it only when they're processed.
+        X may be an one-dimensional array of unprocessed texts too.
+
         If all the values in tokens or sentences are None, Extractor gets tokens or sentences from the list of texts
         using the Preprocessor class.
 
         Note, if both the list of tokens and sentences are None, the list of texts will be retrieved from
         the Preprocessor too, because of the Extractor guesses the passed texts are unprocessed.
+
+        :param verbose: report the progress of processing of texts to stderr
         """
+        # The compact representation of the corpus made by the Preprocessor
+        if isinstance(X, CorpusTokens):
+            return X.texts, X.tokens, X.sentences
+
+        X = np.asarray(X, dtype=object)
+        if X.ndim == 1:
+            corpus = Preprocessor(X).corpus(verbose=verbose)
+            return corpus.texts, corpus.tokens, corpus.sentences
+
         texts = X[:, 0]
         tokens = X[:, 1]
         sentences = X[:, 2]
 
         preprocessor = Preprocessor(texts)
         if not any(tokens) and not any(sentences):
-            texts = preprocessor.texts()
-            tokens = preprocessor.tokens()
-            sentences = preprocessor.sentences()
+            corpus = preprocessor.corpus(verbose=verbose)
+            texts, tokens, sentences = corpus.texts, corpus.tokens, corpus.sentences
         elif not any(tokens):
-            tokens = preprocessor.tokens()
+            tokens = preprocessor.tokens(verbose=verbose)
         elif not any(sentences):
-            sentences = preprocessor.sentences()
+            sentences = preprocessor.sentences(verbose=verbose)
 
         return texts, tokens, sentences
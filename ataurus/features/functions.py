@@ -1,11 +1,11 @@
 """
 This module contains functions to extract features from a list of tokens/sentences.
 """
-import pymorphy2
 import re
 import numpy as np
 from collections import Counter
 from preparing.rules import PUNCTUATIONS
+from preparing.morph import MORPH_CACHE
 from razdel.segmenters.punct import BRACKETS, QUOTES, SMILES
 
 DEFINITIVE_PUNCTS = re.compile(r"(\.{3})|(\?!)|(\?\.{2,3})|(!\.{2,3})|(!!!)|([….?!])")
@@ -14,9 +14,15 @@ HIGHLIGHT_PUNCTS = re.compile(rf'[{BRACKETS}{QUOTES}]')
 SMILES_PUNCTS = re.compile(SMILES)
 DIGITS_PUNCTS = re.compile(r"[+$/*%^]")
 
-# Predefined parts of speech
-POS = list(pymorphy2.MorphAnalyzer().TagClass.PARTS_OF_SPEECH)
+# Parts of speech of the OpenCorpora tagset used by pymorphy2. They're listed in the fixed order, so all the worker
+# processes get the same order of columns, and the analyzer isn't created when the module is imported
+POS = ('ADJF', 'ADJS', 'ADVB', 'COMP', 'CONJ', 'GRND', 'INFN', 'INTJ', 'NOUN',
+       'NPRO', 'NUMR', 'PRCL', 'PRED', 'PREP', 'PRTF', 'PRTS', 'VERB')
 PUNCTS_NAMES = ["definitive_puncts", "dividing_puncts", "highlight_puncts", "smiles_puncts", "digits_puncts"]
+PUNCTS_RULES = (DEFINITIVE_PUNCTS, DIVIDING_PUNCTS, HIGHLIGHT_PUNCTS, SMILES_PUNCTS, DIGITS_PUNCTS)
+
+# Compiled regex for runs of consecutive punctuation symbols
+PUNCTUATIONS_RUNS = re.compile(PUNCTUATIONS.pattern + '+')
 
 # Compiled regex for foreign words
 FOREIGN_WORD = re.compile(r"\b[^\s\d\Wа-яА-ЯёЁ_]+\b", re.IGNORECASE)
@@ -40,13 +46,11 @@ def avg_length(items: list[str]) -> np.ndarray:
 
 def pos_distribution(tokens: list[str]) -> np.ndarray:
     """Feature №8. Part of speech distribution."""
-    morph = pymorphy2.MorphAnalyzer()
-
     # Vector of distributions
     result = []
 
     # Get a list of POS of a passed text
-    pos_tokens = list(pos for pos in map(lambda x: morph.parse(x)[0].tag.POS, tokens) if pos is not None)
+    pos_tokens = list(pos for pos in map(MORPH_CACHE.pos, tokens) if pos is not None)
     counter = Counter(pos_tokens)
     all_count = sum(counter.values())
 
@@ -84,23 +88,104 @@ def lexicon(tokens: list[str]) -> np.ndarray:
     return np.array(result)
 
 
-def punctuations_distribution(text: str):
-    # Vector of distributions
-    result = []
+def segment_sums(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Sums of segments of the flat array. The i-th segment is values[offsets[i]:offsets[i + 1]].
+
+    :param values: a flat array of values
+    :param offsets: offsets of segments of the length n_segments + 1
+    :return: an array of sums of the length n_segments
+    """
+    sums = np.zeros(len(values) + 1, dtype=np.result_type(values.dtype, np.int64))
+    np.cumsum(values, out=sums[1:])
+    return sums[offsets[1:]] - sums[offsets[:-1]]
+
+
+def segment_ratios(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Sums of segments of the flat array divided by lengths of segments, empty segments have NaN.
+    """
+    counts = np.diff(offsets)
+    result = np.full(len(counts), np.nan)
+    np.divide(segment_sums(values, offsets), counts, out=result, where=counts > 0)
+    return result
 
-    all_count = len(PUNCTUATIONS.findall(text))
-    rules = {
-        "definitive_puncts": DEFINITIVE_PUNCTS,
-        "dividing_puncts": DIVIDING_PUNCTS,
-        "highlight_puncts": HIGHLIGHT_PUNCTS,
-        "smiles_puncts": SMILES_PUNCTS,
-        "digits_puncts": DIGITS_PUNCTS
-    }
 
-    for punct_name in PUNCTS_NAMES:
+def avg_length_batch(lengths: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Average lengths of tokens/sentences of all the documents at once.
+
+    :param lengths: a flat array of lengths of tokens/sentences of all the documents
+    :param offsets: offsets of documents in the array of lengths
+    :return: an array of average lengths, NaN for the documents without tokens/sentences
+    """
+    return segment_ratios(lengths, offsets)
+
+
+def foreign_words_ratio_batch(flags: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Feature №15 for all the documents at once.
+
+    :param flags: a flat boolean array specifying foreign tokens of all the documents
+    :param offsets: offsets of documents in the array of flags
+    """
+    return segment_ratios(flags.astype(np.int64), offsets)
+
+
+def foreign_flags(words: list[str]) -> np.ndarray:
+    """
+    Boolean array specifying which words are foreign. It's computed once for the vocabulary of a corpus.
+    """
+    return np.fromiter((FOREIGN_WORD.search(word) is not None for word in words), dtype=bool, count=len(words))
+
+
+def lexicon_batch(ids: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Feature №17 for all the documents at once: counts of unique ids in each document divided by counts of tokens.
+
+    :param ids: a flat array of ids of tokens of all the documents
+    :param offsets: offsets of documents in the array of ids
+    """
+    counts = np.diff(offsets)
+    documents = np.repeat(np.arange(len(counts)), counts)
+
+    # Sort ids inside each document, so the first occurrence of each id is where it differs from the previous one
+    order = np.lexsort((ids, documents))
+    ids, documents = ids[order], documents[order]
+    first = np.ones(len(ids), dtype=bool)
+    first[1:] = (ids[1:] != ids[:-1]) | (documents[1:] != documents[:-1])
+
+    unique_counts = np.bincount(documents[first], minlength=len(counts))
+    result = np.full(len(counts), np.nan)
+    np.divide(unique_counts, counts, out=result, where=counts > 0)
+    return result
+
+
+def punctuations_distribution(text: str) -> np.ndarray:
+    """Distribution of classes of punctuations."""
+    return punctuations_distribution_batch([text])[0]
+
+
+def punctuations_distribution_batch(texts: list[str]) -> np.ndarray:
+    """
+    Distribution of classes of punctuations for a batch of texts.
+
+    Each text is scanned once to collect runs of punctuation symbols. Every class of punctuations consists of
+    punctuation symbols only, so its matches can't cross the bounds of a run and the classes are counted over
+    the collected runs, which are much shorter than the text.
+
+    :param texts: a list of texts
+    :return: a matrix of shape (n_texts, 5) with the ratios of the classes to the count of all punctuations
+    """
+    result = np.full((len(texts), len(PUNCTS_RULES)), np.nan)
+
+    for i, text in enumerate(texts):
+        runs = PUNCTUATIONS_RUNS.findall(text)
+        all_count = sum(map(len, runs))
+
         if all_count:
-            result.append(len(rules[punct_name].findall(text)) / all_count)
-        else:
-            result.append(np.nan)
+            # Runs are separated by the space, which doesn't belong to any class
+            runs = ' '.join(runs)
+            result[i] = [len(rule.findall(runs)) / all_count for rule in PUNCTS_RULES]
 
-    return np.array(result)
+    return result
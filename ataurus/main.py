@@ -3,18 +3,109 @@ import asyncio
 import pandas as pd
 import console_handle.console_handler as cfg
 import numpy as np
-from preparing.preprocessor import Preprocessor
+from tqdm import tqdm
 from features.extract import FeaturesExtractor
-from features.combine import FeaturesCombiner
-from ml.model import Model
+from features.combine import FeaturesCombiner, get_required_features
+from ml.model import Model, predict_top_k
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import GridSearchCV
 from serialize.model import serialize_model
-from serialize.features import serialize_features
+from serialize.features import serialize_features, FeaturesSpill
+from serialize.predictions import get_sink, TextSink, PredictionsSink
 from ml.grid_search import PARAM_GRID_DEFAULT
+from ml.search import HalvingSearch
 from data_parse.habr import HabrParser
+from data_parse.state import CrawlState, ResponseCache
 from database.client import Database
+from database.mirror import IndexMirror
+from serve.server import serve
+
+
+def extract_features(texts, authors, titles, links, extractor: FeaturesExtractor) -> tuple:
+    """
+    Extracts features from texts. Rows keep their positions: rows without texts have NaN features.
+
+    :return: tuple of extracted features, authors, titles and links
+    """
+    notnull_texts = pd.notnull(texts)
+    texts = np.array(texts, dtype=object)
+    authors = np.array(authors, dtype=object).ravel()
+    titles = np.array(titles, dtype=object)
+    links = np.array(links, dtype=object)
+
+    # Texts are processed only if their features aren't in the cache
+    X = extractor.fit_transform(texts[notnull_texts])
+    X.index = np.flatnonzero(notnull_texts)
+    X = X.reindex(pd.RangeIndex(len(texts)))
+
+    return X, authors, titles, links
+
+
+def extract_features_by_chunks(chunks, extractor: FeaturesExtractor) -> tuple:
+    """
+    Extracts features from chunks of the input. Only one chunk of texts is in memory at once, extracted features
+    are spilled to the disk.
+
+    :param chunks: an iterable of tuples of texts, authors, titles and links
+    :return: tuple of extracted features, authors, titles and links of all the chunks
+    """
+    spill = FeaturesSpill()
+    authors, titles, links = [], [], []
+
+    for chunk in chunks:
+        X_chunk, authors_chunk, titles_chunk, links_chunk = extract_features(*chunk, extractor=extractor)
+        spill.append(X_chunk)
+        authors.append(authors_chunk)
+        titles.append(titles_chunk)
+        links.append(links_chunk)
+
+    if not authors:
+        raise ValueError("The input doesn't contain any rows")
+
+    return spill.load(), np.concatenate(authors), np.concatenate(titles), np.concatenate(links)
+
+
+def get_batches(X: pd.DataFrame, titles, links, batch_size: int):
+    """
+    Splits extracted features, titles and links into batches of batch_size rows.
+    """
+    titles = np.asarray(titles, dtype=object)
+    links = np.asarray(links, dtype=object)
+    for i in range(0, len(X.index), batch_size):
+        yield X.iloc[i:i + batch_size], titles[i:i + batch_size], links[i:i + batch_size]
+
+
+def predict_by_batches(model, batches, sink: PredictionsSink):
+    """
+    Predicts authors by batches and writes results of each batch to the sink as soon as they're ready.
+    Every row is written, so the output is aligned with the input. Throughput of predicting is reported to stderr.
+
+    :param model: a fitted model
+    :param batches: an iterable of tuples of extracted features, titles and links
+    :param sink: a sink where predictions will be written
+    """
+    with tqdm(desc='Predicting', unit=' texts', file=sys.stderr) as progress:
+        for X, titles, links in batches:
+            # Rows with null features can't be scored, they're written with None authors to keep the output
+            # aligned with the input
+            authors, _, _ = predict_top_k(model, X, k=1)
+            sink.write(authors[:, 0], titles, links)
+
+            progress.update(len(X.index))
+            progress.set_postfix(written=sink.count)
+
+
+def get_required_groups(console_handler: cfg.ConsoleHandler):
+    """
+    Returns names of groups of features needed by the model while predicting or by the grid search while training.
+    All the groups are needed if it returns None.
+    """
+    if console_handler.mode == 'predict':
+        combiners = [step for _, step in console_handler.model.steps if isinstance(step, FeaturesCombiner)]
+        return combiners[0].get_features_names() if combiners else None
+
+    return get_required_features(console_handler.train_config or PARAM_GRID_DEFAULT)
 
 
 async def main():
@@ -22,57 +113,78 @@ async def main():
 
     if console_handler.mode == 'parse':
         database = Database.connect([f'{console_handler.host}:{console_handler.port}'])
-        parser = HabrParser(database=database, concurrent=20)
-        dataframe = await parser.parse_by_authors(authors=console_handler.authors, max_count=console_handler.max_count,
-                                                  save_to=console_handler.output)
+        state = CrawlState(console_handler.crawl_state) if console_handler.crawl_state else None
+        cache = ResponseCache(console_handler.http_cache) if console_handler.http_cache else None
+        # Articles that are already stored in the index aren't downloaded again
+        index = None if console_handler.reindex else console_handler.index
+        parser = HabrParser(database=database, state=state, cache=cache, index=index, **console_handler.parse_options)
+        try:
+            dataframe = await parser.parse_by_authors(authors=console_handler.authors,
+                                                      max_count=console_handler.max_count,
+                                                      save_to=console_handler.output)
+        finally:
+            for store in (state, cache):
+                if store is not None:
+                    store.close()
         database.upload_dataframe(index=console_handler.index, dataframe=dataframe, verbose=True)
+    elif console_handler.mode == 'serve':
+        serve(console_handler.model, **console_handler.serve_options)
+    elif console_handler.mode == 'mirror':
+        options = console_handler.mirror_options
+        mirror = IndexMirror(options['directory'])
+        received = mirror.sync(Database.connect([options['host']]), options['index'],
+                               batch_size=options['batch_size'], verbose=True)
+        print(f"Received {received} documents, the mirror contains {len(mirror)} documents")
+    elif console_handler.mode == 'predict' and not console_handler.input_is_features \
+            and not console_handler.features_path:
+        # Texts are predicted by chunks and results of each chunk are written as soon as they're ready
+        model = console_handler.model
+        extractor = FeaturesExtractor(n_jobs=-1, cache=console_handler.cache, verbose=False)
+        chunks = (extract_features(*chunk, extractor=extractor) for chunk in console_handler.input_chunks)
+
+        with get_sink(console_handler.output, console_handler.output_format) as sink:
+            if console_handler.output is None and type(sink) == TextSink:
+                print('Predictions'.center(50, '-'))
+            predict_by_batches(model, ((X, titles, links) for X, _, titles, links in chunks), sink)
     else:
-        input_data = console_handler.input
-        if type(input_data) == tuple:
-            if type(input_data[0]) == pd.DataFrame:
+        # The input read by chunks is always unprocessed texts
+        if console_handler.input_is_features:
+            # Only the groups of features that are used are loaded
+            input_data = console_handler.read_input(get_required_groups(console_handler))
+        elif console_handler.chunksize:
+            input_data = None
+        else:
+            input_data = console_handler.input
+        if input_data is None or type(input_data) == tuple:
+            if input_data is not None and type(input_data[0]) == pd.DataFrame:
                 X, y = input_data
 
                 titles = X['titles']
                 links = X['links']
             else:
-                texts, authors, titles, links = input_data
-
-                titles = np.array(titles, dtype=object)
-                links = np.array(links, dtype=object)
-
-                # Extract lists of texts, tokens and sentences
-                preprocessor = Preprocessor(texts, authors)
-                texts = preprocessor.texts()
-                tokens = preprocessor.tokens()
-                sentences = preprocessor.sentences()
-                authors = preprocessor.authors
-                X = np.c_[texts, tokens, sentences]
-                y = np.array(authors).ravel()
-
-                # Extract features from texts, tokens and sentences
-                extractor = FeaturesExtractor(n_jobs=-1)
-                X = extractor.fit_transform(X)
+                extractor = FeaturesExtractor(n_jobs=-1, cache=console_handler.cache)
+                if input_data is None:
+                    X, y, titles, links = extract_features_by_chunks(console_handler.input_chunks, extractor)
+                else:
+                    X, y, titles, links = extract_features(*input_data, extractor=extractor)
+
                 # Serialize extracted features if it's necessary
                 if console_handler.features_path:
                     X['titles'] = titles
                     X['links'] = links
-                    serialize_features(X, console_handler.features_path, authors=y)
-
-            # Remove null rows from texts and authors lists
-            notnull_indexes = X.notnull().all(axis=1)
-            X = X[notnull_indexes]
-            y = y[notnull_indexes]
-            titles = titles[notnull_indexes]
-            links = links[notnull_indexes]
+                    serialize_features(X, console_handler.features_path, authors=y,
+                                       compress=console_handler.compress_features)
         else:
-            X = input_data
-            # Remove null rows from texts and authors lists
-            notnull_indexes = X.notnull().all(axis=1)
-            X = X[notnull_indexes]
+            X, y = input_data, None
             titles = X['titles']
             links = X['links']
 
         if console_handler.mode == 'train':
+            # Remove null rows, the model can't be trained on them
+            notnull_indexes = X.notnull().all(axis=1).values
+            X = X[notnull_indexes]
+            y = np.asarray(y, dtype=object)[notnull_indexes]
+
             pipeline = Pipeline([
                 ('combine', FeaturesCombiner()),
                 ('scaler', StandardScaler()),
@@ -81,7 +193,12 @@ async def main():
 
             # Run a grid search for searching the best hyper parameters for a model
             param_grid = console_handler.train_config if console_handler.train_config else PARAM_GRID_DEFAULT
-            grid_search = GridSearchCV(pipeline, param_grid, n_jobs=-1, cv=5, verbose=1, scoring='f1_weighted')
+            search = console_handler.search
+            if search['method'] == 'halving':
+                grid_search = HalvingSearch(pipeline, param_grid, factor=search['factor'], budget=search['budget'],
+                                            n_jobs=-1, cv=5, verbose=1, scoring='f1_weighted')
+            else:
+                grid_search = GridSearchCV(pipeline, param_grid, n_jobs=-1, cv=5, verbose=1, scoring='f1_weighted')
             grid_search.fit(X, y)
 
             print("Best score:", grid_search.best_score_)
@@ -93,14 +210,10 @@ async def main():
 
         elif console_handler.mode == 'predict':
             model = console_handler.model
-            if console_handler.output:
-                with open(console_handler.output, 'w') as file:
-                    for title, link, author in zip(titles, links, model.predict(X)):
-                        print(author.ljust(20), title.ljust(100), link.ljust(100), file=file)
-            else:
-                print('Predictions'.center(50, '-'))
-                for title, link, author in zip(titles, links, model.predict(X)):
-                    print(author.ljust(20), title.ljust(100), link.ljust(100))
+            with get_sink(console_handler.output, console_handler.output_format) as sink:
+                if console_handler.output is None and type(sink) == TextSink:
+                    print('Predictions'.center(50, '-'))
+                predict_by_batches(model, get_batches(X, titles, links, console_handler.chunksize), sink)
 
 
 if __name__ == '__main__':
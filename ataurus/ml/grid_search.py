@@ -32,7 +32,7 @@ PARAM_GRID_DEFAULT = [
         "combine__lexicon": [True],
         "combine__punctuation_distribution": [True],
 
-        "model__estimator": [SVC()],
+        "model__estimator": [SVC(probability=True)],
         "model__estimator__C": [0.2, 0.5, 1],
         "model__estimator__kernel": ["linear", "poly", "rbf"],
         "model__estimator__degree": [2, 3, 4],
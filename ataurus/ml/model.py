@@ -22,12 +22,52 @@ class Model(BaseEstimator, ClassifierMixin):
         # Remove NaN values
         X, y = self._resolve_nan(X, y)
 
-        return self.estimator.fit(X, y)
+        self.estimator.fit(X, y)
+        return self
 
     def predict(self, X):
         X = self._resolve_nan(X)
         predicted = self.estimator.predict(X)
-        return np.apply_along_axis(lambda k: self.classes_[k], 0, predicted)
+        return self.classes_[predicted]
+
+    def predict_top_k(self, X, k=3) -> tuple:
+        """
+        Predicts k the most probable authors of each row in one pass. Rows keep their positions: rows containing
+        NaN values can't be scored, they're marked in the mask and have None authors and NaN probabilities.
+        The estimator must support predict_proba().
+
+        :param X: {array-like, dataframe} of shape (n_samples, n_features)
+        :param k: count of authors predicted for each row, it's limited by the count of classes
+        :return: tuple of authors of shape (n_samples, k), their probabilities of shape (n_samples, k) sorted
+                 in descending order and the boolean mask of shape (n_samples,) of scored rows
+        """
+        if k <= 0:
+            raise ValueError("The count of predicted authors must be positive")
+        if not hasattr(self.estimator, 'predict_proba'):
+            raise ValueError("The estimator doesn't estimate probabilities, for example, SVC must be created "
+                             "with probability=True")
+
+        X = np.asarray(X, dtype=np.float64)
+        mask = ~np.isnan(X).any(axis=1)
+        k = min(k, len(self.classes_))
+
+        authors = np.full((len(X), k), None, dtype=object)
+        probabilities = np.full((len(X), k), np.nan)
+        if mask.any():
+            scores = self.estimator.predict_proba(X[mask])
+
+            # Take k the best columns without sorting all of them, then sort only these columns
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < scores.shape[1] else \
+                np.tile(np.arange(scores.shape[1]), (len(scores), 1))
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            top = np.take_along_axis(top, order, axis=1)
+
+            # Columns of probabilities correspond to classes known by the estimator
+            authors[mask, :top.shape[1]] = self.classes_[self.estimator.classes_[top]]
+            probabilities[mask, :top.shape[1]] = np.take_along_axis(top_scores, order, axis=1)
+
+        return authors, probabilities, mask
 
     def score(self, X, y, sample_weight=None):
         X, y = self._resolve_nan(X, y)
@@ -48,3 +88,15 @@ class Model(BaseEstimator, ClassifierMixin):
             return X, y
         else:
             return X
+
+
+def predict_top_k(pipeline, X, k=3) -> tuple:
+    """
+    Transforms X by the steps of the pipeline and predicts k the most probable authors by its last step,
+    which must be the Model. See Model.predict_top_k().
+    """
+    model = pipeline.steps[-1][1]
+    if not isinstance(model, Model):
+        raise ValueError("The last step of the pipeline isn't the Model")
+
+    return model.predict_top_k(pipeline[:-1].transform(X), k)
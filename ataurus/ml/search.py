@@ -0,0 +1,163 @@
+"""
+Module contains the successive halving search of hyper parameters limited by the wall-clock budget.
+All the candidates are evaluated on a small subsample of the data at first, then only the best part of them
+is evaluated on a larger subsample, and so on until the last candidates are evaluated on all the data.
+"""
+import math
+import time
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.base import BaseEstimator, clone
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+
+# The default ratio of candidates dropped after each iteration
+FACTOR_DEFAULT = 3
+
+
+def _fit_and_score(estimator, X, y, train: np.ndarray, test: np.ndarray, scorer) -> float:
+    X_train, X_test = (X.iloc[train], X.iloc[test]) if isinstance(X, pd.DataFrame) else (X[train], X[test])
+    estimator.fit(X_train, y[train])
+    return scorer(estimator, X_test, y[test])
+
+
+class HalvingSearch(BaseEstimator):
+    def __init__(self, estimator, param_grid, factor=FACTOR_DEFAULT, budget=None, cv=5, scoring=None,
+                 n_jobs=None, random_state=None, verbose=0):
+        """
+        Successive halving search of hyper parameters. At each iteration the remaining candidates are
+        cross-validated on a stratified subsample and only 1 / factor of them having the best scores go to
+        the next iteration, where the subsample is factor times larger. The last iteration uses all the data.
+
+        If the budget is exceeded, candidates that aren't evaluated at the current iteration are dropped and
+        the best candidate is chosen from the last evaluated ones. Then it's fitted on all the data.
+
+        The attributes best_params_, best_score_ and best_estimator_ are the same as ones of GridSearchCV.
+
+        :param estimator: an estimator whose hyper parameters are searched
+        :param param_grid: a dictionary or a list of dictionaries of parameters like in GridSearchCV
+        :param factor: the ratio of candidates dropped and the growth of the subsample after each iteration
+        :param budget: the maximum time of the search in seconds, it isn't limited if it's None
+        :param cv: count of folds of cross-validation
+        :param scoring: the scoring of candidates like in GridSearchCV
+        :param n_jobs: count of workers evaluating candidates
+        :param random_state: the seed of sampling of candidates and subsamples
+        :param verbose: print the progress of the search
+        """
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.factor = factor
+        self.budget = budget
+        self.cv = cv
+        self.scoring = scoring
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.verbose = verbose
+
+    def fit(self, X, y):
+        if self.factor < 2:
+            raise ValueError("The factor of the halving search must be at least 2")
+        if self.budget is not None and self.budget <= 0:
+            raise ValueError("The budget of the search must be positive")
+
+        start = time.monotonic()
+        y = np.asarray(y)
+        random = np.random.RandomState(self.random_state)
+        scorer = check_scoring(self.estimator, scoring=self.scoring)
+
+        candidates = list(ParameterGrid(self.param_grid))
+        if not candidates:
+            raise ValueError("There are no candidates to search")
+
+        order = self._get_subsample_order(y, random)
+        n_classes = len(np.unique(y))
+        n_iterations = 1 + math.floor(math.log(len(candidates), self.factor))
+        min_resources = min(len(y), max(len(y) // self.factor ** (n_iterations - 1), 2 * self.cv * n_classes))
+
+        self.cv_results_ = []
+        scores = {}
+        remaining = list(range(len(candidates)))
+
+        with Parallel(n_jobs=self.n_jobs) as parallel:
+            for iteration in range(n_iterations):
+                resources = len(y) if iteration == n_iterations - 1 else \
+                    min(len(y), min_resources * self.factor ** iteration)
+                if self.verbose:
+                    print(f"Iteration {iteration}: {len(remaining)} candidates on {resources} samples")
+
+                evaluated = self._evaluate(parallel, candidates, remaining, X, y, order[:resources], scorer,
+                                           random, start)
+                for index, score in evaluated.items():
+                    self.cv_results_.append({'iteration': iteration, 'resources': resources,
+                                             'params': candidates[index], 'score': score})
+
+                if evaluated:
+                    scores = evaluated
+                if len(evaluated) < len(remaining):
+                    if self.verbose:
+                        print(f"The budget of {self.budget} seconds is exceeded, the search is stopped")
+                    break
+
+                # Keep the best candidates for the next iteration
+                count = max(1, math.ceil(len(remaining) / self.factor))
+                remaining = sorted(evaluated, key=lambda k: evaluated[k], reverse=True)[:count]
+
+        if not scores:
+            raise ValueError("The budget was exceeded before any candidate was evaluated")
+
+        best = max(scores, key=lambda k: scores[k])
+        self.best_params_ = candidates[best]
+        self.best_score_ = scores[best]
+        self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+        self.n_iterations_ = iteration + 1
+        self.elapsed_ = time.monotonic() - start
+
+        return self
+
+    def _evaluate(self, parallel, candidates, indexes, X, y, subsample, scorer, random, start) -> dict:
+        """
+        Cross-validates candidates on the subsample. Tasks are dispatched by waves, so the budget is checked
+        between waves.
+
+        :return: a dictionary of indexes of evaluated candidates and their scores
+        """
+        X_subsample = X.iloc[subsample] if isinstance(X, pd.DataFrame) else X[subsample]
+        y_subsample = y[subsample]
+
+        folds = list(StratifiedKFold(self.cv, shuffle=True, random_state=random.randint(2 ** 31))
+                     .split(np.zeros(len(y_subsample)), y_subsample))
+
+        # Each candidate is a separate task, so scores of a candidate are obtained at once
+        wave = effective_n_jobs(self.n_jobs)
+        scores = {}
+        for i in range(0, len(indexes), wave):
+            if self.budget is not None and time.monotonic() - start > self.budget:
+                break
+
+            part = indexes[i:i + wave]
+            results = parallel(delayed(_fit_and_score)(clone(self.estimator).set_params(**candidates[index]),
+                                                       X_subsample, y_subsample, train, test, scorer)
+                               for index in part for train, test in folds)
+
+            for j, index in enumerate(part):
+                scores[index] = float(np.mean(results[j * len(folds):(j + 1) * len(folds)]))
+
+        return scores
+
+    @staticmethod
+    def _get_subsample_order(y: np.ndarray, random: np.random.RandomState) -> np.ndarray:
+        """
+        Returns the order of samples such that any its prefix is a stratified subsample: samples of each class
+        are shuffled and spread evenly over the order.
+        """
+        permutation = random.permutation(len(y))
+        classes, inverse, counts = np.unique(y[permutation], return_inverse=True, return_counts=True)
+
+        # The position of each sample among the samples of its class
+        ranks = np.empty(len(y))
+        for k in range(len(classes)):
+            members = inverse == k
+            ranks[members] = (np.arange(counts[k]) + random.uniform()) / counts[k]
+
+        return permutation[np.argsort(ranks, kind='stable')]
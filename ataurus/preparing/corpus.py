@@ -0,0 +1,326 @@
+"""
+Module contains the compact representation of processed texts. Instead of arrays of Python lists of strings,
+tokens and sentences of the whole corpus are stored as flat int32 arrays of ids of a corpus vocabulary with offsets
+of documents (and sentences), similar to the CSR format of sparse matrices.
+"""
+import os
+import numpy as np
+
+
+def pack_strings(strings: list[str]) -> tuple:
+    """
+    Packs strings into one flat UTF-8 buffer and an array of offsets of the strings in the buffer.
+
+    :param strings: a list of strings
+    :return: tuple of the buffer (uint8 ndarray) and offsets (int64 ndarray of the length len(strings) + 1)
+    """
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(string) for string in encoded], out=offsets[1:])
+
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def unpack_strings(buffer: np.ndarray, offsets: np.ndarray) -> list[str]:
+    """
+    Unpacks strings packed by the pack_strings() function.
+    """
+    data = buffer.tobytes()
+    return [data[start:stop].decode('utf-8') for start, stop in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+class Vocabulary:
+    def __init__(self, words: list[str] = None):
+        """
+        Mapping of words to int32 ids. Ids are given to words in the order of their adding.
+
+        :param words: initial words of the vocabulary
+        """
+        self._words = []
+        self._ids = {}
+
+        if words is not None:
+            self.encode(words)
+
+    def add(self, word: str) -> int:
+        """
+        Adds the word to the vocabulary, if it's not there, and returns its id.
+        """
+        word_id = self._ids.get(word)
+        if word_id is None:
+            word_id = self._ids[word] = len(self._words)
+            self._words.append(word)
+        return word_id
+
+    def encode(self, words: list[str]) -> np.ndarray:
+        """
+        Returns ids of the words, unknown words are added to the vocabulary.
+        """
+        return np.fromiter(map(self.add, words), dtype=np.int32, count=len(words))
+
+    def decode(self, ids) -> list[str]:
+        words = self._words
+        return [words[word_id] for word_id in ids]
+
+    @property
+    def words(self) -> list[str]:
+        return self._words
+
+    def lengths(self) -> np.ndarray:
+        """
+        Returns lengths of all the words of the vocabulary in the order of their ids.
+        """
+        return np.fromiter(map(len, self._words), dtype=np.int32, count=len(self._words))
+
+    def __len__(self):
+        return len(self._words)
+
+    def __contains__(self, word):
+        return word in self._ids
+
+    def __getstate__(self):
+        # The mapping is restored from the list of words, so it isn't pickled while passing to workers
+        return self._words
+
+    def __setstate__(self, state):
+        self._words = state
+        self._ids = {word: word_id for word_id, word in enumerate(state)}
+
+
+class CorpusTokens:
+    def __init__(self,
+                 vocabulary: Vocabulary,
+                 token_ids: np.ndarray,
+                 token_offsets: np.ndarray,
+                 sentence_ids: np.ndarray,
+                 sentence_bounds: np.ndarray,
+                 sentence_offsets: np.ndarray,
+                 texts: np.ndarray = None):
+        """
+        Tokens and sentences of a corpus stored as flat arrays of ids of the vocabulary.
+
+        Tokens of the i-th document are token_ids[token_offsets[i]:token_offsets[i + 1]]. Each sentence is stored
+        as ids of its words: words of the j-th sentence are sentence_ids[sentence_bounds[j]:sentence_bounds[j + 1]]
+        and sentences of the i-th document have numbers from sentence_offsets[i] to sentence_offsets[i + 1].
+
+        :param vocabulary: the vocabulary of the corpus
+        :param texts: unprocessed texts of the corpus, they are necessary to extract punctuations
+        """
+        self.vocabulary = vocabulary
+        self.token_ids = token_ids
+        self.token_offsets = token_offsets
+        self.sentence_ids = sentence_ids
+        self.sentence_bounds = sentence_bounds
+        self.sentence_offsets = sentence_offsets
+        self._texts = texts
+
+    @staticmethod
+    def from_lists(tokens: list[list[str]],
+                   sentences: list[list[str]],
+                   texts: list[str] = None,
+                   vocabulary: Vocabulary = None) -> 'CorpusTokens':
+        """
+        Makes the compact representation of lists of tokens and sentences made by the Preprocessor.
+
+        :param tokens: a list of lists of tokens for an each text
+        :param sentences: a list of lists of sentences for an each text
+        :param texts: a list of unprocessed texts
+        :param vocabulary: the vocabulary that will be extended, a new one is created if it's None
+        :return: CorpusTokens object
+        """
+        if len(tokens) != len(sentences) or (texts is not None and len(texts) != len(tokens)):
+            raise ValueError("Lists of texts, tokens and sentences must have the same length")
+
+        vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+
+        token_offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum([len(tokens_) for tokens_ in tokens], out=token_offsets[1:])
+        token_ids = vocabulary.encode([token for tokens_ in tokens for token in tokens_])
+
+        # Sentences are made of words separated by a single space, so they are split by it without losses
+        words = [sentence.split(' ') if sentence else [] for sentences_ in sentences for sentence in sentences_]
+        sentence_offsets = np.zeros(len(sentences) + 1, dtype=np.int64)
+        np.cumsum([len(sentences_) for sentences_ in sentences], out=sentence_offsets[1:])
+        sentence_bounds = np.zeros(len(words) + 1, dtype=np.int64)
+        np.cumsum([len(words_) for words_ in words], out=sentence_bounds[1:])
+        sentence_ids = vocabulary.encode([word for words_ in words for word in words_])
+
+        if texts is not None:
+            texts_ = np.empty(len(texts), dtype=object)
+            texts_[:] = list(texts)
+            texts = texts_
+
+        return CorpusTokens(vocabulary, token_ids, token_offsets, sentence_ids, sentence_bounds, sentence_offsets,
+                            texts)
+
+    def __len__(self):
+        return len(self.token_offsets) - 1
+
+    def __getitem__(self, key) -> 'CorpusTokens':
+        """
+        Returns the part of the corpus. The key may be a slice or an array of indexes of documents.
+        The vocabulary is shared with the part.
+        """
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                key = np.arange(start, stop, step)
+            else:
+                return self._slice(start, max(start, stop))
+
+        indexes = np.asarray(key)
+        if indexes.dtype == bool:
+            indexes = np.flatnonzero(indexes)
+        return self._take(indexes.astype(np.int64))
+
+    def _slice(self, start: int, stop: int) -> 'CorpusTokens':
+        token_offsets = self.token_offsets[start:stop + 1]
+        sentence_offsets = self.sentence_offsets[start:stop + 1]
+        sentence_bounds = self.sentence_bounds[sentence_offsets[0]:sentence_offsets[-1] + 1]
+
+        return CorpusTokens(self.vocabulary,
+                            self.token_ids[token_offsets[0]:token_offsets[-1]],
+                            token_offsets - token_offsets[0],
+                            self.sentence_ids[sentence_bounds[0]:sentence_bounds[-1]],
+                            sentence_bounds - sentence_bounds[0],
+                            sentence_offsets - sentence_offsets[0],
+                            self._texts[start:stop] if self._texts is not None else None)
+
+    def _take(self, indexes: np.ndarray) -> 'CorpusTokens':
+        token_ids, token_offsets = self._take_ragged(self.token_ids, self.token_offsets, indexes)
+        sentences, sentence_offsets = self._take_ragged(np.arange(len(self.sentence_bounds) - 1),
+                                                        self.sentence_offsets, indexes)
+        sentence_ids, sentence_bounds = self._take_ragged(self.sentence_ids, self.sentence_bounds, sentences)
+
+        return CorpusTokens(self.vocabulary, token_ids, token_offsets, sentence_ids, sentence_bounds,
+                            sentence_offsets, self._texts[indexes] if self._texts is not None else None)
+
+    @staticmethod
+    def _take_ragged(values: np.ndarray, offsets: np.ndarray, indexes: np.ndarray) -> tuple:
+        """
+        Takes segments with passed indexes from the flat array of values with offsets of segments.
+        """
+        lengths = offsets[indexes + 1] - offsets[indexes]
+        new_offsets = np.zeros(len(indexes) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=new_offsets[1:])
+
+        # Positions of all the taken values: a start of the segment plus a position inside the segment
+        positions = np.repeat(offsets[indexes] - new_offsets[:-1], lengths) + np.arange(new_offsets[-1])
+        return values[positions], new_offsets
+
+    def token_lengths(self) -> np.ndarray:
+        """
+        Returns a flat array of lengths of all the tokens, its offsets are token_offsets.
+        """
+        return self.vocabulary.lengths()[self.token_ids]
+
+    def sentence_lengths(self) -> np.ndarray:
+        """
+        Returns a flat array of lengths of all the sentences, its offsets are sentence_offsets.
+        """
+        words_lengths = np.zeros(len(self.sentence_ids) + 1, dtype=np.int64)
+        np.cumsum(self.vocabulary.lengths()[self.sentence_ids], out=words_lengths[1:])
+        counts = np.diff(self.sentence_bounds)
+
+        # Words of a sentence are separated by a single space
+        return (words_lengths[self.sentence_bounds[1:]] - words_lengths[self.sentence_bounds[:-1]]
+                + np.maximum(counts - 1, 0))
+
+    def document_tokens(self, i: int) -> list[str]:
+        return self.vocabulary.decode(self.token_ids[self.token_offsets[i]:self.token_offsets[i + 1]].tolist())
+
+    def document_sentences(self, i: int) -> list[str]:
+        words = self.vocabulary.words
+        ids = self.sentence_ids
+        bounds = self.sentence_bounds[self.sentence_offsets[i]:self.sentence_offsets[i + 1] + 1].tolist()
+
+        return [' '.join([words[word_id] for word_id in ids[start:stop].tolist()])
+                for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    @property
+    def texts(self) -> np.ndarray:
+        if self._texts is None:
+            raise ValueError("Texts weren't stored in this corpus")
+        return self._texts
+
+    @property
+    def tokens(self) -> 'DocumentsView':
+        """
+        A sequence of lists of tokens of documents. Lists are decoded only when they're accessed.
+        """
+        return DocumentsView(self, CorpusTokens.document_tokens)
+
+    @property
+    def sentences(self) -> 'DocumentsView':
+        """
+        A sequence of lists of sentences of documents. Lists are decoded only when they're accessed.
+        """
+        return DocumentsView(self, CorpusTokens.document_sentences)
+
+    def save(self, filename: str):
+        """
+        Saves the corpus into the .npz file.
+
+        :param filename: the name of the file
+        """
+        words, words_offsets = pack_strings(self.vocabulary.words)
+        arrays = dict(words=words, words_offsets=words_offsets, token_ids=self.token_ids,
+                      token_offsets=self.token_offsets, sentence_ids=self.sentence_ids,
+                      sentence_bounds=self.sentence_bounds, sentence_offsets=self.sentence_offsets)
+
+        if self._texts is not None:
+            arrays['texts'], arrays['texts_offsets'] = pack_strings(self._texts)
+
+        with open(filename, 'wb') as file:
+            np.savez(file, **arrays)
+
+    @staticmethod
+    def load(filename: str) -> 'CorpusTokens':
+        """
+        Loads the corpus saved by the save() method.
+
+        :param filename: the name of the file
+        """
+        if not os.path.exists(filename):
+            raise FileNotFoundError("Specified file of the corpus doesn't exist")
+
+        with np.load(filename) as arrays:
+            texts = None
+            if 'texts' in arrays:
+                texts = np.empty(len(arrays['texts_offsets']) - 1, dtype=object)
+                texts[:] = unpack_strings(arrays['texts'], arrays['texts_offsets'])
+
+            return CorpusTokens(Vocabulary(unpack_strings(arrays['words'], arrays['words_offsets'])),
+                                arrays['token_ids'], arrays['token_offsets'], arrays['sentence_ids'],
+                                arrays['sentence_bounds'], arrays['sentence_offsets'], texts)
+
+
+class DocumentsView:
+    def __init__(self, corpus: CorpusTokens, decode):
+        """
+        Read-only sequence of decoded lists of tokens or sentences of a corpus. Slices of the view are views of
+        the part of the corpus, so they're passed to workers in the compact representation.
+        """
+        self._corpus = corpus
+        self._decode = decode
+
+    @property
+    def corpus(self) -> CorpusTokens:
+        return self._corpus
+
+    def __len__(self):
+        return len(self._corpus)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError("Index of a document is out of range")
+            return self._decode(self._corpus, key)
+
+        return DocumentsView(self._corpus[key], self._decode)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._decode(self._corpus, i)
@@ -0,0 +1,83 @@
+"""
+Module contains the process-wide cache of morphological analysis. Parsing of a word form by pymorphy2 is expensive,
+but a small set of word forms makes up the most of tokens in russian texts, so results of parsing are cached here
+and shared between preprocessing of texts and extracting of features.
+"""
+from collections import OrderedDict, namedtuple
+from pymorphy2 import MorphAnalyzer
+
+# The result of parsing of a word form: the normal form, the part of speech and the full tag
+Analysis = namedtuple('Analysis', ['normal_form', 'pos', 'tag'])
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+# The default count of word forms kept in the cache
+MAXSIZE_DEFAULT = 200_000
+
+
+class MorphCache:
+    def __init__(self, maxsize: int = MAXSIZE_DEFAULT):
+        """
+        Bounded cache of the morphological analysis. When the cache is full, the least recently used word form
+        is evicted.
+
+        :param maxsize: the maximum count of word forms kept in the cache
+        """
+        if maxsize <= 0:
+            raise ValueError("The size of the morphological cache must be positive")
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._morph = None
+
+    @property
+    def morph(self) -> MorphAnalyzer:
+        # The analyzer loads dictionaries, so it's created only once per process and only when it's needed
+        if self._morph is None:
+            self._morph = MorphAnalyzer()
+        return self._morph
+
+    def parse(self, word: str) -> Analysis:
+        """
+        Gets the most probable analysis of the word form.
+
+        :param word: a word form
+        :return: Analysis containing the normal form, the part of speech and the tag of the word
+        """
+        analysis = self._cache.get(word)
+        if analysis is not None:
+            self.hits += 1
+            self._cache.move_to_end(word)
+            return analysis
+
+        self.misses += 1
+        parsed = self.morph.parse(word)[0]
+        analysis = Analysis(parsed.normal_form, parsed.tag.POS, parsed.tag)
+
+        self._cache[word] = analysis
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+        return analysis
+
+    def normal_form(self, word: str) -> str:
+        return self.parse(word).normal_form
+
+    def pos(self, word: str):
+        return self.parse(word).pos
+
+    def info(self) -> CacheInfo:
+        """
+        Returns statistics of the cache: hits, misses, the maximum size and the current size.
+        """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._cache))
+
+    def clear(self):
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# The cache shared by all the stages within the process
+MORPH_CACHE = MorphCache()
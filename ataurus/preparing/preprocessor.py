@@ -4,13 +4,14 @@ sentences and processed or unprocessed texts.
 All unnecessary symbols, stop words and other incorrect symbols will be removed from the text.
 """
 import re
-import time
+import sys
 import pandas as pd
 import numpy as np
 
 from razdel import tokenize, sentenize
 from .rules import PUNCTUATIONS, URLS, STOPWORDS
-from pymorphy2 import MorphAnalyzer
+from .morph import MORPH_CACHE
+from .corpus import CorpusTokens
 from joblib.parallel import Parallel, delayed
 from tqdm import tqdm
 
@@ -30,6 +31,13 @@ class Preprocessor:
         self._authors = df['authors'].values if authors is not None else None
         self.n_jobs = n_jobs
 
+        # Processed tokens and sentences memoized by the options of processing
+        self._processed = {}
+
+        # Hits and misses of the morphological cache summed over workers, each worker process has its own cache
+        self.morph_hits = 0
+        self.morph_misses = 0
+
     def tokens(self,
                lower=True,
                normalization=True,
@@ -44,37 +52,25 @@ class Preprocessor:
         :param verbose:
         :return: a list of lists of tokens for an each passed text
         """
-        morph = MorphAnalyzer()
+        key = ('tokens', lower, normalization, remove_stopwords)
+        if key in self._processed:
+            return self._processed[key]
+        if (corpus := self._processed.get(('corpus', lower, normalization, remove_stopwords))) is not None:
+            return self._to_array(list(corpus.tokens))
 
-        def process_text(text):
-            preprocessed_text = self.preprocess_text(text, lower=lower, delete_whitespace=True, delete_urls=True)
-
-            # Nested conditions - it's faster than make it separately
-            if normalization:
-                if remove_stopwords:
-                    tokens = [normal_form for token in tokenize(preprocessed_text)
-                              if not PUNCTUATIONS.match(token.text)
-                              and not STOPWORDS.match((normal_form := morph.parse(token.text)[0].normal_form))]
-                else:
-                    tokens = [morph.parse(token.text)[0].normal_form for token in tokenize(preprocessed_text)
-                              if not PUNCTUATIONS.match(token.text)]
-            else:
-                if remove_stopwords:
-                    tokens = [token.text for token in tokenize(preprocessed_text)
-                              if not PUNCTUATIONS.match(token.text) and not STOPWORDS.match(token.text)]
-                else:
-                    tokens = [token.text for token in tokenize(preprocessed_text) if not PUNCTUATIONS.match(token.text)]
-            return tokens
+        # The static method is passed to workers instead of a closure, so the instance isn't pickled for each text
+        process_text = self._process_tokens
+        options = (lower, normalization, remove_stopwords)
 
         if verbose:
-            print('Start tokens processing...')
-            time.sleep(1)
-            results = Parallel(n_jobs=self.n_jobs)(delayed(process_text)(text) for text in tqdm(self._texts))
-            print('Tokens processing completed')
-        else:
-            results = Parallel(n_jobs=self.n_jobs)(delayed(process_text)(text) for text in self._texts)
+            print('Start tokens processing...', file=sys.stderr)
+        results = self._process_texts(process_text, options, verbose)
+        if verbose:
+            print('Tokens processing completed', file=sys.stderr)
+            self._print_morph_info()
 
-        return np.array(results, dtype=object)
+        self._processed[key] = self._to_array(results)
+        return self._processed[key]
 
     def sentences(self,
                   lower=True,
@@ -90,27 +86,90 @@ class Preprocessor:
         :param verbose:
         :return: a list of lists of sentences for an each passed text
         """
-        def process_text(text):
-            preprocessed_text = self.preprocess_text(text, lower=False, delete_whitespace=False, delete_urls=True)
-
-            if lower:
-                sentences = [re.sub(r'[\s]+', r' ', PUNCTUATIONS.sub(" ", sentence.text.lower())).strip()
-                             for sentence in sentenize(preprocessed_text) if sentence.text]
-            else:
-                sentences = [re.sub(r'[\s]+', r' ', PUNCTUATIONS.sub(" ", sentence.text)).strip()
-                             for sentence in sentenize(preprocessed_text) if sentence.text]
+        key = ('sentences', lower)
+        if key in self._processed:
+            return self._processed[key]
+        for corpus_key, corpus in self._processed.items():
+            if corpus_key[0] == 'corpus' and corpus_key[1] == lower:
+                return self._to_array(list(corpus.sentences))
 
-            return sentences
+        process_text = self._process_sentences
 
         if verbose:
-            print('Start sentences processing...')
-            time.sleep(1)
-            results = Parallel(n_jobs=self.n_jobs)(delayed(process_text)(text) for text in tqdm(self._texts))
-            print('Sentences processing completed')
+            print('Start sentences processing...', file=sys.stderr)
+            results = Parallel(n_jobs=self.n_jobs)(delayed(process_text)(text, lower) for text in tqdm(self._texts))
+            print('Sentences processing completed', file=sys.stderr)
         else:
-            results = Parallel(n_jobs=self.n_jobs)(delayed(process_text)(text) for text in self._texts)
+            results = Parallel(n_jobs=self.n_jobs)(delayed(process_text)(text, lower) for text in self._texts)
+
+        self._processed[key] = self._to_array(results)
+        return self._processed[key]
+
+    def process(self,
+                lower=True,
+                normalization=True,
+                remove_stopwords=False,
+                verbose=True) -> tuple:
+        """
+        Get texts, tokens and sentences in a single pass: each text is read once and both tokens and sentences
+        are made from it in the same worker. Results are memoized, so the following calls of this method and
+        the tokens() and sentences() methods with the same options don't process texts again.
+
+        :param lower: to lower tokens and sentences
+        :param normalization: normalize each token
+        :param remove_stopwords: remove stopwords from the tokens
+        :param verbose:
+        :return: a tuple of the list of texts, the list of lists of tokens and the list of lists of sentences
+        """
+        tokens_key = ('tokens', lower, normalization, remove_stopwords)
+        sentences_key = ('sentences', lower)
+
+        if tokens_key not in self._processed or sentences_key not in self._processed:
+            # Lists may be replaced by the corpus, then they're decoded from it
+            if ('corpus', lower, normalization, remove_stopwords) in self._processed:
+                return (self.texts(), self.tokens(lower, normalization, remove_stopwords, verbose=False),
+                        self.sentences(lower, verbose=False))
 
-        return np.array(results, dtype=object)
+            process_text = self._process_document
+            options = (lower, normalization, remove_stopwords)
+
+            if verbose:
+                print('Start texts processing...', file=sys.stderr)
+            results = self._process_texts(process_text, options, verbose)
+            if verbose:
+                print('Texts processing completed', file=sys.stderr)
+                self._print_morph_info()
+
+            self._processed[tokens_key] = self._to_array([tokens for tokens, _ in results])
+            self._processed[sentences_key] = self._to_array([sentences for _, sentences in results])
+
+        return self.texts(), self._processed[tokens_key], self._processed[sentences_key]
+
+    def corpus(self,
+               lower=True,
+               normalization=True,
+               remove_stopwords=False,
+               verbose=True) -> CorpusTokens:
+        """
+        Get texts, tokens and sentences in the compact representation: tokens and sentences are stored as ids of
+        the corpus vocabulary. Processed lists are replaced by the corpus in the memo of the instance.
+
+        :param lower: to lower tokens and sentences
+        :param normalization: normalize each token
+        :param remove_stopwords: remove stopwords from the tokens
+        :param verbose:
+        :return: CorpusTokens object
+        """
+        key = ('corpus', lower, normalization, remove_stopwords)
+        if key not in self._processed:
+            texts, tokens, sentences = self.process(lower, normalization, remove_stopwords, verbose)
+            self._processed[key] = CorpusTokens.from_lists(tokens, sentences, texts)
+
+            # Lists take a lot of memory, so they're removed and will be decoded from the corpus if it's necessary
+            del self._processed[('tokens', lower, normalization, remove_stopwords)]
+            del self._processed[('sentences', lower)]
+
+        return self._processed[key]
 
     def texts(self) -> np.ndarray:
         return np.array(self._texts, dtype=object)
@@ -119,6 +178,93 @@ class Preprocessor:
     def authors(self):
         return self._authors
 
+    def _process_texts(self, process_text, options: tuple, verbose: bool) -> list:
+        """
+        Processes texts by workers and sums hits and misses of the morphological cache made by them.
+        """
+        texts = tqdm(self._texts) if verbose else self._texts
+        results = Parallel(n_jobs=self.n_jobs)(delayed(self._count_morph)(process_text, text, *options)
+                                               for text in texts)
+
+        self.morph_hits += sum(hits for _, hits, _ in results)
+        self.morph_misses += sum(misses for _, _, misses in results)
+        return [result for result, _, _ in results]
+
+    def _print_morph_info(self):
+        lookups = self.morph_hits + self.morph_misses
+        ratio = self.morph_hits / lookups if lookups else 0
+        print(f'Morphological cache: {self.morph_hits} hits, {self.morph_misses} misses ({ratio:.1%} hits)',
+              file=sys.stderr)
+
+    @staticmethod
+    def _count_morph(process_text, text: str, *options) -> tuple:
+        """
+        Processes the text in a worker and counts hits and misses of the morphological cache of the worker.
+
+        :return: tuple of the result of processing, hits and misses
+        """
+        hits, misses = MORPH_CACHE.hits, MORPH_CACHE.misses
+        result = process_text(text, *options)
+        return result, MORPH_CACHE.hits - hits, MORPH_CACHE.misses - misses
+
+    @staticmethod
+    def _to_array(results: list[list[str]]) -> np.ndarray:
+        """
+        Makes an one-dimensional array of lists. np.array() can't be used here, because it makes a 2D array
+        if all the lists have the same length.
+        """
+        array = np.empty(len(results), dtype=object)
+        array[:] = results
+        return array
+
+    @staticmethod
+    def _process_document(text: str, lower: bool, normalization: bool, remove_stopwords: bool) -> tuple:
+        """
+        Makes both a list of tokens and a list of sentences from the text.
+        """
+        return (Preprocessor._process_tokens(text, lower, normalization, remove_stopwords),
+                Preprocessor._process_sentences(text, lower))
+
+    @staticmethod
+    def _process_tokens(text: str, lower: bool, normalization: bool, remove_stopwords: bool) -> list[str]:
+        """
+        Makes a list of tokens from the text. See the tokens() method for the description of options.
+        """
+        preprocessed_text = Preprocessor.preprocess_text(text, lower=lower, delete_whitespace=True, delete_urls=True)
+
+        # Nested conditions - it's faster than make it separately
+        if normalization:
+            if remove_stopwords:
+                tokens = [normal_form for token in tokenize(preprocessed_text)
+                          if not PUNCTUATIONS.match(token.text)
+                          and not STOPWORDS.match((normal_form := MORPH_CACHE.normal_form(token.text)))]
+            else:
+                tokens = [MORPH_CACHE.normal_form(token.text) for token in tokenize(preprocessed_text)
+                          if not PUNCTUATIONS.match(token.text)]
+        else:
+            if remove_stopwords:
+                tokens = [token.text for token in tokenize(preprocessed_text)
+                          if not PUNCTUATIONS.match(token.text) and not STOPWORDS.match(token.text)]
+            else:
+                tokens = [token.text for token in tokenize(preprocessed_text) if not PUNCTUATIONS.match(token.text)]
+        return tokens
+
+    @staticmethod
+    def _process_sentences(text: str, lower: bool) -> list[str]:
+        """
+        Makes a list of sentences from the text. See the sentences() method for the description of options.
+        """
+        preprocessed_text = Preprocessor.preprocess_text(text, lower=False, delete_whitespace=False, delete_urls=True)
+
+        if lower:
+            sentences = [re.sub(r'[\s]+', r' ', PUNCTUATIONS.sub(" ", sentence.text.lower())).strip()
+                         for sentence in sentenize(preprocessed_text) if sentence.text]
+        else:
+            sentences = [re.sub(r'[\s]+', r' ', PUNCTUATIONS.sub(" ", sentence.text)).strip()
+                         for sentence in sentenize(preprocessed_text) if sentence.text]
+
+        return sentences
+
     @staticmethod
     def preprocess_text(text: str,
                         lower=True,
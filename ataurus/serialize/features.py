@@ -1,34 +1,136 @@
 import numpy as np
 import pandas as pd
 import joblib
+import tempfile
+import json
 import os
+from features.features import FEATURES_DESCRIPTION
+from preparing.corpus import pack_strings, unpack_strings
 
 
-def serialize_features(features: pd.DataFrame, filename: str, authors: np.ndarray = None):
+# The version of the format of the columnar features store
+STORE_FORMAT_VERSION = 1
+
+SCHEMA_FILE = 'schema.json'
+
+# The name of the array of authors in the store of features
+AUTHORS_COLUMN = '__authors__'
+
+
+def _get_groups(columns: list[str]) -> dict:
+    """
+    Splits numeric columns into groups of features by prefixes of their names. A column which name doesn't start
+    with a name of a feature makes its own group.
+    """
+    groups = {}
+    for column in columns:
+        group = next((name for name in FEATURES_DESCRIPTION if column.startswith(name)), column)
+        groups.setdefault(group, []).append(column)
+    return groups
+
+
+def _remove_store(directory: str):
+    """
+    Removes the schema and the arrays of the store in the directory. The schema is removed first, so the store
+    isn't loadable while its arrays are removed and written again. Other files of the directory aren't touched.
+    """
+    schema_file = os.path.join(directory, SCHEMA_FILE)
+    try:
+        with open(schema_file, 'r') as file:
+            schema = json.load(file)
+    except (OSError, ValueError):
+        schema = None
+    if os.path.exists(schema_file):
+        os.remove(schema_file)
+    if not isinstance(schema, dict):
+        return
+
+    extension = '.npz' if schema.get('compressed') else '.npy'
+    names = [group + extension for group in schema.get('groups', {})] + \
+            [column + '.strings.npz' for column in schema.get('strings', [])]
+    for name in names:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+def serialize_features(features: pd.DataFrame, filename: str, authors: np.ndarray = None, compress: bool = False):
     """
-    Serializes a DataFrame object containing extracted features and authors.
+    Serializes a DataFrame object containing extracted features and authors into the columnar store. The store is
+    a directory containing the schema and one array per a group of features, so groups may be loaded separately.
+    Non-numeric columns (such as titles and links) and authors are stored as packed strings.
 
     :param features: extracted features
     :param authors: a list of authors
-    :param filename: file where features will be serialized to
+    :param filename: the directory where features will be serialized to
+    :param compress: compress the arrays, compressed arrays can't be memory-mapped and are loaded into memory
     """
     if type(features) != pd.DataFrame:
         raise ValueError("Serializing features don't represent a DataFrame object")
+    if os.path.isfile(filename):
+        raise ValueError("The store of features must be a directory, but the specified path is a file")
+
+    os.makedirs(filename, exist_ok=True)
+    _remove_store(filename)
+
+    numeric = [column for column in features.columns if pd.api.types.is_numeric_dtype(features[column])]
+    strings = {column: features[column].values for column in features.columns if column not in numeric}
+    if authors is not None:
+        strings[AUTHORS_COLUMN] = np.asarray(authors, dtype=object).ravel()
 
-    # If y was passed, serialize it with features together
-    serializing = features, authors if authors is not None else features
-    joblib.dump(serializing, filename)
+    groups = _get_groups(numeric)
+    for group, columns in groups.items():
+        values = np.ascontiguousarray(features[columns].values, dtype=np.float64)
+        if compress:
+            np.savez_compressed(os.path.join(filename, group + '.npz'), values=values)
+        else:
+            np.save(os.path.join(filename, group + '.npy'), values)
 
+    for column, values in strings.items():
+        nulls = pd.isnull(values)
+        buffer, offsets = pack_strings(['' if null else str(value) for value, null in zip(values, nulls)])
+        save = np.savez_compressed if compress else np.savez
+        save(os.path.join(filename, column + '.strings.npz'), buffer=buffer, offsets=offsets, nulls=nulls)
 
-def deserialize_features(filename: str):
+    # The schema is written last, so an interrupted serializing doesn't leave a loadable store. It's replaced
+    # atomically, so a reader never sees a partially written schema
+    schema = {
+        'format': STORE_FORMAT_VERSION,
+        'count': len(features.index),
+        'compressed': compress,
+        'groups': groups,
+        'strings': list(strings),
+        'columns': list(features.columns)
+    }
+    temporary = os.path.join(filename, SCHEMA_FILE + '.tmp')
+    with open(temporary, 'w') as file:
+        json.dump(schema, file, indent=2)
+    os.replace(temporary, os.path.join(filename, SCHEMA_FILE))
+
+
+def _load_strings(filename: str) -> np.ndarray:
+    with np.load(filename) as data:
+        values = np.array(unpack_strings(data['buffer'], data['offsets']), dtype=object)
+        values[data['nulls']] = None
+    return values
+
+
+def deserialize_features(filename: str, groups: list[str] = None):
     """
-    Deserializes a DataFrame object containing extracted features.
+    Deserializes a DataFrame object containing extracted features. Arrays of the columnar store are memory-mapped,
+    unless they're compressed. Features serialized into one file by previous versions are loaded entirely.
 
-    :param filename: file where features will be deserialized from
+    :param filename: the directory of the store or the file where features will be deserialized from
+    :param groups: names of the groups of features that will be loaded, all the groups are loaded if it's None.
+                   Non-numeric columns are always loaded
+    :return: tuple of features and authors
     """
     if not os.path.exists(filename):
         raise FileNotFoundError("Specified file for deserializing doesn't exist")
 
+    if os.path.isdir(filename):
+        return _deserialize_store(filename, groups)
+
     features, authors = None, None
 
     deserializing = joblib.load(filename)
@@ -44,4 +146,96 @@ def deserialize_features(filename: str):
     if type(features) != pd.DataFrame:
         raise TypeError("Deserialized object isn't pd.DataFrame")
 
+    if groups is not None:
+        numeric = [column for column in features.columns if pd.api.types.is_numeric_dtype(features[column])]
+        needed = [column for group in groups for column in _get_groups(numeric).get(group, [])]
+        features = features[needed + [column for column in features.columns if column not in numeric]]
+
     return features, authors if authors is not None else features
+
+
+def _deserialize_store(directory: str, groups: list[str] = None) -> tuple:
+    schema_file = os.path.join(directory, SCHEMA_FILE)
+    if not os.path.exists(schema_file):
+        raise FileNotFoundError("The store of features doesn't contain the schema")
+
+    with open(schema_file, 'r') as file:
+        schema = json.load(file)
+
+    if schema.get('format') != STORE_FORMAT_VERSION:
+        raise ValueError(f"The store of features has the format {schema.get('format')}, "
+                         f"but only the format {STORE_FORMAT_VERSION} is supported")
+
+    if groups is None:
+        groups = list(schema['groups'])
+    elif unknown := [group for group in groups if group not in schema['groups']]:
+        raise ValueError(f"The store of features doesn't contain groups: {', '.join(unknown)}")
+
+    frames = []
+    for group in groups:
+        if schema['compressed']:
+            with np.load(os.path.join(directory, group + '.npz')) as data:
+                values = data['values']
+        else:
+            values = np.load(os.path.join(directory, group + '.npy'), mmap_mode='r')
+        frames.append(pd.DataFrame(values, columns=schema['groups'][group], copy=False))
+
+    # Frames are concatenated without copying, so mapped values stay on the disk
+    features = pd.concat(frames, axis=1) if frames else pd.DataFrame(index=range(schema['count']))
+    authors = None
+    for column in schema['strings']:
+        values = _load_strings(os.path.join(directory, column + '.strings.npz'))
+        if column == AUTHORS_COLUMN:
+            authors = values
+        else:
+            features[column] = values
+
+    return features, authors
+
+
+class FeaturesSpill:
+    def __init__(self, directory: str = None):
+        """
+        Storage of extracted features on the disk. Blocks of features are appended to a temporary file while
+        the input is processed by chunks, so only one block is kept in memory.
+
+        :param directory: the directory of the temporary file, the default temporary directory is used if it's None
+        """
+        self._file = tempfile.TemporaryFile(dir=directory, suffix='.features')
+        self._columns = None
+        self._count = 0
+
+    def append(self, features: pd.DataFrame):
+        """
+        Appends a block of features. All the blocks must have the same columns.
+
+        :param features: extracted features
+        """
+        if self._columns is None:
+            self._columns = list(features.columns)
+        elif self._columns != list(features.columns):
+            raise ValueError("Appending features have other columns than the previous ones")
+
+        self._file.write(np.ascontiguousarray(features.values, dtype=np.float64).tobytes())
+        self._count += len(features.index)
+
+    def __len__(self):
+        return self._count
+
+    def load(self) -> pd.DataFrame:
+        """
+        Returns all the appended features. Values aren't read into memory, they are mapped from the file.
+        """
+        if self._columns is None:
+            raise ValueError("No features were appended")
+
+        # An empty file can't be mapped
+        if not self._count:
+            return pd.DataFrame(np.empty((0, len(self._columns))), columns=self._columns)
+
+        self._file.flush()
+        values = np.memmap(self._file, dtype=np.float64, mode='r', shape=(self._count, len(self._columns)))
+        return pd.DataFrame(values, columns=self._columns, copy=False)
+
+    def close(self):
+        self._file.close()
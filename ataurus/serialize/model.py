@@ -1,33 +1,110 @@
-import pickle
 import os
+import json
+import pickle
+import joblib
+import numpy as np
+import shutil
+import sklearn
+from datetime import datetime
 from sklearn.pipeline import Pipeline
+from serialize.trees import TREES_DIRECTORY, iter_tree_estimators, save_trees, map_trees
+
+# The version of the format of model artifacts, it must be increased after incompatible changes of the format
+MODEL_FORMAT_VERSION = 2
+
+MANIFEST_FILE = 'manifest.json'
+PIPELINE_FILE = 'pipeline.joblib'
+
+
+def get_versions() -> dict:
+    """
+    Returns versions of the format and libraries which a model artifact depends on.
+    """
+    return {
+        'format': MODEL_FORMAT_VERSION,
+        'sklearn': sklearn.__version__,
+        'numpy': np.__version__
+    }
 
 
 def serialize_model(model: Pipeline, filename: str):
     """
-    Serializes a model into the .pickle file.
+    Serializes a model into the artifact directory. The directory contains the manifest with versions of the format
+    and libraries, the pipeline dumped without compression, so its numeric arrays may be memory-mapped, and node
+    tables of decision trees stored separately (see serialize.trees).
 
     :param model: serializing model
-    :param filename: the name of the file
+    :param filename: the name of the artifact directory
     """
     if type(model) != Pipeline:
         raise ValueError("Serializing model isn't a Pipeline instance")
+    if os.path.isfile(filename):
+        raise ValueError("The model artifact must be a directory, but the specified path is a file")
 
-    with open(filename, 'wb') as file:
-        pickle.dump(model, file)
+    # The manifest of a previous artifact is removed before and written after the pipeline,
+    # so an interrupted serializing doesn't leave a loadable artifact
+    manifest_file = os.path.join(filename, MANIFEST_FILE)
+    trees_directory = os.path.join(filename, TREES_DIRECTORY)
+    os.makedirs(filename, exist_ok=True)
+    if os.path.exists(manifest_file):
+        os.remove(manifest_file)
+    shutil.rmtree(trees_directory, ignore_errors=True)
 
+    # Trees are replaced by their mapped versions only while the pipeline is dumped, the model stays intact
+    estimators = list(iter_tree_estimators(model))
+    trees = [estimator.tree_ for estimator in estimators]
+    try:
+        if estimators:
+            for estimator, mapped_tree in zip(estimators, save_trees(estimators, trees_directory)):
+                estimator.tree_ = mapped_tree
+        joblib.dump(model, os.path.join(filename, PIPELINE_FILE))
+    finally:
+        for estimator, tree in zip(estimators, trees):
+            estimator.tree_ = tree
 
-def deserialize_model(filename: str) -> Pipeline:
+    manifest = get_versions()
+    manifest['created'] = datetime.now().isoformat()
+    with open(manifest_file, 'w') as file:
+        json.dump(manifest, file, indent=2)
+
+
+def deserialize_model(filename: str, mmap: bool = True) -> Pipeline:
     """
-    Deserializes a model from a .pickle file.
+    Deserializes a model from the artifact directory. Numeric arrays of the model are memory-mapped read-only,
+    so processes loading the same artifact share one copy of them in the page cache. Models serialized by other
+    versions of the format or libraries are rejected.
+
+    Node tables of decision trees and random forests are mapped too, trees of the loaded model predict from them
+    directly, so loading doesn't depend on the size of the forest.
+
+    A model serialized into a .pickle file by previous versions is loaded entirely into memory.
 
-    :param filename: the name of the file
+    :param filename: the name of the artifact directory or the .pickle file
+    :param mmap: memory-map numeric arrays of the model
     """
     if not os.path.exists(filename):
         raise FileNotFoundError("Specified file for deserializing doesn't exist")
 
-    with open(filename, 'rb') as file:
-        model = pickle.load(file)
+    if os.path.isdir(filename):
+        manifest_file = os.path.join(filename, MANIFEST_FILE)
+        if not os.path.exists(manifest_file):
+            raise FileNotFoundError("The model artifact doesn't contain the manifest")
+
+        with open(manifest_file, 'r') as file:
+            manifest = json.load(file)
+
+        versions = get_versions()
+        mismatched = [f"{name} {manifest.get(name)} (installed {version})"
+                      for name, version in versions.items() if manifest.get(name) != version]
+        if mismatched:
+            raise ValueError("The model was serialized by other versions and must be trained again: " +
+                             ', '.join(mismatched))
+
+        model = joblib.load(os.path.join(filename, PIPELINE_FILE), mmap_mode='r' if mmap else None)
+        map_trees(model, os.path.join(filename, TREES_DIRECTORY), mmap)
+    else:
+        with open(filename, 'rb') as file:
+            model = pickle.load(file)
 
     if type(model) != Pipeline:
         raise TypeError("Deserialized object isn't Pipeline")
@@ -0,0 +1,129 @@
+"""
+Module contains sinks of predictions. A sink receives predictions by batches and writes each batch at once,
+so results of processed batches are saved even if predicting is interrupted.
+"""
+import io
+import abc
+import os
+import sys
+import csv
+import json
+
+# Size of the buffer of output files
+BUFFER_SIZE = 1 << 20
+
+# Columns of written predictions
+PREDICTIONS_COLUMNS = ['author', 'title', 'link']
+
+
+class PredictionsSink(abc.ABC):
+    def __init__(self, file: io.TextIOBase, close_file: bool = True):
+        """
+        Base class of sinks writing predictions into a text file.
+
+        :param file: a file object where predictions will be written
+        :param close_file: close the file when the sink is closed
+        """
+        self._file = file
+        self._close_file = close_file
+        self.count = 0
+
+    def write(self, authors, titles, links):
+        """
+        Writes a batch of predictions by one call of the file's write() and flushes the file.
+
+        :param authors: predicted authors, the author is None if the row couldn't be scored
+        :param titles: titles of articles
+        :param links: links of articles
+        """
+        buffer = io.StringIO()
+        rows = list(zip(authors, titles, links))
+        self._format(buffer, rows)
+
+        self._file.write(buffer.getvalue())
+        self._file.flush()
+        self.count += len(rows)
+
+    @abc.abstractmethod
+    def _format(self, buffer: io.StringIO, rows: list[tuple]):
+        """
+        Formats rows of predictions into the buffer, it's implemented by subclasses.
+        """
+
+    def close(self):
+        if self._close_file:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class TextSink(PredictionsSink):
+    """
+    Writes predictions as a table aligned by spaces. Rows which couldn't be scored have the empty author.
+    """
+    def _format(self, buffer, rows):
+        for author, title, link in rows:
+            author = '' if author is None else str(author)
+            print(author.ljust(20), str(title).ljust(100), str(link).ljust(100), file=buffer)
+
+
+class CsvSink(PredictionsSink):
+    """
+    Writes predictions in the .csv format, the header is written before the first batch.
+    """
+    def __init__(self, file: io.TextIOBase, close_file: bool = True):
+        super().__init__(file, close_file)
+        self._header_written = False
+
+    def _format(self, buffer, rows):
+        writer = csv.writer(buffer)
+        if not self._header_written:
+            writer.writerow(PREDICTIONS_COLUMNS)
+            self._header_written = True
+        writer.writerows(rows)
+
+
+class JsonlSink(PredictionsSink):
+    """
+    Writes predictions in the JSON Lines format: one JSON object per an article.
+    """
+    def _format(self, buffer, rows):
+        for row in rows:
+            buffer.write(json.dumps(dict(zip(PREDICTIONS_COLUMNS, row)), ensure_ascii=False, default=str))
+            buffer.write('\n')
+
+
+SINKS = {
+    'text': TextSink,
+    'csv': CsvSink,
+    'jsonl': JsonlSink
+}
+
+
+def get_sink(filename: str = None, output_format: str = None) -> PredictionsSink:
+    """
+    Creates a sink of predictions. If the format isn't specified, it's chosen by the extension of the file:
+    .csv, .jsonl or the text table for other files and the standard output.
+
+    :param filename: a file where predictions will be written, if it's None predictions are written to stdout
+    :param output_format: one of 'text', 'csv' or 'jsonl'
+    :return: PredictionsSink object
+    """
+    if output_format is None:
+        extension = os.path.splitext(filename)[1].lower() if filename else ''
+        output_format = {'.csv': 'csv', '.jsonl': 'jsonl'}.get(extension, 'text')
+
+    if output_format not in SINKS:
+        raise ValueError(f"Unknown format of predictions: {output_format}. You may specify one of: "
+                         f"{', '.join(SINKS)}")
+
+    if filename is None:
+        return SINKS[output_format](sys.stdout, close_file=False)
+
+    return SINKS[output_format](open(filename, 'w', newline='', buffering=BUFFER_SIZE, encoding='utf-8'))
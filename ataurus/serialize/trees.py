@@ -0,0 +1,182 @@
+"""
+Module contains the storage of decision trees of model artifacts. sklearn's Tree copies its nodes into its own
+buffers when it's unpickled, so node tables of trees are stored as separate .npy files instead. A loaded tree
+is replaced by the MappedTree object, which predicts from memory-mapped node tables directly.
+"""
+import os
+import numpy as np
+from scipy.sparse import issparse
+from sklearn.pipeline import Pipeline
+from sklearn.base import BaseEstimator
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier, ExtraTreesRegressor
+
+TREES_DIRECTORY = 'trees'
+
+# Arrays of nodes of trees, the arrays of all the trees are concatenated into one file per array
+NODE_ARRAYS = {
+    'children_left': np.intp,
+    'children_right': np.intp,
+    'feature': np.intp,
+    'threshold': np.float64,
+    'missing_go_to_left': np.uint8
+}
+VALUE_ARRAY = 'value'
+
+TREE_LEAF = -1
+
+FORESTS = (RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier, ExtraTreesRegressor)
+
+
+class MappedTree:
+    def __init__(self, n_features: int, n_outputs: int, max_n_classes: int, node_count: int, max_depth: int,
+                 node_offset: int, value_offset: int):
+        """
+        Decision tree predicting from node tables stored outside of the object. Only predict() and apply() of dense
+        inputs are supported, that's enough for predicting by decision trees and forests. Samples are routed
+        by numpy, so predicting is a few times slower than by sklearn's compiled trees, but the tree is loaded
+        instantly and its nodes are shared by processes. The node tables aren't pickled, they're attached
+        by the map() method after loading.
+
+        :param node_offset: the position of the first node of the tree in the concatenated node arrays
+        :param value_offset: the position of the first value of the tree in the concatenated value array
+        """
+        self.n_features = n_features
+        self.n_outputs = n_outputs
+        self.max_n_classes = max_n_classes
+        self.node_count = node_count
+        self.max_depth = max_depth
+        self.node_offset = node_offset
+        self.value_offset = value_offset
+
+        self.children_left = None
+        self.children_right = None
+        self.feature = None
+        self.threshold = None
+        self.missing_go_to_left = None
+        self.value = None
+
+    def map(self, arrays: dict):
+        """
+        Attaches the node tables of the tree. They're plain views of the concatenated arrays, so they aren't copied
+        and indexing them doesn't go through np.memmap.
+        """
+        nodes = slice(self.node_offset, self.node_offset + self.node_count)
+        for name in NODE_ARRAYS:
+            setattr(self, name, np.asarray(arrays[name][nodes]))
+        self.missing_go_to_left = self.missing_go_to_left.view(np.bool_)
+
+        size = self.node_count * self.n_outputs * self.max_n_classes
+        value = np.asarray(arrays[VALUE_ARRAY][self.value_offset:self.value_offset + size])
+        self.value = value.reshape(self.node_count, self.n_outputs, self.max_n_classes)
+
+    @property
+    def n_leaves(self) -> int:
+        return int(np.count_nonzero(self.children_left == TREE_LEAF))
+
+    def apply(self, X) -> np.ndarray:
+        """
+        Finds the leaf of each sample, samples go down the tree level by level at once.
+        """
+        if issparse(X):
+            raise ValueError("Sparse inputs aren't supported by trees of model artifacts")
+
+        X = np.asarray(X)
+        has_nan = np.isnan(X).any()
+        leaves = np.zeros(len(X), dtype=np.intp)
+        active = np.flatnonzero(self.children_left[leaves] != TREE_LEAF)
+        while active.size:
+            nodes = leaves[active]
+            values = X[active, self.feature[nodes]]
+            left = values <= self.threshold[nodes]
+            if has_nan:
+                # Missing values go to the side chosen while fitting
+                missing = np.isnan(values)
+                left[missing] = self.missing_go_to_left[nodes[missing]]
+            leaves[active] = np.where(left, self.children_left[nodes], self.children_right[nodes])
+            active = active[self.children_left[leaves[active]] != TREE_LEAF]
+
+        return leaves
+
+    def predict(self, X) -> np.ndarray:
+        out = self.value.take(self.apply(X), axis=0, mode='clip')
+        if self.n_outputs == 1:
+            out = out.reshape(len(out), self.max_n_classes)
+        return out
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in list(NODE_ARRAYS) + [VALUE_ARRAY]:
+            state[name] = None
+        return state
+
+
+def iter_tree_estimators(estimator):
+    """
+    Generator of fitted decision trees of the estimator which predict through their tree_ attribute: single trees
+    and trees of random forests. Trees of gradient boosting are predicted by sklearn's own code, so they're skipped.
+    """
+    if isinstance(estimator, Pipeline):
+        for _, step in estimator.steps:
+            yield from iter_tree_estimators(step)
+    elif isinstance(estimator, (DecisionTreeClassifier, DecisionTreeRegressor)):
+        if hasattr(estimator, 'tree_'):
+            yield estimator
+    elif isinstance(estimator, FORESTS):
+        for tree in getattr(estimator, 'estimators_', []):
+            yield from iter_tree_estimators(tree)
+    elif isinstance(estimator, BaseEstimator):
+        # Meta-estimators like the Model keep the fitted estimator in their parameters
+        for value in vars(estimator).values():
+            if isinstance(value, BaseEstimator):
+                yield from iter_tree_estimators(value)
+
+
+def save_trees(estimators: list, directory: str) -> list[MappedTree]:
+    """
+    Writes node tables of trees of the estimators into the directory and returns MappedTree objects replacing
+    their trees. The arrays are filled in place, so the trees aren't copied into memory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    trees = [estimator.tree_ for estimator in estimators]
+    node_count = sum(tree.node_count for tree in trees)
+
+    arrays = {name: np.lib.format.open_memmap(os.path.join(directory, name + '.npy'), mode='w+', dtype=dtype,
+                                              shape=(node_count,))
+              for name, dtype in NODE_ARRAYS.items()}
+    arrays[VALUE_ARRAY] = np.lib.format.open_memmap(os.path.join(directory, VALUE_ARRAY + '.npy'), mode='w+',
+                                                    dtype=np.float64, shape=(sum(tree.value.size for tree in trees),))
+
+    mapped = []
+    node_offset = value_offset = 0
+    for tree in trees:
+        mapped_tree = MappedTree(tree.n_features, tree.n_outputs, int(tree.max_n_classes), tree.node_count,
+                                 tree.max_depth, node_offset, value_offset)
+        nodes = slice(node_offset, node_offset + tree.node_count)
+        for name in NODE_ARRAYS:
+            arrays[name][nodes] = getattr(tree, name)
+        arrays[VALUE_ARRAY][value_offset:value_offset + tree.value.size] = tree.value.ravel()
+
+        mapped.append(mapped_tree)
+        node_offset += tree.node_count
+        value_offset += tree.value.size
+
+    for array in arrays.values():
+        array.flush()
+    return mapped
+
+
+def map_trees(model, directory: str, mmap: bool = True):
+    """
+    Attaches node tables stored in the directory to MappedTree objects of the loaded model.
+
+    :param mmap: memory-map the node tables read-only, otherwise they're loaded into memory
+    """
+    estimators = [estimator for estimator in iter_tree_estimators(model) if isinstance(estimator.tree_, MappedTree)]
+    if not estimators:
+        return
+
+    arrays = {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode='r' if mmap else None)
+              for name in list(NODE_ARRAYS) + [VALUE_ARRAY]}
+    for estimator in estimators:
+        estimator.tree_.map(arrays)
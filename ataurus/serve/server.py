@@ -0,0 +1,271 @@
+"""
+Module contains the long-running server of predictions. The model, the morphological analyzer and imported libraries
+are loaded once, then texts are received over HTTP or a Unix socket. Texts of requests arriving close together
+are grouped into micro-batches, so preprocessing and predicting of them are made by one call.
+"""
+import os
+import stat
+import json
+import time
+import queue
+import threading
+import socketserver
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sklearn.pipeline import Pipeline
+from preparing.preprocessor import Preprocessor
+from features.extract import FeaturesExtractor
+
+# The default maximum count of texts in a micro-batch
+MAX_BATCH_SIZE_DEFAULT = 32
+
+# The default time in seconds a micro-batch waits for following texts after the first one
+MAX_DELAY_DEFAULT = 0.005
+
+# The default time in seconds a request waits for its predictions
+REQUEST_TIMEOUT_DEFAULT = 30
+
+# The text predicted before the server starts, so dictionaries and caches are loaded before the first request
+WARMUP_TEXT = 'Сервер загружает словари. Первый запрос не должен ждать, пока они загрузятся!'
+
+
+class AuthorsPredictor:
+    def __init__(self, model: Pipeline):
+        """
+        Predicts authors of unprocessed texts in the current process. Texts are preprocessed without workers,
+        because starting of workers takes more time than processing of a micro-batch.
+
+        :param model: a fitted Pipeline receiving extracted features
+        """
+        self.model = model
+        self._extractor = FeaturesExtractor(n_jobs=1, verbose=False)
+
+    def predict(self, texts: list[str]) -> list:
+        """
+        Predicts authors of texts.
+
+        :param texts: a list of unprocessed texts
+        :return: a list of authors aligned with texts, it contains None for texts whose features can't be extracted
+        """
+        corpus = Preprocessor(texts, n_jobs=1).corpus(verbose=False)
+        X = self._extractor.transform(corpus)
+
+        authors = [None] * len(texts)
+        notnull_indexes = X.notnull().all(axis=1).values
+        if notnull_indexes.any():
+            predicted = self.model.predict(X[notnull_indexes])
+            for i, author in zip(notnull_indexes.nonzero()[0], predicted):
+                authors[i] = author.item() if hasattr(author, 'item') else author
+
+        return authors
+
+    def warmup(self):
+        self.predict([WARMUP_TEXT])
+
+
+class MicroBatcher:
+    def __init__(self, predict, max_batch_size: int = MAX_BATCH_SIZE_DEFAULT, max_delay: float = MAX_DELAY_DEFAULT):
+        """
+        Groups texts submitted by concurrent requests into micro-batches predicted in a background thread.
+        A batch is predicted when it has max_batch_size texts or max_delay seconds passed since its first text.
+
+        :param predict: a function receiving a list of texts and returning a list of results aligned with them
+        :param max_batch_size: the maximum count of texts in a batch
+        :param max_delay: the maximum time in seconds a batch waits for following texts
+        """
+        if max_batch_size <= 0:
+            raise ValueError("The size of micro-batches must be positive")
+        if max_delay < 0:
+            raise ValueError("The delay of micro-batches can't be negative")
+
+        self._predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.batches = 0
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: list[str]) -> list[Future]:
+        """
+        Puts texts into the queue of predicting.
+
+        :return: a list of futures of results of texts
+        """
+        futures = []
+        for text in texts:
+            future = Future()
+            self._queue.put((text, future))
+            futures.append(future)
+        return futures
+
+    def predict(self, texts: list[str], timeout: float = None) -> list:
+        """
+        Predicts texts and waits for results.
+        """
+        return [future.result(timeout) for future in self.submit(texts)]
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        closed = False
+        while not closed:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+
+                if item is None:
+                    # Texts received before closing are still predicted
+                    closed = True
+                    break
+                batch.append(item)
+
+            self._predict_batch(batch)
+
+    def _predict_batch(self, batch: list[tuple]):
+        texts = [text for text, _ in batch]
+        try:
+            results = self._predict(texts)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        self.batches += 1
+
+
+class PredictionsHandler(BaseHTTPRequestHandler):
+    """
+    Handler of requests to the server:
+        GET /health - returns {"status": "ok"}
+        POST /predict - receives {"text": "..."} or {"texts": ["...", ...]} and returns
+                        {"author": "..."} or {"authors": ["...", ...]} respectively
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {'status': 'ok'})
+        else:
+            self._send(404, {'error': f'Unknown path: {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self._send(404, {'error': f'Unknown path: {self.path}'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send(400, {'error': 'The body of the request must be a JSON object'})
+            return
+
+        single = isinstance(body, dict) and 'text' in body
+        texts = [body['text']] if single else body.get('texts') if isinstance(body, dict) else None
+        if not isinstance(texts, list) or not texts or not all(isinstance(text, str) and text for text in texts):
+            self._send(400, {'error': 'You must pass a non-empty "text" or a non-empty list of "texts"'})
+            return
+
+        try:
+            authors = self.server.batcher.predict(texts, timeout=self.server.timeout_)
+        except Exception as e:
+            self._send(500, {'error': str(e)})
+            return
+
+        self._send(200, {'author': authors[0]} if single else {'authors': authors})
+
+    def _send(self, code: int, data: dict):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Clients of a Unix socket don't have an address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(predict,
+                host: str = '127.0.0.1',
+                port: int = 8000,
+                socket_path: str = None,
+                max_batch_size: int = MAX_BATCH_SIZE_DEFAULT,
+                max_delay: float = MAX_DELAY_DEFAULT,
+                timeout: float = REQUEST_TIMEOUT_DEFAULT,
+                verbose: bool = False):
+    """
+    Creates the server of predictions, it must be started by serve_forever().
+
+    :param predict: a function receiving a list of texts and returning a list of authors
+    :param host: the host of the HTTP server
+    :param port: the port of the HTTP server
+    :param socket_path: the path of a Unix socket, it's used instead of the host and the port if it's specified.
+                        A socket left at the path is replaced, other files aren't
+    :param max_batch_size: the maximum count of texts in a micro-batch
+    :param max_delay: the maximum time in seconds a micro-batch waits for following texts
+    :param timeout: the maximum time in seconds a request waits for predictions
+    :param verbose: log requests
+    """
+    if socket_path is not None:
+        # Only a stale socket of a previous run is removed, other files are never overwritten
+        if os.path.exists(socket_path):
+            if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                raise ValueError(f"The path of the socket exists and isn't a socket: {socket_path}")
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, PredictionsHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), PredictionsHandler)
+
+    server.batcher = MicroBatcher(predict, max_batch_size, max_delay)
+    server.timeout_ = timeout
+    server.verbose = verbose
+    return server
+
+
+def serve(model: Pipeline, socket_path: str = None, **kwargs):
+    """
+    Loads dictionaries, starts the server of predictions and serves requests until the process is interrupted.
+
+    :param model: a fitted Pipeline receiving extracted features
+    :param socket_path: the path of a Unix socket, the HTTP server is started if it's None
+    :param kwargs: other parameters of make_server()
+    """
+    predictor = AuthorsPredictor(model)
+    predictor.warmup()
+
+    server = make_server(predictor.predict, socket_path=socket_path, **kwargs)
+    address = socket_path if socket_path is not None else 'http://{}:{}'.format(*server.server_address[:2])
+    print(f'Serving predictions on {address}')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.batcher.close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
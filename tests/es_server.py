@@ -0,0 +1,176 @@
+"""
+A local stand-in of an Elasticsearch cluster for tests. It keeps documents in memory and speaks the subset of
+the HTTP API used by the Database class.
+"""
+import json
+import threading
+import itertools
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ElasticsearchHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, code: int, data=None):
+        body = json.dumps(data).encode('utf-8') if data is not None else b''
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('X-Elastic-Product', 'Elasticsearch')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def _route(self):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        self.server.requests.append((self.command, url.path))
+
+        if not parts:
+            return self._send(200, {'name': 'stub', 'tagline': 'You Know, for Search',
+                                    'version': {'number': '7.17.0', 'build_flavor': 'default'}})
+
+        # The endpoint is the last part of the path starting with '_', the index is the first part before it
+        endpoints = [i for i, part in enumerate(parts) if part.startswith('_')]
+        handler = getattr(self.server, f'handle_{parts[endpoints[0]].lstrip("_")}', None) if endpoints else None
+        if handler is None:
+            return self._send(404, {'error': f'Unknown path: {url.path}'})
+
+        index = parts[0] if endpoints[0] > 0 else None
+        body = self._read_body()
+        body = json.loads(body) if body and not url.path.endswith('_bulk') else body
+        code, data = handler(self.command, index, parts[endpoints[0] + 1:], body,
+                             {key: values[-1] for key, values in parse_qs(url.query).items()})
+        self._send(code, data)
+
+    do_HEAD = do_GET = do_POST = do_PUT = do_DELETE = _route
+
+
+class ElasticsearchServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), ElasticsearchHandler)
+        self.indices = {}
+        self.requests = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._scrolls = {}
+        self._scroll_ids = itertools.count(1)
+
+        # A function receiving the id and the source of a document and returning an error status or None
+        self.bulk_hook = None
+
+    @property
+    def host(self) -> str:
+        return '{}:{}'.format(*self.server_address)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def handle_refresh(self, method, index, rest, body, query):
+        return 200, {'_shards': {'total': 1, 'successful': 1, 'failed': 0}}
+
+    def handle_bulk(self, method, index, rest, body, query):
+        lines = [json.loads(line) for line in body.decode('utf-8').splitlines() if line.strip()]
+        items = []
+        for action, source in zip(lines[::2], lines[1::2]):
+            operation, meta = next(iter(action.items()))
+            target = meta.get('_index', index)
+            doc_id = meta.get('_id')
+
+            status = self.bulk_hook(doc_id, source) if self.bulk_hook is not None else None
+            if status is not None:
+                items.append({operation: {'_index': target, '_id': doc_id, 'status': status,
+                                          'error': {'type': 'stub_exception', 'reason': f'status {status}'}}})
+                continue
+
+            with self._lock:
+                doc_id = doc_id if doc_id is not None else str(next(self._ids))
+                created = doc_id not in self.indices.setdefault(target, {})
+                self.indices[target][doc_id] = source
+            items.append({operation: {'_index': target, '_id': doc_id, 'status': 201 if created else 200,
+                                      'result': 'created' if created else 'updated'}})
+
+        errors = any(next(iter(item.values()))['status'] >= 300 for item in items)
+        return 200, {'took': 1, 'errors': errors, 'items': items}
+
+    def add(self, index: str, documents: dict):
+        """
+        Adds documents to the index, keys of the dictionary are ids of documents.
+        """
+        self.indices.setdefault(index, {}).update(documents)
+
+    @staticmethod
+    def _hit(index, doc_id, source, fields):
+        if fields is not None:
+            source = {field: source[field] for field in fields if field in source}
+        return {'_index': index, '_id': doc_id, '_source': source}
+
+    def handle_mget(self, method, index, rest, body, query):
+        if index not in self.indices:
+            return 404, {'error': {'type': 'index_not_found_exception'}, 'status': 404}
+
+        return 200, {'docs': [{'_index': index, '_id': doc_id, 'found': doc_id in self.indices[index]}
+                              for doc_id in body['ids']]}
+
+    def handle_search(self, method, index, rest, body, query):
+        body = body or {}
+        if rest == ['scroll']:
+            if method == 'DELETE':
+                scroll_ids = body.get('scroll_id', [])
+                for scroll_id in [scroll_ids] if isinstance(scroll_ids, str) else scroll_ids:
+                    self._scrolls.pop(scroll_id, None)
+                return 200, {'succeeded': True}
+            return self._next_page(body['scroll_id'])
+
+        documents = list(self.indices.get(index, {}).items())
+        if 'slice' in body:
+            documents = documents[body['slice']['id']::body['slice']['max']]
+
+        # Only queries checking whether a field exists are supported
+        condition = body.get('query', {})
+        if 'exists' in condition:
+            documents = [document for document in documents if condition['exists']['field'] in document[1]]
+        elif 'bool' in condition:
+            field = condition['bool']['must_not']['exists']['field']
+            documents = [document for document in documents if field not in document[1]]
+
+        if 'sort' in body and body['sort'] != ['_doc']:
+            # Only sorting by the time of uploading and keyword copies of ids is supported
+            keys = {doc_id: [source['indexed_at'], source['doc_id']] for doc_id, source in documents}
+            documents = sorted(documents, key=lambda document: keys[document[0]])
+            if 'search_after' in body:
+                documents = [document for document in documents if keys[document[0]] > body['search_after']]
+
+        hits = [self._hit(index, doc_id, source, body.get('_source')) for doc_id, source in documents]
+        if 'sort' in body and body['sort'] != ['_doc']:
+            for hit in hits:
+                hit['sort'] = keys[hit['_id']]
+        size = body.get('size', 10)
+        if 'scroll' not in query:
+            return 200, {'hits': {'total': {'value': len(hits)}, 'hits': hits[:size]}}
+
+        scroll_id = str(next(self._scroll_ids))
+        self._scrolls[scroll_id] = (hits, size)
+        return self._next_page(scroll_id)
+
+    def _next_page(self, scroll_id):
+        if scroll_id not in self._scrolls:
+            return 404, {'error': 'search_context_missing_exception'}
+
+        hits, size = self._scrolls[scroll_id]
+        self._scrolls[scroll_id] = (hits[size:], size)
+        return 200, {'_scroll_id': scroll_id, 'hits': {'total': {'value': len(hits)}, 'hits': hits[:size]}}
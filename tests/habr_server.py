@@ -0,0 +1,124 @@
+"""
+A local stand-in of Habr.com for tests. It serves canned pages of authors and their posts and records
+how many requests were executed at once and through how many connections.
+"""
+import re
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+USER_PAGE = '<html><body>{links}</body></html>'
+# Nodes have several classes like in the real markup of Habr
+POST_LINK = '<a class="post__title_link post__title_link_v2" href="{url}">Post</a>'
+POST_PAGE = '<html><body>' \
+            '<span class="user-info__nickname user-info__nickname_small">{author}</span>' \
+            '<span class="post__time" data-time_published="2020-01-01">01.01.2020</span>' \
+            '<h1 class="post__title"><span class="post__title-text">Заголовок {post_number}</span></h1>' \
+            '<div class="post__text post__text-html post__text_v1">Текст статьи {post_number}.</div>' \
+            '</body></html>'
+
+
+class HabrHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, code: int, text: str = '', headers: dict = None):
+        body = text.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.connections.add(self.client_address)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+
+        try:
+            time.sleep(server.delay)
+            status, text, *headers = server.get_page(self.path)
+            headers = headers[0] if headers else {}
+
+            # Unchanged pages aren't sent again if the client has them
+            if server.etags and status == 200:
+                headers['ETag'] = '"{}"'.format(hashlib.md5(text.encode('utf-8')).hexdigest())
+                if self.headers.get('If-None-Match') == headers['ETag']:
+                    with server.lock:
+                        server.not_modified += 1
+                    status, text = 304, ''
+            self._send(status, text, headers)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+class HabrServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, posts: dict, posts_per_page: int = 2, delay: float = 0, etags: bool = False):
+        """
+        :param posts: a dictionary of authors and lists of numbers of their posts
+        :param posts_per_page: count of links to posts on a page of an author
+        :param delay: the time of handling of each request in seconds
+        :param etags: send the ETag header and answer conditional requests
+        """
+        super().__init__(('127.0.0.1', 0), HabrHandler)
+        self.posts = posts
+        self.posts_per_page = posts_per_page
+        self.delay = delay
+        self.etags = etags
+
+        self.lock = threading.Lock()
+        self.requests = []
+        self.connections = set()
+        self.active = 0
+        self.max_active = 0
+        self.not_modified = 0
+
+    @property
+    def url(self) -> str:
+        return 'http://{}:{}'.format(*self.server_address)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        # Clients may close connections without reading responses when the crawl is stopped
+        pass
+
+    def get_page(self, path: str):
+        """
+        Returns the status, the text and headers of the page.
+        """
+        match = re.fullmatch(r'/ru/users/([^/]+)/posts/page(\d+)', path)
+        if match:
+            author, page_number = match.group(1), int(match.group(2))
+            if author not in self.posts:
+                return 404, ''
+            start = (page_number - 1) * self.posts_per_page
+            posts = self.posts[author][start:start + self.posts_per_page]
+            links = ''.join(POST_LINK.format(url=f'{self.url}/ru/post/{post_number}/') for post_number in posts)
+            return 200, USER_PAGE.format(links=links)
+
+        match = re.fullmatch(r'/ru/post/(\d+)/?', path)
+        if match:
+            post_number = int(match.group(1))
+            for author, posts in self.posts.items():
+                if post_number in posts:
+                    return 200, POST_PAGE.format(author=author, post_number=post_number)
+
+        return 404, ''
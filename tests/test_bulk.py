@@ -0,0 +1,78 @@
+import time
+import unittest
+import pandas as pd
+from ataurus.database.client import Database
+from tests.es_server import ElasticsearchServer
+
+
+class BulkUploadTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ElasticsearchServer().start()
+        self.database = Database.connect([self.server.host])
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_upload_dataframe(self):
+        dataframe = pd.DataFrame({'author': ['a', 'b', None, 'd'],
+                                  'text': ['текст 1', 'текст 2', 'текст 3', 'текст 4'],
+                                  'title': ['t1', 't2', 't3', 't4'],
+                                  'link': ['l1', 'l2', 'l3', 'l4'],
+                                  'post_number': [1, 2, 3, 4]})
+        result = self.database.upload_dataframe('articles', dataframe, chunk_size=2, thread_count=2)
+
+        self.assertEqual(result.success, 3)
+        self.assertEqual(result.errors, [])
+        self.assertEqual(set(self.server.indices['articles']), {'1', '2', '4'})
+        document = self.server.indices['articles']['2']
+        self.assertLess(abs(document.pop('indexed_at') / 1000 - time.time()), 60)
+        self.assertEqual(document, {'author': 'b', 'text': 'текст 2', 'title': 't2', 'link': 'l2', 'doc_id': '2'})
+        # Documents are sent by chunks
+        self.assertEqual(sum(path == '/_bulk' for _, path in self.server.requests), 2)
+
+        with self.assertRaises(ValueError):
+            self.database.upload_dataframe('articles', pd.DataFrame({'text': ['текст']}))
+
+    def test_stream_and_byte_limit(self):
+        records = ({'author': f'author {i}', 'text': 'текст ' * 50} for i in range(20))
+        result = self.database.upload_records('articles', records, chunk_size=100, max_chunk_bytes=2000)
+
+        self.assertEqual(result.success, 20)
+        self.assertEqual(len(self.server.indices['articles']), 20)
+        # Ids of documents without numbers are generated by the client and copied into the documents
+        documents = self.server.indices['articles']
+        self.assertTrue(all(document['doc_id'] == doc_id for doc_id, document in documents.items()))
+        self.assertGreater(sum(path == '/_bulk' for _, path in self.server.requests), 5)
+
+    def test_retries_and_errors(self):
+        attempts = {}
+
+        def bulk_hook(doc_id, source):
+            attempts[doc_id] = attempts.get(doc_id, 0) + 1
+            if doc_id == 'bad':
+                return 400
+            # The document is accepted only after two rejections
+            if doc_id == 'busy' and attempts[doc_id] <= 2:
+                return 429
+            return None
+
+        self.server.bulk_hook = bulk_hook
+        records = [{'author': 'a', 'text': 't', 'post_number': 'bad'},
+                   {'author': 'a', 'text': 't', 'post_number': 'busy'},
+                   {'author': 'a', 'text': 't', 'post_number': 'ok'},
+                   {'text': 'without author'}]
+        result = self.database.upload_records('articles', records, initial_backoff=0.01)
+
+        self.assertEqual(result.success, 2)
+        self.assertEqual(attempts, {'bad': 1, 'busy': 3, 'ok': 1})
+        self.assertEqual(sorted(error['status'] or 0 for error in result.errors), [0, 400])
+        self.assertEqual(set(self.server.indices['articles']), {'busy', 'ok'})
+
+    def test_retries_are_limited(self):
+        self.server.bulk_hook = lambda doc_id, source: 429
+        result = self.database.upload_records('articles', [{'author': 'a', 'text': 't'}], max_retries=2,
+                                              initial_backoff=0.01)
+
+        self.assertEqual(result.success, 0)
+        self.assertEqual([error['status'] for error in result.errors], [429])
+        self.assertEqual(sum(path == '/_bulk' for _, path in self.server.requests), 3)
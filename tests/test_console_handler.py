@@ -0,0 +1,45 @@
+import os
+import unittest.mock
+import numpy as np
+import pandas as pd
+from ataurus.console_handle.console_handler import ConsoleHandler
+
+
+class ConsoleHandlerChunksTest(unittest.TestCase):
+    def setUp(self):
+        self.input_file = 'test_input.csv'
+        pd.DataFrame({'text': ['первый', 'второй', None, 'четвертый', 'пятый'],
+                      'author': ['a', 'b', 'c', 'd', 'e'],
+                      'title': ['1', '2', '3', '4', '5'],
+                      'link': ['l1', 'l2', 'l3', 'l4', 'l5'],
+                      'date': ['', '', '', '', '']}).to_csv(self.input_file, index=False)
+
+    def tearDown(self):
+        if os.path.isfile(self.input_file):
+            os.remove(self.input_file)
+
+    def test_chunks(self):
+        handler = ConsoleHandler(['train', self.input_file, 'model', '--chunksize', '2'])
+        chunks = list(handler.input_chunks)
+
+        self.assertEqual([len(texts) for texts, *_ in chunks], [2, 2, 1])
+        self.assertEqual(list(np.concatenate([authors for _, authors, *_ in chunks])), ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(list(chunks[2][3]), ['l5'])
+
+    def test_without_chunks(self):
+        handler = ConsoleHandler(['train', self.input_file, 'model'])
+        self.assertIsNone(handler.chunksize)
+        with self.assertRaises(ValueError):
+            next(handler.input_chunks)
+
+    @unittest.mock.patch('sys.stderr', open(os.devnull, 'w'))
+    def test_incorrect_chunksize(self):
+        handler = ConsoleHandler(['predict', self.input_file, 'model', '--chunksize', '0'])
+        with self.assertRaises(SystemExit):
+            next(handler.input_chunks)
+
+    def test_incorrect_file(self):
+        pd.DataFrame({'text': ['текст']}).to_csv(self.input_file, index=False)
+        handler = ConsoleHandler(['predict', self.input_file, 'model', '--chunksize', '2'])
+        with self.assertRaises(ValueError):
+            next(handler.input_chunks)
@@ -0,0 +1,63 @@
+import os
+import unittest
+import numpy as np
+from ataurus.preparing.corpus import CorpusTokens, Vocabulary
+
+
+class VocabularyTest(unittest.TestCase):
+    def test_encode_decode(self):
+        vocabulary = Vocabulary()
+        ids = vocabulary.encode(['мы', 'текст', 'мы'])
+
+        self.assertEqual(ids.dtype, np.int32)
+        self.assertEqual(ids.tolist(), [0, 1, 0])
+        self.assertEqual(vocabulary.decode(ids), ['мы', 'текст', 'мы'])
+        self.assertEqual(vocabulary.lengths().tolist(), [2, 5])
+        self.assertIn('текст', vocabulary)
+        self.assertEqual(len(vocabulary), 2)
+
+
+class CorpusTokensTest(unittest.TestCase):
+    def setUp(self):
+        self.texts = ['Это первый текст. Второе предложение!', '', 'Собаки бегают... Кошки спят. Мы']
+        self.tokens = [['это', 'первый', 'текст', 'второе', 'предложение'],
+                       [],
+                       ['собака', 'бегать', 'кошка', 'спать', 'мы']]
+        self.sentences = [['это первый текст', 'второе предложение'],
+                          [],
+                          ['собаки бегают', '', 'кошки спят', 'мы']]
+        self.corpus = CorpusTokens.from_lists(self.tokens, self.sentences, self.texts)
+        self.filename = 'test_corpus.npz'
+
+    def tearDown(self):
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+    def assertCorpusEqual(self, corpus, indexes):
+        self.assertEqual(len(corpus), len(indexes))
+        self.assertEqual(list(corpus.texts), [self.texts[i] for i in indexes])
+        self.assertEqual(list(corpus.tokens), [self.tokens[i] for i in indexes])
+        self.assertEqual(list(corpus.sentences), [self.sentences[i] for i in indexes])
+
+    def test_decoding(self):
+        self.assertCorpusEqual(self.corpus, [0, 1, 2])
+        self.assertEqual(self.corpus.token_ids.dtype, np.int32)
+        self.assertEqual(self.corpus.tokens[-1], self.tokens[-1])
+
+    def test_parts(self):
+        self.assertCorpusEqual(self.corpus[1:], [1, 2])
+        self.assertCorpusEqual(self.corpus[2:2], [])
+        self.assertCorpusEqual(self.corpus[[2, 0]], [2, 0])
+        self.assertCorpusEqual(self.corpus[np.array([True, False, True])], [0, 2])
+        self.assertEqual(list(self.corpus.tokens[::2]), [self.tokens[0], self.tokens[2]])
+
+    def test_save_load(self):
+        self.corpus.save(self.filename)
+        self.assertCorpusEqual(CorpusTokens.load(self.filename), [0, 1, 2])
+
+        with self.assertRaises(FileNotFoundError):
+            CorpusTokens.load('not_existing_file.npz')
+
+    def test_incorrect_lists(self):
+        with self.assertRaises(ValueError):
+            CorpusTokens.from_lists(self.tokens, self.sentences[:2])
@@ -0,0 +1,104 @@
+import os
+import asyncio
+import tempfile
+import unittest
+from ataurus.data_parse.fetch import Fetcher
+from ataurus.data_parse.state import CrawlState, ResponseCache
+from tests.habr_server import HabrServer
+from tests.test_habr import get_parser
+
+
+class CrawlStateTest(unittest.TestCase):
+    def setUp(self):
+        self.server = HabrServer({'alice': [1, 2, 3, 4], 'bob': [5, 6, 7, 8]}).start()
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'state.sqlite')
+
+    def tearDown(self):
+        self.server.stop()
+        self.directory.cleanup()
+
+    def _crawl(self, failed: list[str]):
+        """
+        Crawls all the authors, requests of the paths in the list fail.
+        """
+        get_page = HabrServer.get_page
+        self.server.get_page = lambda path: (503, '') if path in failed else get_page(self.server, path)
+        self.server.requests.clear()
+
+        with CrawlState(self.filename) as state:
+            parser = get_parser(self.server, concurrent=2, state=state)
+            return asyncio.run(parser.parse_by_authors(['alice', 'bob']))
+
+    def test_resume(self):
+        dataframe = self._crawl(failed=['/ru/post/3/', '/ru/users/bob/posts/page2'])
+        self.assertEqual(sorted(dataframe['post_number']), ['1', '2', '4', '5', '6'])
+
+        # Only the failed post and pages of the author which weren't read completely are requested again
+        dataframe = self._crawl(failed=[])
+        self.assertEqual(sorted(dataframe['post_number']), ['1', '2', '3', '4', '5', '6', '7', '8'])
+        self.assertEqual(sorted(path for path in self.server.requests if '/post/' in path),
+                         ['/ru/post/3/', '/ru/post/7/', '/ru/post/8/'])
+        self.assertTrue(all(path.startswith('/ru/users/bob/') for path in self.server.requests if '/users/' in path))
+
+        # Nothing is requested when the crawl is completed
+        dataframe = self._crawl(failed=[])
+        self.assertEqual(len(dataframe.index), 8)
+        self.assertEqual(self.server.requests, [])
+
+    def test_state(self):
+        with CrawlState(self.filename) as state:
+            self.assertTrue(state.add_link('alice', 'l1'))
+            self.assertTrue(state.add_link('alice', 'l2'))
+            state.set_done('l1', ('1', 'alice', 'текст', 'заголовок', 'l1'))
+            state.set_done('l2')
+
+            self.assertFalse(state.add_link('alice', 'l1'))
+            self.assertTrue(state.add_link('alice', 'l3'))
+            self.assertEqual(state.get_pending_links('alice'), ['l3'])
+            self.assertFalse(state.is_listed('alice'))
+            state.set_listed('alice')
+
+        with CrawlState(self.filename) as state:
+            self.assertTrue(state.is_listed('alice'))
+            self.assertEqual(state.get_posts(['alice', 'bob']), [('1', 'alice', 'текст', 'заголовок', 'l1')])
+            self.assertEqual(state.get_posts(['bob']), [])
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.server = HabrServer({'alice': [1, 2, 3]}, etags=True).start()
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'cache.sqlite')
+
+    def tearDown(self):
+        self.server.stop()
+        self.directory.cleanup()
+
+    def test_conditional_requests(self):
+        with ResponseCache(self.filename) as cache:
+            # Pages are requested one by one, so cancelled requests don't change the count of cached pages
+            parser = get_parser(self.server, concurrent=2, prefetch=1, cache=cache)
+            first = asyncio.run(parser.parse_by_authors(['alice']))
+            self.assertEqual(self.server.not_modified, 0)
+
+            requests = len(self.server.requests)
+            second = asyncio.run(parser.parse_by_authors(['alice']))
+
+        # All the pages are unchanged, so they're taken from the cache
+        self.assertEqual(self.server.not_modified, len(self.server.requests) - requests)
+        self.assertEqual(sorted(first.values.tolist()), sorted(second.values.tolist()))
+
+    def test_changed_page(self):
+        async def fetch(cache):
+            async with Fetcher(cache=cache) as fetcher:
+                return await fetcher.fetch(self.server.url + '/ru/post/1/')
+
+        with ResponseCache(self.filename) as cache:
+            asyncio.run(fetch(cache))
+            self.server.posts['bob'] = self.server.posts.pop('alice')
+            response = asyncio.run(fetch(cache))
+
+            self.assertEqual(self.server.not_modified, 0)
+            self.assertIn('bob', response.text)
+            self.assertIn('bob', cache.get(self.server.url + '/ru/post/1/').text)
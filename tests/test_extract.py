@@ -0,0 +1,232 @@
+import io
+import os
+import contextlib
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+import numpy as np
+import pandas as pd
+from ataurus.features.extract import FeaturesExtractor, CorpusTokens, FeaturesCache
+import ataurus.features.combine as combine
+from ataurus.serialize.features import FeaturesSpill
+from sklearn.pipeline import Pipeline
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.model_selection import GridSearchCV
+
+
+class FeaturesExtractorTest(unittest.TestCase):
+    def setUp(self):
+        self.texts = ['Это первый текст. Второе предложение!', 'Собаки бегают по двору, кошки спят...', '',
+                      'Hello, мир! :) Как дела?']
+        self.tokens = [['это', 'первый', 'текст', 'второе', 'предложение'],
+                       ['собака', 'бегать', 'по', 'двор', 'кошка', 'спать'],
+                       [],
+                       ['hello', 'мир', 'как', 'дело']]
+        self.sentences = [['это первый текст', 'второе предложение'],
+                          ['собаки бегают по двору кошки спят'],
+                          [],
+                          ['hello мир', 'как дела']]
+
+    def test_batched_extraction(self):
+        batched = FeaturesExtractor._extract(self.texts, self.tokens, self.sentences, n_jobs=1, batched=True)
+        separate = FeaturesExtractor._extract(self.texts, self.tokens, self.sentences, n_jobs=1, batched=False)
+
+        self.assertEqual(list(batched.columns), list(separate.columns))
+        self.assertEqual(batched.shape, (4, 26))
+        np.testing.assert_array_equal(batched.values, separate.values)
+
+    def test_chosen_features(self):
+        features = FeaturesExtractor._extract(self.texts, self.tokens, self.sentences, avg_words=False,
+                                              pos_distribution=False, lexicon=False, foreign_words_ratio=False,
+                                              punctuation_distribution=False)
+        self.assertEqual(list(features.columns), ['avg_sentences_1'])
+
+        with self.assertRaises(ValueError):
+            FeaturesExtractor._extract(self.texts, self.tokens, self.sentences, avg_words=False,
+                                       avg_sentences=False, pos_distribution=False, lexicon=False,
+                                       foreign_words_ratio=False, punctuation_distribution=False)
+
+    def test_chunks(self):
+        self.assertEqual(FeaturesExtractor._get_chunks([], 4), [])
+        self.assertEqual(FeaturesExtractor._get_chunks(['a', 'b'], 4), [(0, 1), (1, 2)])
+
+        chunks = FeaturesExtractor._get_chunks(['a' * 100, 'b', 'c', 'd', 'e' * 100], 2)
+        self.assertEqual(chunks, [(0, 2), (2, 5)])
+
+    def test_quiet_extraction(self):
+        # The progress of processing of texts isn't reported if the extractor isn't verbose
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            features = FeaturesExtractor(n_jobs=1, verbose=False).fit_transform(self.texts)
+
+        self.assertEqual(features.shape, (4, 26))
+        self.assertEqual((stdout.getvalue(), stderr.getvalue()), ('', ''))
+
+    def test_empty_texts(self):
+        # A chunk without texts gets no features instead of failing the whole run
+        features = FeaturesExtractor(n_jobs=1, verbose=False).fit_transform(['', ''])
+        self.assertEqual(features.shape, (2, 26))
+        self.assertTrue(features.isnull().all(axis=None))
+        self.assertEqual(FeaturesExtractor(n_jobs=1, verbose=False).fit_transform([]).shape, (0, 26))
+
+    def test_corpus_extraction(self):
+        corpus = CorpusTokens.from_lists(self.tokens, self.sentences, self.texts)
+        extractor = FeaturesExtractor(n_jobs=1, verbose=False)
+
+        expected = FeaturesExtractor._extract(self.texts, self.tokens, self.sentences)
+        np.testing.assert_array_equal(extractor.fit_transform(corpus).values, expected.values)
+
+
+class FeaturesCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_directory = os.path.join(self.directory, '.cache')
+        self.columns = ['feature_1', 'feature_2']
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_put(self):
+        cache = FeaturesCache(self.cache_directory)
+        keys = cache.keys(['первый текст', 'второй текст'])
+        self.assertEqual(cache.get(keys), {})
+
+        cache.put(keys, np.array([[1, 2], [3, np.nan]]), self.columns)
+        cache.close()
+
+        cache = FeaturesCache(self.cache_directory)
+        found = cache.get(keys + cache.keys(['третий текст']))
+        self.assertEqual(cache.columns, self.columns)
+        np.testing.assert_array_equal(found[keys[1]], [3, np.nan])
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_eviction(self):
+        cache = FeaturesCache(self.cache_directory, max_entries=2)
+        keys = cache.keys(['1', '2', '3'])
+        cache.put(keys[:2], np.zeros((2, 2)), self.columns)
+        cache.get(keys[:1])
+        cache.put(keys[2:], np.zeros((1, 2)), self.columns)
+
+        # The second document is the least recently used one
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(set(cache.get(keys)), {keys[0], keys[2]})
+
+    def test_version(self):
+        cache = FeaturesCache(self.cache_directory)
+        keys = cache.keys(['текст'])
+        cache.put(keys, np.zeros((1, 2)), self.columns)
+        cache.close()
+
+        cache = FeaturesCache(self.cache_directory, version='other')
+        self.assertEqual(len(cache), 0)
+        self.assertNotEqual(cache.keys(['текст']), keys)
+
+    def test_cached_empty_texts(self):
+        extractor = FeaturesExtractor(n_jobs=1, cache=self.cache_directory, verbose=False)
+        expected = extractor.fit_transform(['Первый текст.'])
+
+        # Only the empty text is missed, it isn't processed and isn't cached
+        features = extractor.fit_transform(['Первый текст.', ''])
+        np.testing.assert_array_equal(features.values[0], expected.values[0])
+        self.assertTrue(features.iloc[1].isnull().all())
+        self.assertEqual(len(FeaturesCache(self.cache_directory)), 1)
+
+    def test_unreadable_cfg(self):
+        cache = FeaturesCache(self.cache_directory, max_entries=10)
+        cache.put(cache.keys(['текст']), np.zeros((1, 2)), self.columns)
+        cache.close()
+        with open(os.path.join(self.directory, 'cache_cfg.json'), 'w') as file:
+            file.write('{"features": {"max_')
+
+        # A partially written configuration doesn't look like another version of the cache
+        cache = FeaturesCache(self.cache_directory)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.columns, self.columns)
+        # The configuration is rewritten without temporary files left
+        self.assertEqual(sorted(os.listdir(self.directory)), ['.cache', 'cache_cfg.json'])
+
+    def test_shared_cache(self):
+        # Caches opened by several workers don't remove rows put by each other
+        first, second = FeaturesCache(self.cache_directory), FeaturesCache(self.cache_directory)
+        first.put(first.keys(['1']), np.zeros((1, 2)), self.columns)
+        second.put(second.keys(['2']), np.ones((1, 2)), self.columns)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(second.columns, self.columns)
+
+        # Rows of other columns replace all the rows
+        first.put(first.keys(['3']), np.zeros((1, 3)), self.columns + ['feature_3'])
+        self.assertEqual(len(second), 1)
+        self.assertEqual(set(second.get(second.keys(['1', '2', '3']))), set(second.keys(['3'])))
+
+    @unittest.mock.patch('sys.stdout', open(os.devnull, 'w'))
+    def test_cached_extraction(self):
+        texts = ['Это первый текст. Второе предложение!', 'Собаки бегают по двору, кошки спят...']
+        expected = FeaturesExtractor(n_jobs=1, verbose=False).fit_transform(texts)
+
+        extractor = FeaturesExtractor(n_jobs=1, cache=self.cache_directory, verbose=False)
+        np.testing.assert_array_equal(extractor.fit_transform(texts[:1]).values, expected.values[:1])
+
+        with unittest.mock.patch.object(FeaturesExtractor, '_extract', wraps=FeaturesExtractor._extract) as extract:
+            result = extractor.fit_transform(texts)
+            self.assertEqual(len(extract.call_args.args[0]), 1)
+
+        self.assertEqual(list(result.columns), list(expected.columns))
+        np.testing.assert_array_equal(result.values, expected.values)
+
+
+class FeaturesCombinerMemoTest(unittest.TestCase):
+    def setUp(self):
+        combine.FEATURES_MEMO.clear()
+        self.texts = np.array(['Это первый текст. Второе предложение!', 'Собаки бегают по двору, кошки спят...',
+                               'Hello, мир! Как дела?', 'Кошки спят. Собаки не спят, они бегают!'] * 3, dtype=object)
+        self.authors = np.array(['a', 'b', 'c', 'd'] * 3)
+
+    def tearDown(self):
+        combine.FEATURES_MEMO.clear()
+
+    @unittest.mock.patch('sys.stdout', open(os.devnull, 'w'))
+    def test_memoized_extraction(self):
+        expected = combine.FeaturesExtractor(n_jobs=1, verbose=False).fit_transform(self.texts)
+
+        combiner = combine.FeaturesCombiner(lexicon=False).fit(self.texts)
+        extractor = combine.FeaturesExtractor
+        with unittest.mock.patch.object(extractor, '_extract', wraps=extractor._extract) as extract:
+            first = combiner.transform(self.texts)
+            second = combine.FeaturesCombiner(pos_distribution=False).fit(self.texts).transform(self.texts[::-1])
+            self.assertEqual(extract.call_count, 1)
+
+        # Results are the same as results of combining of extracted features
+        np.testing.assert_array_equal(first, combine.FeaturesCombiner(lexicon=False).fit_transform(expected))
+        np.testing.assert_array_equal(second, combine.FeaturesCombiner(pos_distribution=False)
+                                      .fit_transform(expected[::-1]))
+
+    @unittest.mock.patch('sys.stdout', open(os.devnull, 'w'))
+    def test_grid_search(self):
+        pipeline = Pipeline([('combine', combine.FeaturesCombiner()), ('model', DecisionTreeClassifier())])
+        param_grid = {'combine__lexicon': [True, False], 'model__max_depth': [1, 2]}
+
+        extractor = combine.FeaturesExtractor
+        with unittest.mock.patch.object(extractor, '_extract', wraps=extractor._extract) as extract:
+            GridSearchCV(pipeline, param_grid, cv=3).fit(self.texts, self.authors)
+            self.assertEqual(sum(len(call.args[0]) for call in extract.call_args_list), 4)
+
+
+class FeaturesSpillTest(unittest.TestCase):
+    def test_spill(self):
+        spill = FeaturesSpill()
+        spill.append(pd.DataFrame([[1.0, 2.0]], columns=['a', 'b']))
+        spill.append(pd.DataFrame([[3.0, np.nan], [5.0, 6.0]], columns=['a', 'b']))
+
+        features = spill.load()
+        self.assertEqual(len(spill), 3)
+        self.assertEqual(list(features.columns), ['a', 'b'])
+        np.testing.assert_array_equal(features.values, [[1, 2], [3, np.nan], [5, 6]])
+
+        with self.assertRaises(ValueError):
+            spill.append(pd.DataFrame([[1.0]], columns=['c']))
+        spill.close()
+
+    def test_empty_spill(self):
+        with self.assertRaises(ValueError):
+            FeaturesSpill().load()
@@ -0,0 +1,68 @@
+import random
+import unittest
+import numpy as np
+import ataurus.features.functions as funcs
+from pymorphy2.tagset import OpencorporaTag
+
+
+def punctuations_distribution_reference(text: str) -> np.ndarray:
+    """The implementation scanning the whole text by each rule."""
+    all_count = len(funcs.PUNCTUATIONS.findall(text))
+    if not all_count:
+        return np.full(len(funcs.PUNCTS_RULES), np.nan)
+    return np.array([len(rule.findall(text)) / all_count for rule in funcs.PUNCTS_RULES])
+
+
+class PunctuationsTest(unittest.TestCase):
+    def setUp(self):
+        self.texts = ['Привет, мир!', 'Что?! Правда... Да :-))) (нет)', 'без знаков', '',
+                      'a+b=c; 50% «цитата» — тире ?.. !!! …', '([})]}«“‘»”’"„\']']
+
+        # Random texts made of punctuations, letters and whitespaces
+        random.seed(0)
+        alphabet = funcs.PUNCTUATIONS.pattern[1:-1].replace('\\', '') + 'аб c\n'
+        self.texts += [''.join(random.choices(alphabet, k=random.randint(0, 200))) for _ in range(300)]
+
+    def test_batch_is_identical(self):
+        result = funcs.punctuations_distribution_batch(self.texts)
+        expected = np.vstack([punctuations_distribution_reference(text) for text in self.texts])
+
+        self.assertEqual(result.shape, (len(self.texts), 5))
+        np.testing.assert_array_equal(result, expected)
+
+    def test_single_text(self):
+        np.testing.assert_array_equal(funcs.punctuations_distribution('Привет, мир!'), [0.5, 0.5, 0, 0, 0])
+        self.assertTrue(np.isnan(funcs.punctuations_distribution('без знаков')).all())
+
+
+class BatchKernelsTest(unittest.TestCase):
+    def setUp(self):
+        self.tokens = [['one', 'two', 'три', 'собака'], [], ['мы', 'мы', 'z', 'я'], ['fsdfsd', 'бежать']]
+        self.offsets = np.cumsum([0] + [len(tokens) for tokens in self.tokens])
+        self.flat = [token for tokens in self.tokens for token in tokens]
+
+        self.vocabulary = sorted(set(self.flat))
+        self.ids = np.array([self.vocabulary.index(token) for token in self.flat], dtype=np.int32)
+
+    def assertBatchEqual(self, result, function):
+        expected = np.hstack([function(tokens) for tokens in self.tokens])
+        np.testing.assert_array_equal(result, expected)
+
+    def test_segment_sums(self):
+        np.testing.assert_array_equal(funcs.segment_sums(np.arange(5), np.array([0, 2, 2, 5])), [1, 0, 9])
+
+    def test_avg_length(self):
+        lengths = np.array([len(token) for token in self.flat])
+        self.assertBatchEqual(funcs.avg_length_batch(lengths, self.offsets), funcs.avg_length)
+
+    def test_lexicon(self):
+        self.assertBatchEqual(funcs.lexicon_batch(self.ids, self.offsets), funcs.lexicon)
+
+    def test_foreign_words_ratio(self):
+        flags = funcs.foreign_flags(self.vocabulary)[self.ids]
+        self.assertBatchEqual(funcs.foreign_words_ratio_batch(flags, self.offsets), funcs.foreign_words_ratio)
+
+
+class PartsOfSpeechTest(unittest.TestCase):
+    def test_tagset(self):
+        self.assertEqual(list(funcs.POS), sorted(OpencorporaTag.PARTS_OF_SPEECH))
@@ -0,0 +1,236 @@
+import os
+import time
+import asyncio
+import tempfile
+import unittest
+import pandas as pd
+from ataurus.data_parse.habr import HabrParser, extract_links, extract_post
+from ataurus.data_parse.fetch import Fetcher
+from ataurus.database.client import Database
+from tests.habr_server import HabrServer, POST_PAGE, POST_LINK, USER_PAGE
+from tests.es_server import ElasticsearchServer
+
+
+def get_parser(server: HabrServer, **kwargs) -> HabrParser:
+    kwargs.setdefault('rate', None)
+    kwargs.setdefault('database', None)
+    parser = HabrParser(**kwargs)
+    parser.URL_USER = server.url + '/ru/users/{username}/posts/page{page_number}'
+    parser.URL_POST = server.url + '/ru/post/{post_number}'
+    return parser
+
+
+class HabrParserTest(unittest.TestCase):
+    def setUp(self):
+        self.server = HabrServer({'alice': [1, 2, 3, 4, 5, 6], 'bob': [7, 8, 9, 10, 11, 12]}, delay=0.05).start()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.stop()
+        self.directory.cleanup()
+
+    def test_parse_by_authors(self):
+        parser = get_parser(self.server, concurrent=4)
+        dataframe = asyncio.run(parser.parse_by_authors(['alice', 'bob'], max_count=5))
+
+        self.assertEqual(list(dataframe.columns), ['post_number', 'author', 'text', 'title', 'link'])
+        self.assertEqual(sorted(map(int, dataframe['post_number'])), [1, 2, 3, 4, 5, 7, 8, 9, 10, 11])
+        row = dataframe[dataframe['post_number'] == '8'].iloc[0]
+        self.assertEqual((row['author'], row['title'], row['text']), ('bob', 'Заголовок 8', 'Текст статьи 8.'))
+
+    def test_concurrency(self):
+        parser = get_parser(self.server, concurrent=1, prefetch=1)
+        begin = time.monotonic()
+        asyncio.run(parser.parse_by_authors(['alice', 'bob']))
+        sequential_time = time.monotonic() - begin
+        self.assertEqual(self.server.max_active, 1)
+
+        self.server.max_active = 0
+        self.server.connections.clear()
+        parser = get_parser(self.server, concurrent=4, prefetch=1)
+        begin = time.monotonic()
+        asyncio.run(parser.parse_by_authors(['alice', 'bob']))
+        concurrent_time = time.monotonic() - begin
+
+        self.assertLess(concurrent_time, sequential_time / 2)
+        self.assertGreater(self.server.max_active, 1)
+        self.assertLessEqual(self.server.max_active, 4)
+        # Connections are kept alive and reused
+        self.assertLessEqual(len(self.server.connections), 4)
+
+    def test_pages_without_posts(self):
+        # The page of the post has no text
+        page = POST_PAGE.format(author='alice', post_number=1).replace('post__text ', 'other ')
+        self.server.get_page = lambda path: (200, page) if '/post/' in path else HabrServer.get_page(self.server, path)
+
+        parser = get_parser(self.server, concurrent=2, extract_workers=1)
+        dataframe = asyncio.run(parser.parse_by_authors(['alice']))
+        self.assertEqual(len(dataframe.index), 0)
+
+    def test_streaming(self):
+        self.server.posts = {'alice': list(range(1, 41))}
+
+        async def crawl():
+            parser = get_parser(self.server, concurrent=2, queue_size=1)
+            posts = parser.iter_posts(['alice'])
+            await posts.__anext__()
+            await posts.aclose()
+            return parser
+
+        parser = asyncio.run(crawl())
+        requests = len(self.server.requests)
+        # The first post is received while pages of the author are still being read
+        self.assertLess(sum('/users/' in path for path in self.server.requests), 20)
+        self.assertIsNone(parser._executor)
+
+        # All the tasks are stopped after the generator is closed
+        time.sleep(0.2)
+        self.assertEqual(len(self.server.requests), requests)
+
+    def test_dynamic_distribution(self):
+        # One author has much more posts than others, so other tasks take the rest of authors
+        self.server.posts = {'alice': list(range(1, 21)), 'bob': [21], 'carol': [22], 'dave': [23]}
+        parser = get_parser(self.server, concurrent=2)
+        dataframe = asyncio.run(parser.parse_by_authors(['alice', 'bob', 'carol', 'dave']))
+        self.assertEqual(sorted(map(int, dataframe['post_number'])), list(range(1, 24)))
+
+    def test_save_to(self):
+        filename = os.path.join(self.directory.name, 'posts.csv')
+        parser = get_parser(self.server, concurrent=2)
+        dataframe = asyncio.run(parser.parse_by_authors(['alice'], save_to=filename))
+
+        saved = pd.read_csv(filename, dtype=str)
+        self.assertEqual(list(saved.columns), ['post_number', 'author', 'text', 'title', 'link'])
+        self.assertEqual(sorted(saved['post_number']), sorted(dataframe['post_number']))
+
+    def test_prefetch(self):
+        self.server.posts = {'alice': list(range(1, 21))}
+
+        async def put_links(parser):
+            links = asyncio.Queue()
+            async with Fetcher(concurrent=4, rate=None) as fetcher:
+                await parser._put_author_links(fetcher, 'alice', 10 ** 10, links)
+            return [links.get_nowait() for _ in range(links.qsize())]
+
+        for prefetch in (1, 4):
+            self.server.requests.clear()
+            self.server.max_active = 0
+            links = asyncio.run(put_links(get_parser(self.server, prefetch=prefetch)))
+
+            self.assertEqual(links, [f'{self.server.url}/ru/post/{i}/' for i in range(1, 21)])
+            self.assertEqual(self.server.max_active, prefetch)
+            # Pages after the last one are requested only while they're prefetched
+            self.assertGreaterEqual(len(self.server.requests), 11)
+            self.assertLessEqual(len(self.server.requests), 10 + prefetch)
+
+    def test_max_count(self):
+        self.server.posts = {'alice': list(range(1, 21))}
+        parser = get_parser(self.server, concurrent=1, per_host=4, prefetch=4)
+        dataframe = asyncio.run(parser.parse_by_authors(['alice'], max_count=5))
+
+        self.assertEqual(sorted(map(int, dataframe['post_number'])), [1, 2, 3, 4, 5])
+        # Only the pages containing needed links are requested
+        self.assertEqual(sorted(path for path in self.server.requests if '/users/' in path),
+                         [f'/ru/users/alice/posts/page{i}' for i in range(1, 4)])
+
+    def test_per_host(self):
+        parser = get_parser(self.server, concurrent=4, per_host=2)
+        asyncio.run(parser.parse_by_authors(['alice', 'bob']))
+        self.assertEqual(self.server.max_active, 2)
+
+
+class ExtractTest(unittest.TestCase):
+    def test_extract_links(self):
+        html = USER_PAGE.format(links=POST_LINK.format(url='/ru/post/1/') + '<a href="/other">Other</a>' +
+                                POST_LINK.format(url='/ru/post/2/'))
+        self.assertEqual(extract_links(html), ['/ru/post/1/', '/ru/post/2/'])
+        self.assertEqual(extract_links(USER_PAGE.format(links='')), [])
+
+    def test_extract_post(self):
+        html = POST_PAGE.format(author='alice', post_number=1).replace('Текст статьи', '<b>Начало.</b> Текст статьи')
+        self.assertEqual(extract_post(html), ('alice', 'Заголовок 1', 'Начало. Текст статьи 1.'))
+        self.assertIsNone(extract_post('<html><body><div class="post__text">Текст</div></body></html>'))
+
+    def test_multiple_classes(self):
+        # The order of classes doesn't matter and similar classes aren't matched
+        html = '<html><body>' \
+               '<a class="user-info__nickname_small user-info__nickname" href="/ru/users/alice/">alice</a>' \
+               '<h1><span class="post__title-text post__title-text_v2">Заголовок</span></h1>' \
+               '<div class="post__text-html">Аннотация</div>' \
+               '<div class="post__body post__text post__text_v2">Текст</div>' \
+               '</body></html>'
+        self.assertEqual(extract_post(html), ('alice', 'Заголовок', 'Текст'))
+        self.assertIsNone(extract_post(html.replace('user-info__nickname_small', 'other')))
+
+        html = '<a class="post__title_link-other" href="/other">Other</a>' \
+               '<a class="post__title post__title_link" href="/ru/post/1/">Post</a>'
+        self.assertEqual(extract_links(html), ['/ru/post/1/'])
+
+
+class FetcherTest(unittest.TestCase):
+    def setUp(self):
+        self.server = HabrServer({'alice': [1]}).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_fetch(self):
+        async def fetch(url, **kwargs):
+            async with Fetcher(**kwargs) as fetcher:
+                return await fetcher.fetch(url)
+
+        response = asyncio.run(fetch(self.server.url + '/ru/post/1/'))
+        self.assertEqual(response.status, 200)
+        self.assertIn('Текст статьи 1.', response.text)
+
+        self.assertEqual(asyncio.run(fetch(self.server.url + '/ru/post/2/')).status, 404)
+
+        self.server.delay = 0.5
+        response = asyncio.run(fetch(self.server.url + '/ru/post/1/', timeout=0.1, retries=0))
+        self.assertIsNone(response.status)
+
+    def test_incorrect_usage(self):
+        with self.assertRaises(ValueError):
+            asyncio.run(Fetcher().fetch(self.server.url))
+        with self.assertRaises(ValueError):
+            Fetcher(concurrent=0)
+
+
+class SkipIndexedTest(unittest.TestCase):
+    def setUp(self):
+        self.server = HabrServer({'alice': [1, 2, 3, 4, 5], 'bob': [6, 7]}).start()
+        self.es_server = ElasticsearchServer().start()
+        self.es_server.add('articles', {str(i): {'author': 'alice', 'text': f'текст {i}'} for i in (1, 2, 4)})
+        self.database = Database.connect([self.es_server.host])
+
+    def tearDown(self):
+        self.server.stop()
+        self.es_server.stop()
+
+    def test_existing_ids(self):
+        self.assertEqual(self.database.get_existing_ids('articles', ['1', 2, '3', '4'], batch_size=3), {'1', '2', '4'})
+        self.assertEqual(self.database.get_existing_ids('unknown', ['1']), set())
+        self.assertEqual(sum(path == '/articles/_mget' for _, path in self.es_server.requests), 2)
+
+    def test_skip_indexed(self):
+        parser = get_parser(self.server, concurrent=2, database=self.database, index='articles')
+        dataframe = asyncio.run(parser.parse_by_authors(['alice', 'bob']))
+
+        self.assertEqual(sorted(map(int, dataframe['post_number'])), [3, 5, 6, 7])
+        self.assertEqual(sorted(path for path in self.server.requests if '/post/' in path),
+                         ['/ru/post/3/', '/ru/post/5/', '/ru/post/6/', '/ru/post/7/'])
+
+        # The new posts are uploaded, so nothing is requested by the next crawl
+        self.database.upload_dataframe('articles', dataframe)
+        self.server.requests.clear()
+        dataframe = asyncio.run(parser.parse_by_authors(['alice', 'bob']))
+        self.assertEqual(len(dataframe.index), 0)
+        self.assertFalse(any('/post/' in path for path in self.server.requests))
+
+    def test_missing_index(self):
+        parser = get_parser(self.server, concurrent=2, database=self.database, index='unknown')
+        dataframe = asyncio.run(parser.parse_by_authors(['alice']))
+        self.assertEqual(len(dataframe.index), 5)
+
+        with self.assertRaises(ValueError):
+            HabrParser(database=None, index='articles')
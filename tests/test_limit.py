@@ -0,0 +1,106 @@
+import time
+import asyncio
+import unittest
+from email.utils import formatdate
+from ataurus.data_parse.fetch import Fetcher
+from ataurus.data_parse.limit import HostLimiter, get_retry_after, MAX_RETRY_AFTER
+from tests.habr_server import HabrServer
+
+
+class HostLimiterTest(unittest.TestCase):
+    def test_retry_after(self):
+        self.assertEqual(get_retry_after({'Retry-After': '5'}), 5)
+        self.assertAlmostEqual(get_retry_after({'Retry-After': formatdate(time.time() + 30, usegmt=True)}), 30,
+                               delta=2)
+        self.assertEqual(get_retry_after({'Retry-After': '100000'}), MAX_RETRY_AFTER)
+        self.assertIsNone(get_retry_after({'Retry-After': 'later'}))
+        self.assertIsNone(get_retry_after({}))
+
+    def test_rate(self):
+        async def acquire(limiter, count):
+            for _ in range(count):
+                await limiter.acquire()
+                limiter.release(200)
+
+        limiter = HostLimiter(rate=20, max_rate=20, concurrency=4)
+        begin = time.monotonic()
+        asyncio.run(acquire(limiter, 6))
+        # The first request is made at once, the others are spaced
+        self.assertGreaterEqual(time.monotonic() - begin, 0.2)
+
+        begin = time.monotonic()
+        asyncio.run(acquire(HostLimiter(rate=None), 100))
+        self.assertLess(time.monotonic() - begin, 0.1)
+
+    def test_adaptation(self):
+        limiter = HostLimiter(rate=4, min_rate=1, max_rate=5, concurrency=8)
+        limiter.active = 2
+        limiter.release(429)
+        self.assertEqual((limiter.rate, limiter.concurrency), (2, 4))
+        limiter.release(None)
+        self.assertEqual((limiter.rate, limiter.concurrency), (1, 2))
+
+        for _ in range(50):
+            limiter.active += 1
+            limiter.release(200)
+        self.assertEqual((limiter.rate, limiter.concurrency), (5, 8))
+
+        with self.assertRaises(ValueError):
+            HostLimiter(rate=10, max_rate=5)
+
+    def test_concurrency(self):
+        async def run():
+            limiter = HostLimiter(rate=None, concurrency=2)
+            await limiter.acquire()
+            await limiter.acquire()
+
+            waiter = asyncio.ensure_future(limiter.acquire())
+            await asyncio.sleep(0.05)
+            self.assertFalse(waiter.done())
+
+            limiter.release(200)
+            await asyncio.wait_for(waiter, 1)
+            self.assertEqual(limiter.active, 2)
+
+            # The count of requests is halved after throttling
+            limiter.release(503)
+            self.assertEqual(limiter.concurrency, 1)
+            waiter = asyncio.ensure_future(limiter.acquire())
+            await asyncio.sleep(0.05)
+            self.assertFalse(waiter.done())
+            waiter.cancel()
+
+        asyncio.run(run())
+
+
+class ThrottlingTest(unittest.TestCase):
+    def setUp(self):
+        self.server = HabrServer({'alice': [1]}).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_retry_after(self):
+        get_page = HabrServer.get_page
+        self.server.get_page = lambda path: (429, '', {'Retry-After': '1'}) if len(self.server.requests) == 1 \
+            else get_page(self.server, path)
+
+        async def fetch():
+            async with Fetcher(rate=None) as fetcher:
+                return await fetcher.fetch(self.server.url + '/ru/post/1/')
+
+        begin = time.monotonic()
+        response = asyncio.run(fetch())
+        self.assertEqual(response.status, 200)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertGreaterEqual(time.monotonic() - begin, 1)
+
+    def test_retries_are_limited(self):
+        self.server.get_page = lambda path: (503, '')
+
+        async def fetch():
+            async with Fetcher(rate=None, retries=2) as fetcher:
+                return await fetcher.fetch(self.server.url + '/ru/post/1/')
+
+        self.assertEqual(asyncio.run(fetch()).status, 503)
+        self.assertEqual(len(self.server.requests), 3)
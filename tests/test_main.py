@@ -0,0 +1,76 @@
+import unittest
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from ataurus.main import predict_by_batches, get_batches, extract_features, FeaturesExtractor, Model
+
+
+class ListSink:
+    def __init__(self):
+        self.rows = []
+        self.count = 0
+
+    def write(self, authors, titles, links):
+        self.rows.extend(zip(authors, titles, links))
+        self.count = len(self.rows)
+
+
+class PredictByBatchesTest(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(0)
+        X = random.normal(size=(40, 3))
+        y = np.array(['a', 'b', 'c'])[np.argmax(X, axis=1)]
+        self.model = Pipeline([
+            ('scaler', StandardScaler()),
+            ('model', Model(RandomForestClassifier(n_estimators=10, random_state=0)))
+        ]).fit(pd.DataFrame(X), y)
+
+        self.X = pd.DataFrame(random.normal(size=(20, 3)))
+        self.X.iloc[[5, 17], 1] = np.nan
+        self.titles = np.array([f'title {i}' for i in range(20)], dtype=object)
+        self.links = np.array([f'link {i}' for i in range(20)], dtype=object)
+
+    def test_rows_are_aligned(self):
+        sink = ListSink()
+        predict_by_batches(self.model, get_batches(self.X, self.titles, self.links, 6), sink)
+
+        self.assertEqual(sink.count, 20)
+        self.assertEqual([row[1] for row in sink.rows], list(self.titles))
+        self.assertEqual([row[2] for row in sink.rows], list(self.links))
+        for i, (author, _, _) in enumerate(sink.rows):
+            if i in (5, 17):
+                self.assertIsNone(author)
+            else:
+                self.assertIn(author, ['a', 'b', 'c'])
+
+    def test_unscored_batch(self):
+        sink = ListSink()
+        X = self.X.iloc[[5, 17]]
+        predict_by_batches(self.model, [(X, self.titles[[5, 17]], self.links[[5, 17]])], sink)
+        self.assertEqual(sink.rows, [(None, 'title 5', 'link 5'), (None, 'title 17', 'link 17')])
+
+
+
+class ExtractFeaturesTest(unittest.TestCase):
+    def test_rows_without_texts(self):
+        texts = ['Это первый текст. Второе предложение!', None, 'Собаки бегают по двору, кошки спят...']
+        X, authors, titles, links = extract_features(texts, ['a', 'b', 'c'], ['t1', 't2', 't3'], ['l1', 'l2', 'l3'],
+                                                     FeaturesExtractor(n_jobs=1, verbose=False))
+
+        self.assertEqual(list(X.index), [0, 1, 2])
+        self.assertEqual(X.notnull().all(axis=1).tolist(), [True, False, True])
+        self.assertEqual(list(authors), ['a', 'b', 'c'])
+        self.assertEqual(list(titles), ['t1', 't2', 't3'])
+        self.assertEqual(list(links), ['l1', 'l2', 'l3'])
+
+    def test_chunk_without_texts(self):
+        X, _, _, _ = extract_features([None, None], ['a', 'b'], ['t1', 't2'], ['l1', 'l2'],
+                                      FeaturesExtractor(n_jobs=1, verbose=False))
+        self.assertEqual(len(X.index), 2)
+        self.assertTrue(X.isnull().all(axis=None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import unittest
+from ataurus.database.client import Database
+from ataurus.database.mirror import IndexMirror, is_mirror
+from ataurus.console_handle.console_handler import ConsoleHandler
+from tests.es_server import ElasticsearchServer
+
+
+class IndexMirrorTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ElasticsearchServer().start()
+        self.server.add('articles', {str(i): {'author': f'author {i % 3}', 'text': f'текст {i}', 'title': f't{i}',
+                                              'link': f'l{i}', 'indexed_at': 1000 + i, 'doc_id': str(i)}
+                                   for i in range(20)})
+        self.database = Database.connect([self.server.host])
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'mirror')
+
+    def tearDown(self):
+        self.server.stop()
+        self.directory.cleanup()
+
+    def test_sync(self):
+        mirror = IndexMirror(self.path)
+        self.assertEqual(mirror.sync(self.database, 'articles', batch_size=4, segment_size=8), 20)
+        self.assertTrue(is_mirror(self.path))
+        self.assertEqual(len(mirror), 20)
+        self.assertEqual(mirror.checkpoint, [1019, '19'])
+
+        documents = IndexMirror(self.path).read()
+        self.assertEqual(list(documents.columns), ['_id', 'author', 'text', 'title', 'link'])
+        self.assertEqual(sorted(documents['text']), sorted(f'текст {i}' for i in range(20)))
+
+        with self.assertRaises(ValueError):
+            mirror.sync(self.database, 'other')
+
+    def test_incremental_sync(self):
+        mirror = IndexMirror(self.path)
+        mirror.sync(self.database, 'articles', batch_size=4, segment_size=8, overlap=0)
+        segments = len(mirror._manifest['segments'])
+
+        # Nothing is received if the index isn't changed
+        self.assertEqual(mirror.sync(self.database, 'articles', overlap=0), 0)
+
+        self.server.add('articles', {'5': {'author': 'new author', 'text': 'новый текст', 'indexed_at': 2000, 'doc_id': '5'},
+                                     '20': {'author': 'author 2', 'text': 'текст 20', 'indexed_at': 2001,
+                                            'doc_id': '20'}})
+        self.assertEqual(mirror.sync(self.database, 'articles', overlap=0), 2)
+        self.assertEqual(len(mirror._manifest['segments']), segments + 1)
+
+        # The last version of the changed document replaces the previous one
+        documents = mirror.read(['_id', 'author', 'title'])
+        self.assertEqual(len(documents.index), 21)
+        changed = documents[documents['_id'] == '5'].iloc[0]
+        self.assertEqual(changed['author'], 'new author')
+        self.assertIsNone(changed['title'])
+
+    def test_overlap(self):
+        mirror = IndexMirror(self.path)
+        mirror.sync(self.database, 'articles')
+        segments = len(mirror._manifest['segments'])
+
+        # Documents uploaded shortly before the checkpoint are read again, but unchanged ones are skipped
+        self.assertEqual(mirror.sync(self.database, 'articles', overlap=5), 0)
+        self.assertEqual(len(mirror._manifest['segments']), segments)
+        self.assertEqual(mirror.checkpoint, [1019, '19'])
+
+        # A document which became visible late and a changed document of the window are received
+        self.server.add('articles', {'late': {'author': 'a', 'text': 'поздний текст', 'indexed_at': 1017,
+                                              'doc_id': 'late'},
+                                     '18': {'author': 'b', 'text': 'новый текст', 'indexed_at': 1019, 'doc_id': '18'}})
+        self.assertEqual(mirror.sync(self.database, 'articles', overlap=5), 2)
+        self.assertEqual(len(mirror), 21)
+        self.assertEqual(mirror.sync(self.database, 'articles', overlap=5), 0)
+
+    def test_documents_without_time(self):
+        self.server.add('legacy', {str(i): {'author': 'a', 'text': f'текст {i}'} for i in range(5)})
+        mirror = IndexMirror(self.path)
+        self.assertEqual(mirror.sync(self.database, 'legacy', batch_size=2), 5)
+        self.assertEqual(mirror.checkpoint, [0, ''])
+
+        # Documents without the time have no position, so they're read only by the first synchronization
+        self.server.add('legacy', {'5': {'author': 'a', 'text': 'текст 5'}})
+        self.assertEqual(mirror.sync(self.database, 'legacy'), 0)
+        self.assertEqual(len(mirror), 5)
+
+        self.database.upload_records('legacy', [{'author': 'b', 'text': 'текст 6', 'post_number': 6}])
+        self.assertEqual(mirror.sync(self.database, 'legacy'), 1)
+        self.assertEqual(mirror.checkpoint[1], '6')
+        self.assertEqual(mirror.sync(self.database, 'legacy', overlap=0), 0)
+        self.assertEqual(len(mirror), 6)
+
+    def test_compact(self):
+        mirror = IndexMirror(self.path)
+        mirror.sync(self.database, 'articles', batch_size=4, segment_size=4)
+        self.server.add('articles', {'0': {'author': 'a', 'text': 'новый текст', 'indexed_at': 2000, 'doc_id': '0'}})
+        mirror.sync(self.database, 'articles', overlap=0)
+        self.assertEqual(len(mirror._manifest['segments']), 6)
+
+        documents = mirror.read()
+        mirror.compact()
+        self.assertEqual(len(mirror._manifest['segments']), 1)
+        self.assertEqual(len([name for name in os.listdir(self.path) if name.endswith('.npz')]), 1)
+        self.assertEqual(sorted(IndexMirror(self.path).read()['text']), sorted(documents['text']))
+
+        # Numbers of segments continue after the compacted segment
+        self.server.add('articles', {'21': {'author': 'a', 'text': 'текст 21', 'indexed_at': 3000, 'doc_id': '21'}})
+        mirror.sync(self.database, 'articles', overlap=0)
+        self.assertEqual(mirror._manifest['segments'][-1], 'segment-000007.npz')
+        self.assertEqual(len(mirror), 21)
+
+    def test_input_chunks(self):
+        IndexMirror(self.path).sync(self.database, 'articles')
+
+        handler = ConsoleHandler(['predict', self.path, 'model', '--chunksize', '6'])
+        self.assertFalse(handler.input_is_features)
+        chunks = list(handler.input_chunks)
+        self.assertEqual([len(texts) for texts, *_ in chunks], [6, 6, 6, 2])
+
+        texts, authors, titles, links = handler.input
+        self.assertEqual(len(texts), 20)
+        self.assertEqual(sorted(zip(texts, authors))[0], ('текст 0', 'author 0'))
+
+    def test_mirror_options(self):
+        handler = ConsoleHandler(['mirror', f'{self.server.host}/articles', self.path, '--batch_size', '10'])
+        self.assertEqual(handler.mirror_options, {'host': self.server.host, 'index': 'articles',
+                                                  'directory': self.path, 'batch_size': 10})
@@ -0,0 +1,54 @@
+import unittest
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+from ataurus.ml.model import Model, predict_top_k
+
+
+class ModelTopKTest(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.X = random.normal(size=(60, 4))
+        self.y = np.array(['a', 'b', 'c', 'd'])[np.argmax(self.X, axis=1)]
+        self.model = Model(RandomForestClassifier(n_estimators=20, random_state=0)).fit(self.X, self.y)
+
+    def test_top_k(self):
+        X = self.X.copy()
+        X[[1, 5], 2] = np.nan
+        authors, probabilities, mask = self.model.predict_top_k(X, k=2)
+
+        self.assertEqual(authors.shape, (60, 2))
+        self.assertEqual(list(np.where(~mask)[0]), [1, 5])
+        self.assertTrue(np.isnan(probabilities[~mask]).all())
+        self.assertTrue((authors[~mask] == None).all())
+
+        # The first author is the predicted one, probabilities are sorted
+        np.testing.assert_array_equal(authors[mask, 0], self.model.predict(X))
+        self.assertTrue((probabilities[mask, 0] >= probabilities[mask, 1]).all())
+
+        scores = self.model.estimator.predict_proba(X[mask])
+        np.testing.assert_allclose(probabilities[mask, 0], scores.max(axis=1))
+
+    def test_k_is_limited(self):
+        authors, probabilities, mask = self.model.predict_top_k(self.X, k=10)
+        self.assertEqual(authors.shape, (60, 4))
+        np.testing.assert_allclose(probabilities.sum(axis=1), 1)
+        self.assertEqual(set(authors[0]), {'a', 'b', 'c', 'd'})
+
+        with self.assertRaises(ValueError):
+            self.model.predict_top_k(self.X, k=0)
+
+    def test_without_probabilities(self):
+        model = Model(SVC()).fit(self.X, self.y)
+        with self.assertRaises(ValueError):
+            model.predict_top_k(self.X)
+
+    def test_pipeline(self):
+        pipeline = Pipeline([('scaler', StandardScaler()), ('model', Model(RandomForestClassifier(random_state=0)))])
+        pipeline.fit(self.X, self.y)
+
+        authors, _, mask = predict_top_k(pipeline, self.X, k=1)
+        self.assertTrue(mask.all())
+        np.testing.assert_array_equal(authors[:, 0], pipeline.predict(self.X))
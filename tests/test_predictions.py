@@ -0,0 +1,71 @@
+import os
+import io
+import csv
+import json
+import tempfile
+import unittest
+from ataurus.serialize.predictions import get_sink, PredictionsSink, TextSink, CsvSink, JsonlSink
+
+
+class PredictionsSinkTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.batches = [(['a', 'b'], ['title 1', 'title, 2'], ['l1', 'l2']),
+                        (['c'], ['заголовок'], ['l3'])]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, filename, output_format=None):
+        filename = os.path.join(self.directory.name, filename)
+        with get_sink(filename, output_format) as sink:
+            for batch in self.batches:
+                sink.write(*batch)
+        self.assertEqual(sink.count, 3)
+
+        with open(filename, 'r', encoding='utf-8') as file:
+            return file.read()
+
+    def test_format_by_extension(self):
+        self.assertIsInstance(get_sink(os.path.join(self.directory.name, 'a.csv')), CsvSink)
+        self.assertIsInstance(get_sink(os.path.join(self.directory.name, 'a.jsonl')), JsonlSink)
+        self.assertIsInstance(get_sink(os.path.join(self.directory.name, 'a.txt')), TextSink)
+        self.assertIsInstance(get_sink(), TextSink)
+        self.assertIsInstance(get_sink(os.path.join(self.directory.name, 'a.txt'), 'csv'), CsvSink)
+
+        with self.assertRaises(ValueError):
+            get_sink(None, 'xml')
+
+    def test_csv(self):
+        rows = list(csv.reader(io.StringIO(self.write('predictions.csv'))))
+        self.assertEqual(rows, [['author', 'title', 'link'],
+                                ['a', 'title 1', 'l1'],
+                                ['b', 'title, 2', 'l2'],
+                                ['c', 'заголовок', 'l3']])
+
+    def test_jsonl(self):
+        rows = [json.loads(line) for line in self.write('predictions.jsonl').splitlines()]
+        self.assertEqual(rows[2], {'author': 'c', 'title': 'заголовок', 'link': 'l3'})
+        self.assertEqual(len(rows), 3)
+
+    def test_text(self):
+        lines = self.write('predictions.txt').splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0].split(), ['a', 'title', '1', 'l1'])
+
+    def test_unscored_rows(self):
+        self.batches = [([None, 'b'], ['t1', 't2'], ['l1', 'l2']), (['c'], ['t3'], ['l3'])]
+        self.assertEqual(self.write('predictions.txt').splitlines()[0].split(), ['t1', 'l1'])
+        self.assertEqual(self.write('predictions.csv').splitlines()[1], ',t1,l1')
+        self.assertIsNone(json.loads(self.write('predictions.jsonl').splitlines()[0])['author'])
+
+    def test_batch_is_written_immediately(self):
+        filename = os.path.join(self.directory.name, 'predictions.jsonl')
+        with get_sink(filename) as sink:
+            sink.write(*self.batches[0])
+            with open(filename, 'r', encoding='utf-8') as file:
+                self.assertEqual(len(file.read().splitlines()), 2)
+
+    def test_abstract_sink(self):
+        with self.assertRaises(TypeError):
+            PredictionsSink(io.StringIO())
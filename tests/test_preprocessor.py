@@ -1,5 +1,8 @@
+import io
+import contextlib
 import unittest.mock
 from ataurus.preparing.preprocessor import Preprocessor
+from ataurus.preparing.morph import MorphCache
 
 
 class PreprocessorTest(unittest.TestCase):
@@ -76,3 +79,66 @@ class PreprocessorTest(unittest.TestCase):
                          [['Это первый текст', 'И Первое предложение', 'РИАЛИ'],
                           [],
                           ['ВТОРОЕ предложение', 'This ЭТО', 'Сайт не мой']])
+
+
+class MorphCacheTest(unittest.TestCase):
+    def test_counters(self):
+        cache = MorphCache()
+        self.assertEqual(cache.normal_form('собаки'), 'собака')
+        self.assertEqual(cache.pos('собаки'), 'NOUN')
+        self.assertEqual(cache.info().hits, 1)
+        self.assertEqual(cache.info().misses, 1)
+        self.assertEqual(cache.info().currsize, 1)
+
+    def test_eviction(self):
+        cache = MorphCache(maxsize=2)
+        cache.parse('собака')
+        cache.parse('бежать')
+        cache.parse('собака')
+        cache.parse('текст')
+
+        # 'бежать' is the least recently used word, so it must be evicted
+        self.assertEqual(cache.info().currsize, 2)
+        cache.parse('собака')
+        self.assertEqual(cache.info().hits, 2)
+        cache.parse('бежать')
+        self.assertEqual(cache.info().misses, 4)
+
+    def test_incorrect_size(self):
+        with self.assertRaises(ValueError):
+            MorphCache(maxsize=0)
+
+    def test_counters_of_workers(self):
+        # Workers have their own caches, their counters are summed by the preprocessor
+        preprocessor = Preprocessor(['собаки бегают', 'собаки спят', 'кошки спят'], n_jobs=2)
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            preprocessor.tokens()
+        self.assertEqual(preprocessor.morph_hits + preprocessor.morph_misses, 6)
+        self.assertIn(f'{preprocessor.morph_hits} hits, {preprocessor.morph_misses} misses', stderr.getvalue())
+
+        preprocessor.process(remove_stopwords=True, verbose=False)
+        self.assertEqual(preprocessor.morph_hits + preprocessor.morph_misses, 12)
+
+
+class PreprocessorProcessTest(unittest.TestCase):
+    def setUp(self):
+        self.texts = ['Это первый текст. Второе предложение!', 'Собаки бегают по двору. Кошки спят']
+
+    def test_process(self):
+        preprocessor = Preprocessor(self.texts, n_jobs=1)
+        texts, tokens, sentences = preprocessor.process(verbose=False)
+
+        expected = Preprocessor(self.texts, n_jobs=1)
+        self.assertEqual(list(texts), self.texts)
+        self.assertEqual(list(tokens), list(expected.tokens(verbose=False)))
+        self.assertEqual(list(sentences), list(expected.sentences(verbose=False)))
+
+    def test_memoization(self):
+        preprocessor = Preprocessor(self.texts, n_jobs=1)
+        _, tokens, sentences = preprocessor.process(verbose=False)
+
+        # Results must be taken from the instance without processing
+        self.assertIs(preprocessor.tokens(verbose=False), tokens)
+        self.assertIs(preprocessor.sentences(verbose=False), sentences)
+        self.assertIsNot(preprocessor.tokens(normalization=False, verbose=False), tokens)
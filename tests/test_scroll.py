@@ -0,0 +1,50 @@
+import unittest
+import pandas as pd
+from ataurus.database.client import Database
+from ataurus.console_handle.console_handler import ConsoleHandler
+from tests.es_server import ElasticsearchServer
+
+
+class SlicedScrollTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ElasticsearchServer().start()
+        self.server.add('articles', {str(i): {'author': f'author {i % 3}', 'text': f'текст {i}', 'title': f't{i}',
+                                              'link': f'l{i}', 'date': '2020-01-01'} for i in range(25)})
+        self.database = Database.connect([self.server.host])
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_batches(self):
+        batches = list(self.database.iter_batches('articles', fields=['text', 'author'], slices=3, batch_size=4))
+
+        self.assertTrue(all(isinstance(batch, pd.DataFrame) and len(batch.index) <= 4 for batch in batches))
+        self.assertEqual(list(batches[0].columns), ['text', 'author'])
+
+        documents = pd.concat(batches)
+        self.assertEqual(sorted(documents['text']), sorted(f'текст {i}' for i in range(25)))
+        # All the scrolls are cleared
+        self.assertEqual(self.server._scrolls, {})
+
+    def test_get_authors_texts(self):
+        authors, texts, titles, links = self.database.get_authors_texts('articles')
+        self.assertEqual(len(texts), 25)
+        self.assertEqual(sorted(zip(texts, authors))[0], ('текст 0', 'author 0'))
+
+    def test_early_stop(self):
+        batches = self.database.iter_batches('articles', slices=2, batch_size=2)
+        next(batches)
+        batches.close()
+        self.assertEqual(self.server._scrolls, {})
+
+    def test_missing_index(self):
+        self.server.handle_search = lambda *args: (404, {'error': 'index_not_found_exception'})
+        with self.assertRaises(Exception):
+            list(self.database.iter_batches('unknown'))
+
+    def test_input_chunks(self):
+        handler = ConsoleHandler(['train', f'{self.server.host}/articles', 'model', '--chunksize', '10'])
+        chunks = list(handler.input_chunks)
+
+        self.assertTrue(all(len(texts) <= 10 for texts, *_ in chunks))
+        self.assertEqual(sum(len(texts) for texts, *_ in chunks), 25)
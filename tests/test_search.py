@@ -0,0 +1,72 @@
+import os
+import json
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from sklearn.datasets import make_classification
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+from ataurus.ml.search import HalvingSearch
+from ataurus.console_handle.console_handler import ConsoleHandler
+
+
+class HalvingSearchTest(unittest.TestCase):
+    def setUp(self):
+        X, y = make_classification(n_samples=300, n_features=6, n_informative=4, n_classes=3, random_state=0)
+        self.X = pd.DataFrame(X)
+        self.y = np.array(['a', 'b', 'c'])[y]
+        self.pipeline = Pipeline([('scaler', StandardScaler()), ('model', DecisionTreeClassifier(random_state=0))])
+        self.param_grid = {'model__max_depth': [1, 2, 3, 5, None], 'model__min_samples_leaf': [1, 5, 20]}
+
+    def test_search(self):
+        search = HalvingSearch(self.pipeline, self.param_grid, factor=3, cv=3, random_state=0,
+                               scoring='f1_weighted').fit(self.X, self.y)
+
+        iterations = [result['iteration'] for result in search.cv_results_]
+        resources = {result['iteration']: result['resources'] for result in search.cv_results_}
+        self.assertEqual(search.n_iterations_, 3)
+        self.assertEqual([iterations.count(i) for i in range(3)], [15, 5, 2])
+        self.assertLess(resources[0], resources[1])
+        self.assertEqual(resources[2], len(self.y))
+
+        self.assertIn(search.best_params_, [result['params'] for result in search.cv_results_
+                                            if result['iteration'] == 2])
+        self.assertGreater(search.best_score_, 0.5)
+        self.assertEqual(len(search.best_estimator_.predict(self.X)), len(self.y))
+
+    def test_budget(self):
+        search = HalvingSearch(self.pipeline, self.param_grid, budget=1e-9, cv=3, n_jobs=1, random_state=0)
+        with self.assertRaises(ValueError):
+            search.fit(self.X, self.y)
+
+    def test_subsample_is_stratified(self):
+        y = np.array(['a'] * 90 + ['b'] * 10)
+        order = HalvingSearch._get_subsample_order(y, np.random.RandomState(0))
+
+        self.assertEqual(sorted(order), list(range(100)))
+        self.assertEqual(list(y[order[:20]]).count('b'), 2)
+
+
+class SearchOptionsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.config = os.path.join(self.directory.name, 'config.json')
+        with open(self.config, 'w') as file:
+            json.dump({'search': {'method': 'halving', 'budget': 60}, 'parameters': [{}]}, file)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_options(self):
+        self.assertEqual(ConsoleHandler(['train', 'input', 'model']).search,
+                         {'method': 'grid', 'budget': None, 'factor': 3})
+        self.assertEqual(ConsoleHandler(['train', 'input', 'model', '-c', self.config]).search,
+                         {'method': 'halving', 'budget': 60, 'factor': 3})
+        self.assertEqual(ConsoleHandler(['train', 'input', 'model', '-c', self.config, '--search', 'grid',
+                                         '--factor', '2']).search,
+                         {'method': 'grid', 'budget': 60, 'factor': 2})
+
+        with self.assertRaises(ValueError):
+            _ = ConsoleHandler(['train', 'input', 'model', '--budget', '0']).search
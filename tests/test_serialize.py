@@ -0,0 +1,191 @@
+import os
+import json
+import pickle
+import tempfile
+import unittest
+import unittest.mock
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeRegressor
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.tree._tree import Tree
+from ataurus.serialize.model import serialize_model, deserialize_model, MANIFEST_FILE, PIPELINE_FILE
+from ataurus.ml.model import Model
+from ataurus.serialize.features import serialize_features, deserialize_features
+from ataurus.features.combine import FeaturesCombiner, get_required_features
+
+
+class ModelArtifactTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'model')
+
+        random = np.random.RandomState(0)
+        self.X = random.normal(size=(60, 5))
+        self.y = np.array(['a', 'b', 'c'] * 20)
+        self.model = Pipeline([('scaler', StandardScaler()), ('model', SVC())]).fit(self.X, self.y)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_serialize(self):
+        serialize_model(self.model, self.filename)
+        model = deserialize_model(self.filename)
+
+        self.assertEqual(list(model.predict(self.X)), list(self.model.predict(self.X)))
+        # Numeric arrays are memory-mapped instead of being copied into memory
+        self.assertIsInstance(model['scaler'].mean_, np.memmap)
+        self.assertIsInstance(model['model'].support_vectors_, np.memmap)
+
+        model = deserialize_model(self.filename, mmap=False)
+        self.assertNotIsInstance(model['scaler'].mean_, np.memmap)
+
+    def test_forest(self):
+        X = self.X.copy()
+        X[::7, 1] = np.nan
+        model = Pipeline([('scaler', StandardScaler()),
+                          ('model', Model(RandomForestClassifier(n_estimators=20, random_state=0)))]).fit(X, self.y)
+        serialize_model(model, self.filename)
+        self.assertIsInstance(model['model'].estimator.estimators_[0].tree_, Tree)
+
+        loaded = deserialize_model(self.filename)
+        tree = loaded['model'].estimator.estimators_[0].tree_
+        # The model imports the modules of the package by their short names, so the class is compared by the name
+        self.assertEqual(type(tree).__name__, 'MappedTree')
+        self.assertIsInstance(tree.threshold.base, np.memmap)
+        self.assertIsInstance(tree.value.base.base, np.memmap)
+        # Node tables aren't pickled with the pipeline
+        trees_directory = os.path.join(self.filename, 'trees')
+        trees_size = sum(os.path.getsize(os.path.join(trees_directory, name)) for name in os.listdir(trees_directory))
+        self.assertLess(os.path.getsize(os.path.join(self.filename, PIPELINE_FILE)), trees_size)
+
+        # Rows with missing values are scored by the trees too, but the Model skips them
+        for rows in (self.X, X):
+            X_transformed = model[:-1].transform(rows)
+            np.testing.assert_array_equal(loaded['model'].estimator.predict_proba(X_transformed),
+                                          model['model'].estimator.predict_proba(X_transformed))
+        np.testing.assert_array_equal(loaded.predict(self.X), model.predict(self.X))
+
+        loaded = deserialize_model(self.filename, mmap=False)
+        self.assertNotIsInstance(loaded['model'].estimator.estimators_[0].tree_.threshold.base, np.memmap)
+        np.testing.assert_array_equal(loaded.predict(self.X), model.predict(self.X))
+
+    def test_other_trees(self):
+        # Trees of gradient boosting are predicted by sklearn's code, so they're pickled as they are
+        y = (self.X[:, 0] > 0).astype(int)
+        for estimator in (DecisionTreeRegressor(max_depth=4), GradientBoostingClassifier(n_estimators=5)):
+            model = Pipeline([('model', estimator)]).fit(self.X, y)
+            serialize_model(model, self.filename)
+            np.testing.assert_array_equal(deserialize_model(self.filename).predict(self.X), model.predict(self.X))
+
+    def test_other_versions(self):
+        serialize_model(self.model, self.filename)
+        manifest_file = os.path.join(self.filename, MANIFEST_FILE)
+        with open(manifest_file, 'r') as file:
+            manifest = json.load(file)
+
+        for name, version in [('sklearn', '0.1'), ('numpy', '0.1'), ('format', 0)]:
+            with open(manifest_file, 'w') as file:
+                json.dump({**manifest, name: version}, file)
+            with self.assertRaises(ValueError):
+                deserialize_model(self.filename)
+
+    def test_incorrect_artifact(self):
+        with self.assertRaises(FileNotFoundError):
+            deserialize_model(self.filename)
+
+        os.makedirs(self.filename)
+        with self.assertRaises(FileNotFoundError):
+            deserialize_model(self.filename)
+
+        with self.assertRaises(ValueError):
+            serialize_model(StandardScaler(), self.filename)
+
+    def test_interrupted_overwriting(self):
+        serialize_model(self.model, self.filename)
+        with unittest.mock.patch('joblib.dump', side_effect=OSError("No space left on device")):
+            with self.assertRaises(OSError):
+                serialize_model(self.model, self.filename)
+
+        # The manifest of the previous artifact doesn't mark the half-written pipeline as valid
+        self.assertFalse(os.path.exists(os.path.join(self.filename, MANIFEST_FILE)))
+        with self.assertRaises(FileNotFoundError):
+            deserialize_model(self.filename)
+
+    def test_pickle(self):
+        filename = os.path.join(self.directory.name, 'model.pickle')
+        with open(filename, 'wb') as file:
+            pickle.dump(self.model, file)
+
+        self.assertEqual(list(deserialize_model(filename).predict(self.X)), list(self.model.predict(self.X)))
+
+
+class FeaturesStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'features')
+
+        random = np.random.RandomState(0)
+        self.features = pd.DataFrame(random.normal(size=(10, 4)),
+                                     columns=['avg_words_0', 'pos_distribution_0', 'pos_distribution_1', 'lexicon_0'])
+        self.features['titles'] = [f'заголовок {i}' for i in range(10)]
+        self.features['links'] = [None] + [f'l{i}' for i in range(1, 10)]
+        self.authors = np.array(['a', 'b'] * 5, dtype=object)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_serialize(self):
+        for compress in (False, True):
+            serialize_features(self.features, self.filename, authors=self.authors, compress=compress)
+            features, authors = deserialize_features(self.filename)
+
+            pd.testing.assert_frame_equal(features, self.features, check_dtype=False)
+            self.assertEqual(list(authors), list(self.authors))
+
+    def test_partial_loading(self):
+        serialize_features(self.features, self.filename)
+        features, authors = deserialize_features(self.filename, groups=['pos_distribution'])
+
+        self.assertEqual(list(features.columns), ['pos_distribution_0', 'pos_distribution_1', 'titles', 'links'])
+        self.assertIsNone(authors)
+        np.testing.assert_array_equal(features['pos_distribution_1'].values, self.features['pos_distribution_1'])
+
+        with self.assertRaises(ValueError):
+            deserialize_features(self.filename, groups=['unknown'])
+
+    def test_overwriting(self):
+        serialize_features(self.features, self.filename, authors=self.authors)
+        features = self.features.drop(columns=['lexicon_0'])
+        serialize_features(features, self.filename)
+
+        # Arrays of the previous store aren't left in the directory
+        self.assertEqual(sorted(os.listdir(self.filename)),
+                         ['avg_words.npy', 'links.strings.npz', 'pos_distribution.npy', 'schema.json',
+                          'titles.strings.npz'])
+        pd.testing.assert_frame_equal(deserialize_features(self.filename)[0], features, check_dtype=False)
+
+        with unittest.mock.patch('numpy.save', side_effect=OSError("No space left on device")):
+            with self.assertRaises(OSError):
+                serialize_features(self.features, self.filename)
+        with self.assertRaises(FileNotFoundError):
+            deserialize_features(self.filename)
+
+    def test_required_features(self):
+        self.assertEqual(get_required_features([{'combine__avg_words': [False], 'combine__lexicon': [True, False]},
+                                                {'combine__avg_words': [False], 'combine__pos_distribution': [False]}]),
+                         ['avg_sentences', 'pos_distribution', 'foreign_words_ratio', 'lexicon',
+                          'punctuation_distribution'])
+        self.assertEqual(FeaturesCombiner(lexicon=False, avg_words=False).get_features_names(),
+                         ['avg_sentences', 'pos_distribution', 'foreign_words_ratio', 'punctuation_distribution'])
+
+    def test_legacy_file(self):
+        filename = os.path.join(self.directory.name, 'features.joblib')
+        joblib.dump((self.features, self.authors), filename)
+
+        features, authors = deserialize_features(filename, groups=['lexicon'])
+        self.assertEqual(list(features.columns), ['lexicon_0', 'titles', 'links'])
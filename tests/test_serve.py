@@ -0,0 +1,134 @@
+import os
+import json
+import socket
+import tempfile
+import threading
+import unittest
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from ataurus.serve.server import MicroBatcher, make_server
+
+
+class MicroBatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.sizes = []
+
+        def predict(texts):
+            self.sizes.append(len(texts))
+            return [text.upper() for text in texts]
+
+        self.predict = predict
+
+    def test_results_are_aligned(self):
+        batcher = MicroBatcher(self.predict, max_batch_size=4, max_delay=0.05)
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lambda i: batcher.predict([f'text {i}', f'other {i}']), range(16)))
+        batcher.close()
+
+        self.assertEqual(results, [[f'TEXT {i}', f'OTHER {i}'] for i in range(16)])
+        self.assertEqual(sum(self.sizes), 32)
+        self.assertLessEqual(max(self.sizes), 4)
+        # Texts of concurrent requests are predicted together
+        self.assertLess(len(self.sizes), 32)
+
+    def test_batch_waits_for_delay(self):
+        batcher = MicroBatcher(self.predict, max_batch_size=100, max_delay=0.2)
+        futures = batcher.submit(['a'])
+        futures += batcher.submit(['b', 'c'])
+        self.assertEqual([future.result(5) for future in futures], ['A', 'B', 'C'])
+        batcher.close()
+        self.assertEqual(self.sizes, [3])
+
+    def test_exception(self):
+        def predict(texts):
+            raise RuntimeError('failed')
+
+        batcher = MicroBatcher(predict)
+        with self.assertRaises(RuntimeError):
+            batcher.predict(['a'], timeout=5)
+        batcher.close()
+
+    def test_incorrect_parameters(self):
+        with self.assertRaises(ValueError):
+            MicroBatcher(self.predict, max_batch_size=0)
+        with self.assertRaises(ValueError):
+            MicroBatcher(self.predict, max_delay=-1)
+
+
+class ServerTest(unittest.TestCase):
+    @staticmethod
+    def predict(texts):
+        return [f'author of {text}' for text in texts]
+
+    def start(self, **kwargs):
+        server = make_server(self.predict, max_delay=0.001, **kwargs)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        def stop():
+            server.shutdown()
+            server.server_close()
+            server.batcher.close()
+        self.addCleanup(stop)
+        return server
+
+    def request(self, url, data=None):
+        body = json.dumps(data).encode() if data is not None else None
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, data=body), timeout=5) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def test_http(self):
+        server = self.start(host='127.0.0.1', port=0)
+        url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+        self.assertEqual(self.request(url + '/health'), (200, {'status': 'ok'}))
+        self.assertEqual(self.request(url + '/predict', {'text': 'текст'}), (200, {'author': 'author of текст'}))
+        self.assertEqual(self.request(url + '/predict', {'texts': ['a', 'b']}),
+                         (200, {'authors': ['author of a', 'author of b']}))
+
+        self.assertEqual(self.request(url + '/predict', {'texts': []})[0], 400)
+        self.assertEqual(self.request(url + '/predict', {'text': 1})[0], 400)
+        self.assertEqual(self.request(url + '/unknown', {'text': 'a'})[0], 404)
+
+    def test_unix_socket(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        socket_path = os.path.join(directory.name, 'ataurus.sock')
+        self.start(socket_path=socket_path)
+
+        body = json.dumps({'text': 'a'}).encode()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+            client.sendall(b'POST /predict HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n'
+                           b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body)
+            response = b''
+            while chunk := client.recv(4096):
+                response += chunk
+
+        self.assertTrue(response.startswith(b'HTTP/1.1 200'))
+        self.assertEqual(json.loads(response.split(b'\r\n\r\n', 1)[1]), {'author': 'author of a'})
+
+    def test_existing_socket_path(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        # A stale socket is replaced
+        socket_path = os.path.join(directory.name, 'ataurus.sock')
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+            stale.bind(socket_path)
+        self.start(socket_path=socket_path)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+
+        # Other files are kept
+        filename = os.path.join(directory.name, 'model.pkl')
+        with open(filename, 'w') as file:
+            file.write('data')
+        with self.assertRaises(ValueError):
+            make_server(self.predict, socket_path=filename)
+        with open(filename) as file:
+            self.assertEqual(file.read(), 'data')